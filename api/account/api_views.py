@@ -1,15 +1,21 @@
-from rest_framework import permissions, status
+from django.http import HttpResponse
+from rest_framework import exceptions, permissions, status
 from rest_framework.decorators import permission_classes
 from rest_framework.views import APIView, Response
 from django.db.transaction import atomic
 
-from account.models import User
+from account.models import EmailAddress, User
+from core.db.routers import use_replica
+from core.lib.renderers import render_json
+from core.lib.responses import StreamingJSONResponse
 
+from .authentication import CachedJWTAuthentication
 from .serializers import CurrentUserSerializer, EmailAddressSerializer
 
 
 class CurrentUserApiView(APIView):
     @permission_classes([permissions.AllowAny])
+    @use_replica()
     def get(self, request, format=None):
         """
         Shows an authenticated user, if any.
@@ -17,10 +23,10 @@ class CurrentUserApiView(APIView):
 
         # Serialize the user
         if request.user.is_authenticated:
-            data: dict = User.objects.get(id=request.user.id).serialize_current_user()
+            data = User.objects.serialize_current_user(id=request.user.id, render=True)
         else:
             # This endpoint doesn't determine authentication, so we return an empty object
-            data: dict = {}
+            data = {}
 
         return Response(data=data, status=status.HTTP_200_OK)
 
@@ -37,6 +43,7 @@ class CurrentUserEmailAddressesApiView(APIView):
     serializer_class = EmailAddressSerializer
 
     @permission_classes([permissions.IsAuthenticated])
+    @use_replica()
     def get(self, request, id=None, format=None):
         """
         Shows an authenticated user's email address, if id is provided.
@@ -45,9 +52,14 @@ class CurrentUserEmailAddressesApiView(APIView):
         if id:
             email_address = request.user.email_addresses.get(id=id)
             serializer = self.serializer_class(email_address)
-        else:
-            serializer = self.serializer_class(request.user.email_addresses, many=True)
-        return Response(serializer.data)
+            return Response(serializer.data)
+
+        # Stream the list, so memory use doesn't grow with the number of rows.
+        rows = EmailAddress.objects.serialize_iter(
+            queryset=request.user.email_addresses.all(),
+            fields=self.serializer_class.Meta.fields,
+        )
+        return StreamingJSONResponse(rows)
 
     @permission_classes([permissions.IsAuthenticated])
     def post(self, request, format=None):
@@ -79,3 +91,89 @@ class CurrentUserEmailAddressesApiView(APIView):
         email_address = request.user.email_addresses.get(id=id)
         email_address.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+###
+# Async views
+#
+# The REST framework has no async views, so these are plain Django views that
+# authenticate with the JWT authentication class themselves. Under ASGI they
+# serve cache hits without leaving the event loop.
+###
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """
+    Return a response with data camel-cased and encoded as JSON.
+    """
+    if not isinstance(data, bytes):
+        data = render_json(data)
+    return HttpResponse(data, status=status, content_type="application/json")
+
+
+def error_response(request, exception):
+    """
+    Return the response the REST framework would for an API exception.
+    """
+    data = exception.detail
+    if not isinstance(data, (list, dict)):
+        data = {"detail": data}
+    response = json_response(data, exception.status_code)
+    if isinstance(
+        exception, exceptions.NotAuthenticated | exceptions.AuthenticationFailed
+    ):
+        response["WWW-Authenticate"] = CachedJWTAuthentication().authenticate_header(
+            request
+        )
+    return response
+
+
+async def authenticate_async(request, allow_anonymous=False):
+    """
+    Authenticate a request, returning its user, or None if anonymous requests
+    are allowed. Raises an APIException if authentication fails.
+    """
+    result = await CachedJWTAuthentication().aauthenticate(request)
+    if result is None and not allow_anonymous:
+        raise exceptions.NotAuthenticated()
+    return result[0] if result is not None else None
+
+
+async def current_user_async(request):
+    """
+    Shows an authenticated user, if any.
+    """
+    if request.method != "GET":
+        return error_response(request, exceptions.MethodNotAllowed(request.method))
+    try:
+        user = await authenticate_async(request, allow_anonymous=True)
+    except exceptions.APIException as e:
+        return error_response(request, e)
+
+    # This endpoint doesn't determine authentication, so we return an empty object
+    if user is None:
+        return json_response({})
+
+    return json_response(
+        await User.objects.aserialize_current_user(id=user.id, render=True)
+    )
+
+
+async def current_user_email_addresses_async(request):
+    """
+    Lists all authenticated user's email addresses.
+    """
+    if request.method != "GET":
+        return error_response(request, exceptions.MethodNotAllowed(request.method))
+    try:
+        user = await authenticate_async(request)
+    except exceptions.APIException as e:
+        return error_response(request, e)
+
+    # Stream the list, so memory use doesn't grow with the number of rows.
+    with use_replica():
+        rows = EmailAddress.objects.aserialize_iter(
+            queryset=EmailAddress.objects.filter(user_id=user.id),
+            fields=EmailAddressSerializer.Meta.fields,
+        )
+    return StreamingJSONResponse(rows)
@@ -0,0 +1,93 @@
+"""
+Authentication classes for the account app.
+"""
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import verified_token_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that reuses verified tokens and resolves the user
+    through a short-lived cache, instead of verifying the token and querying
+    for the user on every request.
+
+    The cached user is cleared whenever the user is saved or deleted. Views
+    should use request.user rather than loading the user again.
+    """
+
+    def get_validated_token(self, raw_token):
+        """
+        Validates an encoded JSON web token and returns a validated token
+        wrapper object, from the verified token cache if possible.
+        """
+        return verified_token_cache.get_or_verify(
+            raw_token, super().get_validated_token
+        )
+
+    async def aauthenticate(self, request):
+        """
+        Authenticate a request as authenticate does, from an async context.
+
+        Token verification is CPU-bound and usually cached, so it runs in the
+        event loop. Only users missing from the cache are loaded in a thread.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """
+        Return the user for a validated token as get_user does, from an async
+        context.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = await self.user_model.objects.aget_cached(
+                user_id, timeout=settings.AUTH_USER_CACHE_TIMEOUT
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
+
+    def get_user(self, validated_token):
+        """
+        Attempts to find and return a user using the given validated token.
+        """
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self.user_model.objects.get_cached(
+                user_id, timeout=settings.AUTH_USER_CACHE_TIMEOUT
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
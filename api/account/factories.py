@@ -1,4 +1,5 @@
 import random
+from uuid import uuid4
 
 import factory
 import factory.django
@@ -78,3 +79,45 @@ class EmailAddressFactory(factory.django.DjangoModelFactory):
     email = factory.Faker("email")
     # Verified 75% of the time by default
     is_verified = bool(int(random.random() <= 0.75))
+
+
+###
+# Bulk builders
+###
+
+
+def build_user_batch(size, password):
+    """
+    Build unsaved users, with one to three email addresses each, for
+    bulk_create. The password must already be hashed, so seeding many users
+    doesn't hash the same password for each of them.
+    """
+    users = []
+    email_addresses = []
+    for _ in range(size):
+        user = User(
+            id=uuid4(),
+            first_name=fake.first_name(),
+            last_name=fake.last_name(),
+            password=password,
+        )
+        count = random.randint(1, 3)
+        for i in range(count):
+            email_address = EmailAddress(
+                id=uuid4(),
+                user=user,
+                # Unique and short enough to be used as the username.
+                email=f"{uuid4().hex[:16]}@example.com",
+                is_primary=i == 0,
+                # If we have more than one email, then the primary email is verified
+                is_verified=(count > 1 and i == 0) or random.random() <= 0.75,
+            )
+            email_addresses.append(email_address)
+        primary_email = email_addresses[-count].email
+        user.username = (
+            f"{fake.user_name()[:13]}{user.id.hex[:16]}"
+            if settings.ENABLE_USERNAMES
+            else primary_email
+        )
+        users.append(user)
+    return users, email_addresses
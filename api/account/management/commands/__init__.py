@@ -1 +0,0 @@
-import create_superuser as createsuperuser
\ No newline at end of file
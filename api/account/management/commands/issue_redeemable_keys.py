@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ...models import RedeemableKey
+
+
+class Command(BaseCommand):
+    """
+    Issues redeemable keys in bulk.
+    """
+
+    help = (
+        "Issues a redeemable key for every object of a model matching the "
+        "filters, writing the ids of the keys one per line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "model",
+            help="The model of the redeemables, e.g. account.EmailAddress.",
+        )
+        parser.add_argument(
+            "-f",
+            "--filter",
+            action="append",
+            default=[],
+            help="A field lookup the redeemables must match, e.g. is_verified=False.",
+        )
+        parser.add_argument(
+            "-e",
+            "--expires-in-days",
+            type=float,
+            default=None,
+            help="How many days the keys are valid for. Keys never expire if unset.",
+        )
+        parser.add_argument(
+            "--user-field",
+            default="user",
+            help="The redeemable field holding the user the keys are for.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of keys inserted per transaction.",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            default=None,
+            help="The file to write the ids of the keys to, instead of stdout.",
+        )
+
+    def handle(self, *args, **options):
+
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+
+        filters = {}
+        for lookup in options["filter"]:
+            field, separator, value = lookup.partition("=")
+            if not separator:
+                raise CommandError(f"Invalid filter, expected field=value: {lookup}")
+            filters[field] = value
+
+        expires_in = None
+        if options["expires_in_days"] is not None:
+            expires_in = timedelta(days=options["expires_in_days"])
+
+        ids = RedeemableKey.objects.issue(
+            model.objects.filter(**filters),
+            user_field=options["user_field"] or None,
+            expires_in=expires_in,
+            batch_size=options["batch_size"],
+        )
+
+        output = open(options["output"], "w") if options["output"] else self.stdout
+        count = 0
+        try:
+            for id in ids:
+                output.write(f"{id}\n")
+                count += 1
+        finally:
+            if output is not self.stdout:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(f"Issued {count} keys."))
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ...models import RedeemableKey
+
+
+class Command(BaseCommand):
+    """
+    Purges redeemed and expired redeemable keys.
+    """
+
+    help = (
+        "Deletes redeemable keys redeemed, or expired without being redeemed, "
+        "more than the retention period ago. Meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-d",
+            "--days",
+            type=int,
+            default=settings.REDEEMABLE_KEY_RETENTION_DAYS,
+            help="How many days redeemed and expired keys are kept.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The number of keys deleted per transaction.",
+        )
+        parser.add_argument(
+            "--max-chunks",
+            type=int,
+            default=None,
+            help="Stop after this many chunks, to bound the run time.",
+        )
+
+    def handle(self, *args, **options):
+
+        if options["days"] < 0 or options["chunk_size"] < 1:
+            raise CommandError(
+                "The days must be positive and the chunk size at least 1."
+            )
+
+        before = timezone.now() - timedelta(days=options["days"])
+
+        self.stdout.write(f"Purging keys redeemed or expired before {before}...")
+
+        deleted = RedeemableKey.objects.purge(
+            before,
+            chunk_size=options["chunk_size"],
+            max_chunks=options["max_chunks"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} keys."))
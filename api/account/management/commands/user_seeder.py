@@ -1,7 +1,28 @@
+import multiprocessing
+
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand, CommandError
-from ...factories import UserFactory
+from django.db import connections
 from django.db.transaction import atomic
 
+from ...factories import EmailAddress, User, UserFactory, build_user_batch
+
+# The password of every seeded user.
+DEFAULT_PASSWORD = "password"
+
+
+def seed_batch(args):
+    """
+    Insert a batch of users and their email addresses. Runs in the worker
+    processes of bulk seeding.
+    """
+    size, password = args
+    users, email_addresses = build_user_batch(size, password)
+    with atomic():
+        User.objects.bulk_create(users)
+        EmailAddress.objects.bulk_create(email_addresses)
+    return size
+
 
 class Command(BaseCommand):
     """
@@ -18,12 +39,37 @@ class Command(BaseCommand):
             default=10,
             help="The number of users to create.",
         )
+        parser.add_argument(
+            "-b",
+            "--bulk",
+            action="store_true",
+            help=(
+                "Insert users in batches with bulk_create, hashing the password "
+                "once. Model save methods and factories are skipped."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of users inserted per batch in bulk mode.",
+        )
+        parser.add_argument(
+            "-w",
+            "--workers",
+            type=int,
+            default=1,
+            help="The number of processes inserting batches in bulk mode.",
+        )
 
     def handle(self, *args, **options):
 
         # Arguments
         count = options["count"]
 
+        if options["bulk"]:
+            return self.handle_bulk(count, options["batch_size"], options["workers"])
+
         self.stdout.write(f"Creating {count} random users...")
 
         with atomic():
@@ -32,4 +78,42 @@ class Command(BaseCommand):
             for _ in range(count):
                 UserFactory()
 
-        self.stdout.write(self.style.SUCCESS("Done."))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def handle_bulk(self, count, batch_size, workers):
+        """
+        Seeds the database in batches, fanned out across worker processes.
+        """
+        if batch_size < 1 or workers < 1:
+            raise CommandError("The batch size and workers must be at least 1.")
+
+        self.stdout.write(
+            f"Creating {count} random users in batches of {batch_size} "
+            f"with {workers} worker(s)..."
+        )
+
+        password = make_password(DEFAULT_PASSWORD)
+        batches = [(batch_size, password)] * (count // batch_size)
+        if count % batch_size:
+            batches.append((count % batch_size, password))
+
+        if workers == 1:
+            results = map(seed_batch, batches)
+            self.report_progress(results, count)
+        else:
+            # Forked workers must not share the parent's connections.
+            connections.close_all()
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                results = pool.imap_unordered(seed_batch, batches)
+                self.report_progress(results, count)
+
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def report_progress(self, results, count):
+        """
+        Writes the number of users created as each batch completes.
+        """
+        created = 0
+        for size in results:
+            created += size
+            self.stdout.write(f"{created}/{count}")
@@ -2,10 +2,17 @@
 Custom model managers for the account app.
 """
 
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
-from django.db import transaction
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
 
-from core.lib.managers import BaseModelManager
+from core.lib.managers import BaseModelManager, BaseQuerySet
 
 
 class UserManager(BaseUserManager, BaseModelManager):
@@ -13,6 +20,11 @@ class UserManager(BaseUserManager, BaseModelManager):
     Custom user model manager where email is the unique identifiers
     """
 
+    cache_names = ["get_cached__<id>", "serialize_current_user__<id>"]
+
+    # Kept out of the shared cache, and rarely needed by cached lookups.
+    uncached_fields = ["password", "last_login"]
+
     def create_user(self, email, is_verified=False, password=None):
         """
         Create and save a User with the given email and password.
@@ -49,18 +61,45 @@ class UserManager(BaseUserManager, BaseModelManager):
     # Serializer methods
     ###
 
-    def serialize_current_user(self, **kwargs):
+    def serialize_current_user(self, id, **kwargs):
         """
         Serialize the current user.
         """
+        kwargs = self.get_current_user_kwargs(id, **kwargs)
+        return self.serialize(single=True, **kwargs)
+
+    async def aserialize_current_user(self, id, **kwargs):
+        """
+        Serialize the current user from an async context.
+        """
+        kwargs = self.get_current_user_kwargs(id, **kwargs)
+        return await self.aserialize(single=True, **kwargs)
 
-        cache_prefix = "serialize_current_user"
+    def get_current_user_kwargs(self, id, **kwargs):
+        """
+        Return the serialize arguments for the current user.
+        """
+        kwargs.setdefault("queryset", self.filter(id=id))
+        kwargs.setdefault("cache_name", "serialize_current_user__<id>")
+        kwargs.setdefault("cache_id", id)
+        kwargs["fields"] = self.get_current_user_fields(kwargs.pop("fields", []))
+        return kwargs
 
-        # Get "id" from the queryset
-        if "id" in self.query.fields: # type: ignore
-            kwargs.setdefault("cache_name", f"{cache_prefix}__{self.query.id}") # type: ignore
+    def serialize_current_users(self, ids, **kwargs):
+        """
+        Serialize many users as serialize_current_user would, keyed by id.
+        The cache entries are shared with serialize_current_user.
+        """
+        kwargs.setdefault("cache_name", "serialize_current_user__<id>")
+        kwargs["fields"] = self.get_current_user_fields(kwargs.pop("fields", []))
+        return self.serialize_many(ids, **kwargs)
 
-        fields = set(kwargs.pop("fields", []))
+    def get_current_user_fields(self, fields=[]):
+        """
+        Return the fields serialized for the current user, plus any extra
+        fields.
+        """
+        fields = set(fields)
         fields.update(
             {
                 "id",
@@ -68,17 +107,14 @@ class UserManager(BaseUserManager, BaseModelManager):
                 "first_name",
                 "last_name",
                 "is_active",
-                "is_staff",
                 "is_superuser",
-                "email_addresses",
                 "email_addresses__id",
                 "email_addresses__email",
                 "email_addresses__is_primary",
                 "email_addresses__is_verified",
             }
         )
-        kwargs["fields"] = list(fields)
-        return self.serialize(single=True, **kwargs)
+        return sorted(fields)
 
 
 class EmailAddressManager(BaseModelManager):
@@ -90,6 +126,9 @@ class EmailAddressManager(BaseModelManager):
     @method primary: Return the primary email address for a user.
     """
 
+    # A user's serialization includes their email addresses.
+    cache_dependencies = ["user"]
+
     def create(self, user, email, is_primary=False, is_verified=False):
         """
         Create and save an EmailAddress with the given email and user.
@@ -102,6 +141,74 @@ class EmailAddressManager(BaseModelManager):
         )
         email_address.save(using=self._db)
 
+    def set_primary(self, email_address, clear_caches=True):
+        """
+        Make an email address the primary email address of its user.
+        """
+        self.set_primaries([email_address], clear_caches=clear_caches)
+
+    def set_primaries(self, email_addresses, clear_caches=True):
+        """
+        Make each email address the primary email address of its user.
+
+        The primary flags of all users are switched by one UPDATE, touching
+        only their current and new primary rows, and if settings.ENABLE_USERNAMES
+        is False the usernames are synced by another in the same transaction.
+        The users' caches are then cleared once, when the transaction commits.
+        """
+        # The last email address given for a user wins.
+        primaries = {e.user_id: e for e in email_addresses}
+        if not primaries:
+            return
+        ids = [e.id for e in primaries.values()]
+        user_field = self.model.user.field
+        User = user_field.related_model
+        now = timezone.now()
+        using = self._db or router.db_for_write(self.model)
+
+        with transaction.atomic(using=using):
+            # The users' caches are cleared below.
+            self.using(using).filter(
+                Q(user_id__in=primaries.keys()) & (Q(is_primary=True) | Q(id__in=ids))
+            ).update_uncached(
+                is_primary=Case(When(id__in=ids, then=Value(True)), default=False),
+                updated_at=now,
+            )
+
+            if not settings.ENABLE_USERNAMES:
+                # Leave users whose username is already in sync untouched.
+                User.objects.using(using).filter(
+                    reduce(
+                        or_,
+                        (
+                            Q(id=user_id) & ~Q(username=e.email)
+                            for user_id, e in primaries.items()
+                        ),
+                    )
+                ).update_uncached(
+                    username=Case(
+                        *(
+                            When(id=user_id, then=Value(e.email))
+                            for user_id, e in primaries.items()
+                        )
+                    ),
+                    updated_at=now,
+                )
+
+        for email_address in primaries.values():
+            email_address.is_primary = True
+            # Keep an already fetched user in sync with the database.
+            user = user_field.get_cached_value(email_address, None)
+            if not settings.ENABLE_USERNAMES and user is not None:
+                user.username = email_address.email
+
+        transaction.on_commit(
+            lambda: self.clear_caches_of(
+                {"user": set(primaries) if clear_caches else set()}
+            ),
+            using=using,
+        )
+
     @staticmethod
     def normalize_email(email):
         """
@@ -123,7 +230,41 @@ class EmailAddressManager(BaseModelManager):
         return self.get(**{email: email})
 
 
-class RedeemableKeyManager(BaseModelManager):
+class RedeemableKeyQuerySet(BaseQuerySet):
+    """
+    Custom queryset for the RedeemableKey model.
+    """
+
+    _with_content_types = False
+
+    def with_redeemables(self):
+        """
+        Load the redeemables of the keys with one query per content type, and
+        set each key's content type from the ContentType cache, so reading
+        key.redeemable or key.redeemable_content_type costs no further queries.
+        """
+        clone = self.prefetch_related("redeemable")
+        clone._with_content_types = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_content_types = self._with_content_types
+        return clone
+
+    def _prefetch_related_objects(self):
+        super()._prefetch_related_objects()
+        if self._with_content_types:
+            field = self.model._meta.get_field("redeemable_content_type")
+            for key in self._result_cache:
+                if not field.is_cached(key):
+                    content_type = ContentType.objects.db_manager(self.db).get_for_id(
+                        key.redeemable_content_type_id
+                    )
+                    field.set_cached_value(key, content_type)
+
+
+class RedeemableKeyManager(BaseModelManager.from_queryset(RedeemableKeyQuerySet)):
     """
     Custom manager for the RedeemableKey model.
     """
@@ -138,16 +279,103 @@ class RedeemableKeyManager(BaseModelManager):
             date_expires=date_expires,
         )
         redeemable_key.save(using=self._db)
-        return
+        return redeemable_key
+
+    def issue(
+        self,
+        redeemables,
+        user_field="user",
+        date_expires=None,
+        expires_in=None,
+        batch_size=1000,
+    ):
+        """
+        Issue a key for each object of a queryset of redeemables, yielding the
+        ids of the keys as they are created.
+
+        Keys belong to the user in each redeemable's user_field, or to no user
+        if user_field is None. They expire at date_expires, or expires_in (a
+        timedelta) after they are issued, or never.
 
-    def redeem(self, uuid, user, commit=True):
+        Redeemables are read and keys inserted batch_size at a time, each batch
+        in its own transaction, so memory use and transaction size don't grow
+        with the number of redeemables.
+        """
+        using = router.db_for_write(self.model)
+        content_type = ContentType.objects.db_manager(using).get_for_model(
+            redeemables.model
+        )
+        fields = ["pk"] if user_field is None else ["pk", user_field]
+        redeemables = redeemables.order_by("pk").values_list(*fields)
+        last_pk = None
+
+        while True:
+            batch = (
+                redeemables if last_pk is None else redeemables.filter(pk__gt=last_pk)
+            )
+            rows = list(batch[:batch_size])
+            if not rows:
+                return
+            last_pk = rows[-1][0]
+
+            if expires_in is not None:
+                date_expires = timezone.now() + expires_in
+            keys = [
+                self.model(
+                    user_id=row[1] if user_field is not None else None,
+                    redeemable_content_type=content_type,
+                    redeemable_uuid=row[0],
+                    date_expires=date_expires,
+                )
+                for row in rows
+            ]
+            with transaction.atomic(using=using):
+                self.db_manager(using).bulk_create(keys)
+            yield from (key.id for key in keys)
+
+    def redeem(self, id, user, *args, **kwargs):
         """
         Redeem a redeemable key.
         """
-        redeemable_key = self.get(uuid=uuid)
-        redeemable_key.redeem(user, commit=commit)
+        redeemable_key = self.get(id=id)
+        redeemable_key.redeem(user, *args, **kwargs)
         return redeemable_key
 
+    def claim(self, id):
+        """
+        Mark a key as redeemed if it is neither redeemed nor expired, with a
+        single UPDATE ... RETURNING, so of concurrent claims exactly one wins.
+
+        Returns the claimed key as stored after the update, or None if the key
+        couldn't be claimed.
+        """
+        meta = self.model._meta
+        using = router.db_for_write(self.model)
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        fields = {
+            name: meta.get_field(name)
+            for name in ("id", "date_redeemed", "date_expires", "updated_at")
+        }
+        columns = {name: quote(field.column) for name, field in fields.items()}
+        now = timezone.now()
+        sql = (
+            f"UPDATE {quote(meta.db_table)} "
+            f"SET {columns['date_redeemed']} = %s, {columns['updated_at']} = %s "
+            f"WHERE {columns['id']} = %s "
+            f"AND {columns['date_redeemed']} IS NULL "
+            f"AND ({columns['date_expires']} IS NULL OR {columns['date_expires']} > %s) "
+            f"RETURNING {', '.join(quote(f.column) for f in meta.concrete_fields)}"
+        )
+        params = [
+            fields["date_redeemed"].get_db_prep_value(now, connection),
+            fields["updated_at"].get_db_prep_value(now, connection),
+            fields["id"].get_db_prep_value(id, connection),
+            fields["date_expires"].get_db_prep_value(now, connection),
+        ]
+        # The raw queryset converts the returned row as a regular query would.
+        return next(iter(self.raw(sql, params, using=using)), None)
+
     ###
     # QuerySet methods
     ###
@@ -160,21 +388,57 @@ class RedeemableKeyManager(BaseModelManager):
 
     def redeemable(self):
         """
-        Return a queryset of redeemable keys for any redeemable.
+        Return a queryset of redeemable keys, which are neither expired nor
+        redeemed.
         """
-        return super().filter(expired_at__isnull=True, redeemed_at__isnull=True)
+        return super().filter(
+            Q(date_expires__isnull=True) | Q(date_expires__gt=timezone.now()),
+            date_redeemed__isnull=True,
+        )
 
     def expired(self):
         """
-        Return a queryset of expired redeemable keys.
+        Return a queryset of expired redeemable keys that weren't redeemed.
         """
-        return super().filter(expired_at__isnull=False)
+        return super().filter(
+            date_expires__lte=timezone.now(), date_redeemed__isnull=True
+        )
 
     def redeemed(self):
         """
         Return a queryset of redeemed redeemable keys.
         """
-        return super().filter(redeemed_at__isnull=False)
+        return super().filter(date_redeemed__isnull=False)
+
+    def purgeable(self, before):
+        """
+        Return a queryset of keys redeemed, or expired without being redeemed,
+        before the given datetime.
+        """
+        return super().filter(
+            Q(date_redeemed__lt=before)
+            | Q(date_redeemed__isnull=True, date_expires__lt=before)
+        )
+
+    def purge(self, before, chunk_size=1000, max_chunks=None):
+        """
+        Delete the keys redeemed or expired before the given datetime.
+
+        Keys are deleted chunk_size at a time, each chunk in its own short
+        transaction, so the sweep never holds many row locks or a long-running
+        transaction. Returns the number of keys deleted.
+        """
+        deleted = 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            ids = list(self.purgeable(before).values_list("id", flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                count, _ = self.filter(id__in=ids).delete()
+            deleted += count
+            chunks += 1
+        return deleted
 
     def email_addresses(self):
         """
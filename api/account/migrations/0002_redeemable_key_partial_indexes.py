@@ -0,0 +1,32 @@
+# Generated by Django 4.0.10 on 2026-10-18 03:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='redeemablekey',
+            name='account_red_redeema_2a19c9_idx',
+        ),
+        migrations.AlterField(
+            model_name='emailaddress',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_addresses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='redeemablekey',
+            index=models.Index(condition=models.Q(('date_redeemed__isnull', True)), fields=['redeemable_content_type', 'redeemable_uuid'], name='live_redeemable_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='redeemablekey',
+            index=models.Index(condition=models.Q(('date_expires__isnull', False), ('date_redeemed__isnull', True)), fields=['date_expires'], name='live_redeemable_key_exp_idx'),
+        ),
+    ]
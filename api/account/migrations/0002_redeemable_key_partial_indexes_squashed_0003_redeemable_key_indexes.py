@@ -0,0 +1,52 @@
+# Generated by Django 4.0.10 on 2026-10-18 09:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+import core.db.operations
+
+
+class Migration(migrations.Migration):
+
+    # Indexes can only be built concurrently outside of a transaction.
+    atomic = False
+
+    replaces = [
+        ("account", "0002_redeemable_key_partial_indexes"),
+        ("account", "0003_redeemable_key_indexes"),
+    ]
+
+    dependencies = [
+        ("account", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="emailaddress",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="email_addresses",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        core.db.operations.AddIndexConcurrently(
+            model_name="redeemablekey",
+            index=models.Index(
+                condition=models.Q(("date_redeemed__isnull", False)),
+                fields=["date_redeemed"],
+                name="redeemed_key_idx",
+            ),
+        ),
+        core.db.operations.AddIndexConcurrently(
+            model_name="redeemablekey",
+            index=models.Index(
+                condition=models.Q(
+                    ("date_expires__isnull", False), ("date_redeemed__isnull", True)
+                ),
+                fields=["date_expires"],
+                name="live_redeemable_key_exp_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.10 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("account", "0002_redeemable_key_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="redeemablekey",
+            name="live_redeemable_key_idx",
+        ),
+        migrations.AddIndex(
+            model_name="redeemablekey",
+            index=models.Index(
+                fields=["redeemable_content_type", "redeemable_uuid"],
+                name="account_red_redeema_2a19c9_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="redeemablekey",
+            index=models.Index(
+                condition=models.Q(("date_redeemed__isnull", False)),
+                fields=["date_redeemed"],
+                name="redeemed_key_idx",
+            ),
+        ),
+    ]
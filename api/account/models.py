@@ -2,18 +2,18 @@
 Models for the account app.
 """
 
-from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.transaction import atomic
+from django.db import models, router
+from django.db.transaction import atomic, on_commit, set_rollback
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from core.lib.models import BaseModel, DatesMixin
 
-from .managers import EmailAddressManager, UserManager
+from .managers import EmailAddressManager, RedeemableKeyManager, UserManager
+from .tokens import forget_user_tokens
 
 
 class User(BaseModel, AbstractBaseUser, PermissionsMixin, DatesMixin):
@@ -42,10 +42,60 @@ class User(BaseModel, AbstractBaseUser, PermissionsMixin, DatesMixin):
         verbose_name_plural = _("users")
         ordering = ["-created_at"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._credentials = self.get_credentials()
+
     def __str__(self):
         """String representation of the User model."""
         return self.username
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the user, and forgets their verified tokens once the transaction
+        commits if their password or active status changed.
+        """
+        credentials = self.get_credentials()
+        changed = not self._state.adding and credentials != self._credentials
+        super().save(*args, **kwargs)
+        self._credentials = credentials
+        if changed:
+            pk = self.pk
+            on_commit(lambda: forget_user_tokens(pk), using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        """
+        Deletes the user, and forgets their verified tokens once the
+        transaction commits.
+        """
+        pk = self.pk
+        using = kwargs.get("using", args[0] if args else None) or router.db_for_write(
+            self.__class__, instance=self
+        )
+        result = super().delete(*args, **kwargs)
+        on_commit(lambda: forget_user_tokens(pk), using=using)
+        return result
+
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Reloads fields from the database, including deferred fields on first
+        access, and remembers their credentials as saved.
+        """
+        super().refresh_from_db(using=using, fields=fields)
+        self._credentials = tuple(
+            current if fields is None or name in fields else saved
+            for name, saved, current in zip(
+                ("password", "is_active"), self._credentials, self.get_credentials()
+            )
+        )
+
+    def get_credentials(self):
+        """
+        Return the password and active status, to compare with those the user
+        was loaded or last saved with. Deferred fields aren't loaded.
+        """
+        return self.__dict__.get("password"), self.__dict__.get("is_active")
+
     @property
     def full_name(self):
         """Return the first_name plus the last_name, with a space in between."""
@@ -65,7 +115,10 @@ class EmailAddress(BaseModel, DatesMixin):
     is_verified = models.BooleanField(default=False)
     is_primary = models.BooleanField(default=False)
     redeemable_keys = GenericRelation(
-        "account.RedeemableKey", related_query_name="redeemable"
+        "account.RedeemableKey",
+        content_type_field="redeemable_content_type",
+        object_id_field="redeemable_uuid",
+        related_query_name="redeemable_email_address",
     )
 
     objects = EmailAddressManager()
@@ -92,12 +145,17 @@ class EmailAddress(BaseModel, DatesMixin):
         If settings.ENABLE_USERNAMES is False, the username will be set to the
         email address.
         """
-        if self.is_primary:
-            EmailAddress.objects.filter(user=self.user).update(is_primary=False)
-            if not settings.ENABLE_USERNAMES and self.user.username != self.email:
-                self.user.username = self.email
-                self.user.save(*args, **kwargs)
-        super().save(*args, **kwargs)
+        if not self.is_primary:
+            return super().save(*args, **kwargs)
+
+        # Model.save takes using as its third positional argument.
+        using = kwargs.get("using", args[2] if len(args) > 2 else None)
+        using = using or router.db_for_write(self.__class__, instance=self)
+        with atomic(using=using):
+            # Demote the current primary and sync the username, leaving the
+            # cache clearing to the save below.
+            EmailAddress.objects.db_manager(using).set_primary(self, clear_caches=False)
+            super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         """
@@ -111,6 +169,7 @@ class EmailAddress(BaseModel, DatesMixin):
             raise ValueError(_("Cannot delete only email address."))
         super().delete(*args, **kwargs)
 
+
 class RedeemableKey(BaseModel, DatesMixin):
     """
     Provides a redeemable key for a given polymorphic model and user.
@@ -128,11 +187,27 @@ class RedeemableKey(BaseModel, DatesMixin):
     date_expires = models.DateTimeField(null=True, blank=True)
     date_redeemed = models.DateTimeField(null=True, blank=True)
 
-    objects = models.Manager()
+    objects = RedeemableKeyManager()
 
     class Meta:
         indexes = [
+            # Covers every key of a redeemable, including redeemed ones, which
+            # the generic relation collects when the redeemable is deleted.
             models.Index(fields=["redeemable_content_type", "redeemable_uuid"]),
+            # Purging sweeps keys that were redeemed, or that expired without
+            # being redeemed, so each gets a partial index of its own.
+            models.Index(
+                name="redeemed_key_idx",
+                fields=["date_redeemed"],
+                condition=models.Q(date_redeemed__isnull=False),
+            ),
+            models.Index(
+                name="live_redeemable_key_exp_idx",
+                fields=["date_expires"],
+                condition=models.Q(
+                    date_redeemed__isnull=True, date_expires__isnull=False
+                ),
+            ),
         ]
         ordering = ["-created_at"]
 
@@ -167,46 +242,54 @@ class RedeemableKey(BaseModel, DatesMixin):
         Checks if self has redeem method matching redeemable_content_type app and model, else raises NotImplemented.
         I.E. `redeem_account_emailaddress` for EmailAddress model.
 
+        The key is claimed with a single conditional UPDATE before the redeem
+        method runs, so concurrent redemptions can't both succeed and only the
+        winner runs the redeem method.
+
         Returns True if successful, False otherwise.
         """
 
-        if not user == self.user:
-            raise ValueError(_("User does not match kecommity."))
+        if user.pk != self.user_id:
+            raise ValueError(_("User does not match key."))
 
-        if self.redeemed:
+        if self.is_redeemed:
             raise ValueError(_("Key has already been redeemed."))
 
         if self.is_expired:
             raise ValueError(_("Key has expired."))
 
-        redeem_method = getattr(
-            self,
-            f"redeem_{self.redeemable_content_type.app_label}_{self.redeemable_content_type.model}",
-            None,
-        )
+        # Content types are cached, so resolving the method costs no query.
+        content_type = ContentType.objects.get_for_id(self.redeemable_content_type_id)
+        method_name = f"redeem_{content_type.app_label}_{content_type.model}"
+        redeem_method = getattr(self, method_name, None)
 
         if not redeem_method or not callable(redeem_method):
             raise NotImplementedError(
-                _(
-                    f"""Redeem method not implemented, no such method:
-                redeem_{self.redeemable_content_type.app_label}_{self.redeemable_content_type.model}
-                """
-                )
+                _(f"Redeem method not implemented, no such method: {method_name}")
             )
 
-        # Multiple database transactions are required for this method, so we
-        # wrap it in an atomic block.
-        with atomic():
+        # The claim and the redeem method's writes are committed together, or
+        # not at all.
+        using = router.db_for_write(RedeemableKey, instance=self)
+        with atomic(using=using):
+
+            claimed = RedeemableKey.objects.claim(self.id)
+
+            if claimed is None:
+                raise ValueError(_("Key has already been redeemed or has expired."))
+
+            self.date_redeemed = claimed.date_redeemed
+            self.updated_at = claimed.updated_at
 
             success = redeem_method(user, *args, **kwargs)
 
-            if success:
-                self.redeemed = True
-                self.date_redeemed = timezone.now()
-                self.save()
-                return True
+            if not success:
+                # Release the claim.
+                set_rollback(True, using=using)
+                self.date_redeemed = None
+                return False
 
-        return False
+        return True
 
     ###
     # Redeemable redeem methods
@@ -218,11 +301,10 @@ class RedeemableKey(BaseModel, DatesMixin):
         if type(self.redeemable) is not EmailAddress:
             raise ValueError(_("Redeemable is not an EmailAddress."))
 
-        if not user == self.redeemable.user:
+        if user.pk != self.redeemable.user_id:
             raise ValueError(_("User does not own EmailAddress."))
 
         self.redeemable.is_verified = True
         self.redeemable.is_primary = True
         self.redeemable.save()
-        self.save()
         return True
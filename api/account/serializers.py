@@ -1,8 +1,13 @@
 from django.db.transaction import atomic
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import UntypedToken
 from django.conf import settings
 
 from .models import EmailAddress, User
+from .tokens import verified_token_cache
 
 
 # Serializer to grab the authenticated user or return a generic unauthenticated user object
@@ -72,4 +77,24 @@ class EmailAddressSerializer(serializers.ModelSerializer):
             "is_primary",
         ]
 
-        
\ No newline at end of file
+
+class CachedTokenVerifySerializer(TokenVerifySerializer):
+    """
+    Verifies a token, reusing the verification from the verified token cache.
+    """
+
+    def validate(self, attrs):
+        token = verified_token_cache.get_or_verify(
+            attrs["token"], UntypedToken, namespace="verify"
+        )
+
+        # Blacklisting is checked on every request, as it isn't cached.
+        if (
+            api_settings.BLACKLIST_AFTER_ROTATION
+            and "rest_framework_simplejwt.token_blacklist" in settings.INSTALLED_APPS
+        ):
+            jti = token.get(api_settings.JTI_CLAIM)
+            if BlacklistedToken.objects.filter(token__jti=jti).exists():
+                raise serializers.ValidationError("Token is blacklisted")
+
+        return {}
@@ -1,4 +1,8 @@
 # import settings
 from django.conf import settings
 
-from .main import *
\ No newline at end of file
+from .api_views import *
+from .commands import *
+from .managers import *
+from .models import *
+from .tokens import *
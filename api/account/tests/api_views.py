@@ -0,0 +1,96 @@
+"""
+Tests for the API views of the account app.
+"""
+
+import json
+
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from account.models import EmailAddress, User
+
+PASSWORD = "test-password"
+
+
+# Password hashing is slow by design.
+fast_password_hashing = override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+)
+
+
+class ApiTestMixin:
+    """
+    Creates a user with two email addresses, and an access token for them.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="api")
+        self.user.set_password(PASSWORD)
+        self.user.save()
+        EmailAddress.objects.create(
+            user=self.user, email="api@example.com", is_primary=True
+        )
+        EmailAddress.objects.create(user=self.user, email="other@example.com")
+
+        response = self.client.post(
+            "/rest/v1/account/token/",
+            {"username": self.user.username, "password": PASSWORD},
+        )
+        self.access = response.json()["access"]
+        self.refresh = response.json()["refresh"]
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {self.access}"}
+
+
+@fast_password_hashing
+class ApiTestCase(ApiTestMixin, TestCase):
+    """
+    Runs each test in a transaction, with a user to make requests as.
+    """
+
+
+class CurrentUserEmailAddressesApiTests(ApiTestCase):
+    """
+    Tests listing the current user's email addresses.
+    """
+
+    def test_streams_the_email_addresses(self):
+        response = self.client.get(
+            "/rest/v1/account/user/email-addresses/", **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        email_addresses = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            {(e["id"], e["isPrimary"]) for e in email_addresses},
+            {
+                (str(e.id), e.is_primary)
+                for e in EmailAddress.objects.filter(user=self.user)
+            },
+        )
+
+    def test_requires_authentication(self):
+        response = self.client.get("/rest/v1/account/user/email-addresses/")
+        self.assertEqual(response.status_code, 401)
+
+
+@fast_password_hashing
+class AsyncCurrentUserEmailAddressesApiTests(ApiTestMixin, TransactionTestCase):
+    """
+    Tests streaming the current user's email addresses from the async view.
+
+    The rows are read in another thread, which only sees committed data.
+    """
+
+    def test_streams_the_email_addresses(self):
+        response = self.client.get(
+            "/rest/v1/account/async/user/email-addresses/", **self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        email_addresses = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(
+            {(e["id"], e["isPrimary"]) for e in email_addresses},
+            {
+                (str(e.id), e.is_primary)
+                for e in EmailAddress.objects.filter(user=self.user)
+            },
+        )
@@ -0,0 +1,260 @@
+"""
+Benchmarks for the account API.
+
+Each endpoint is requested repeatedly against a warm cache, recording latency
+percentiles, database queries and cache round trips. A test fails when an
+endpoint exceeds its budget in budgets.json. Query and cache budgets are always
+checked. Latency budgets depend on the machine, so they are only checked when
+ACCOUNT_BENCHMARK_LATENCY is set to 1, on a machine like the one they were set
+on.
+
+The benchmarks are not part of the default test run; run them explicitly on
+SQLite or PostgreSQL with any cache backend, e.g.:
+
+    python manage.py test account.tests.benchmarks
+
+Set ACCOUNT_BENCHMARK_ITERATIONS to change the number of measured requests.
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from account.models import EmailAddress, User
+from core.lib.caches import local_caches, shared_counters
+
+BUDGETS_PATH = Path(__file__).with_name("budgets.json")
+
+ITERATIONS = int(os.environ.get("ACCOUNT_BENCHMARK_ITERATIONS", default=50))
+
+# Whether to check the latency budgets, which only hold on the machine they
+# were set for.
+CHECK_LATENCY = bool(int(os.environ.get("ACCOUNT_BENCHMARK_LATENCY", default=0)))
+
+LATENCY_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+# The cache methods counted as round trips.
+CACHE_METHODS = [
+    "add",
+    "get",
+    "set",
+    "touch",
+    "delete",
+    "get_many",
+    "has_key",
+    "incr",
+    "decr",
+    "set_many",
+    "delete_many",
+    "clear",
+]
+
+PASSWORD = "benchmark-password"
+
+
+@contextmanager
+def count_cache_calls(alias="default"):
+    """
+    Count the calls to a cache's methods, each of which is one round trip to
+    the cache server.
+    """
+    cache = caches[alias]
+    calls = []
+    depth = [0]
+
+    def wrap(name):
+        method = getattr(cache, name)
+
+        def wrapper(*args, **kwargs):
+            # Backends may implement a method with others, e.g. get_many with
+            # get, so only the outermost call is counted.
+            if not depth[0]:
+                calls.append(name)
+            depth[0] += 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                depth[0] -= 1
+
+        return wrapper
+
+    for name in CACHE_METHODS:
+        setattr(cache, name, wrap(name))
+    try:
+        yield calls
+    finally:
+        for name in CACHE_METHODS:
+            delattr(cache, name)
+
+
+# Password hashing is slow by design, and would hide everything else the token
+# endpoint does. Test databases have no replica, so reads stay on the primary.
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    DATABASE_ROUTERS=[],
+)
+class AccountApiBenchmarkTests(TestCase):
+    """
+    Benchmarks the account API endpoints against their budgets.
+    """
+
+    results = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.budgets = json.loads(BUDGETS_PATH.read_text())
+        # Periodic flushes of the stats would add to the round trips counted.
+        cls.flushed = list(shared_counters)
+        cls.flush_intervals = [stats.flush_interval for stats in cls.flushed]
+        for stats in cls.flushed:
+            stats.flush_interval = 0
+
+    @classmethod
+    def tearDownClass(cls):
+        for stats, flush_interval in zip(cls.flushed, cls.flush_intervals):
+            stats.flush_interval = flush_interval
+        super().tearDownClass()
+        if cls.results:
+            sys.stderr.write(cls.format_results(cls.results))
+
+    def setUp(self):
+        for cache in local_caches:
+            cache.clear()
+        self.user = User.objects.create(username="benchmark")
+        self.user.set_password(PASSWORD)
+        self.user.save()
+        EmailAddress.objects.create(
+            user=self.user, email="benchmark@example.com", is_primary=True
+        )
+        self.email_address = EmailAddress.objects.get(email="benchmark@example.com")
+        EmailAddress.objects.create(user=self.user, email="other@example.com")
+
+        response = self.client.post(
+            "/rest/v1/account/token/",
+            {"username": self.user.username, "password": PASSWORD},
+        )
+        self.refresh = response.json()["refresh"]
+        self.access = response.json()["access"]
+
+    ###
+    # Helpers
+    ###
+
+    def measure(self, name, request):
+        """
+        Send a request once to warm the caches, then ITERATIONS times, and
+        check the measurements against the endpoint's budget.
+        """
+        response = request()
+        self.assertLess(response.status_code, 400, self.read(response))
+
+        latencies = []
+        queries = []
+        cache_calls = []
+        for _ in range(ITERATIONS):
+            with count_cache_calls() as calls:
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = request()
+                    body = self.read(response)
+                    latencies.append((time.perf_counter() - start) * 1000)
+            self.assertLess(response.status_code, 400, body)
+            queries.append(len(captured.captured_queries))
+            cache_calls.append(len(calls))
+
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        result = {
+            "p50_ms": round(quantiles[49], 3),
+            "p95_ms": round(quantiles[94], 3),
+            "p99_ms": round(quantiles[98], 3),
+            "queries": max(queries),
+            "cache_calls": max(cache_calls),
+        }
+        self.results[name] = result
+
+        budget = self.budgets[name]
+        for metric, limit in budget.items():
+            if metric in LATENCY_METRICS and not CHECK_LATENCY:
+                continue
+            self.assertLessEqual(
+                result[metric],
+                limit,
+                f"{name} exceeded its {metric} budget: {result[metric]} > {limit}",
+            )
+        return result
+
+    @staticmethod
+    def read(response):
+        """
+        Return the body of a response, consuming it if streamed.
+        """
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def get(self, path):
+        return lambda: self.client.get(path, HTTP_AUTHORIZATION=f"Bearer {self.access}")
+
+    def post(self, path, data):
+        return lambda: self.client.post(path, data)
+
+    @staticmethod
+    def format_results(results):
+        """
+        Return the results as a table.
+        """
+        columns = [*LATENCY_METRICS, "queries", "cache_calls"]
+        lines = [f"\n{'endpoint':<32}" + "".join(f"{c:>12}" for c in columns)]
+        for name, result in sorted(results.items()):
+            lines.append(f"{name:<32}" + "".join(f"{result[c]:>12}" for c in columns))
+        return "\n".join(lines) + "\n"
+
+    ###
+    # Benchmarks
+    ###
+
+    def test_token_obtain(self):
+        self.measure(
+            "token_obtain",
+            self.post(
+                "/rest/v1/account/token/",
+                {"username": self.user.username, "password": PASSWORD},
+            ),
+        )
+
+    def test_token_refresh(self):
+        self.measure(
+            "token_refresh",
+            self.post("/rest/v1/account/token/refresh/", {"refresh": self.refresh}),
+        )
+
+    def test_token_verify(self):
+        self.measure(
+            "token_verify",
+            self.post("/rest/v1/account/token/verify/", {"token": self.access}),
+        )
+
+    def test_current_user(self):
+        self.measure("current_user", self.get("/rest/v1/account/user/"))
+
+    def test_current_user_email_addresses(self):
+        self.measure(
+            "current_user_email_addresses",
+            self.get("/rest/v1/account/user/email-addresses/"),
+        )
+
+    def test_current_user_email_address(self):
+        self.measure(
+            "current_user_email_address",
+            self.get(f"/rest/v1/account/user/email-addresses/{self.email_address.id}/"),
+        )
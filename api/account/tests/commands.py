@@ -0,0 +1,57 @@
+"""
+Tests for the management commands of the account app.
+"""
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from account.models import EmailAddress, User
+
+
+class UserSeederTests(TestCase):
+    """
+    Tests seeding users in bulk.
+    """
+
+    def seed(self, **options):
+        stdout = StringIO()
+        call_command("user_seeder", stdout=stdout, **options)
+        return stdout.getvalue()
+
+    @override_settings(ENABLE_USERNAMES=False)
+    def test_seeds_users_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            output = self.seed(count=5, bulk=True, batch_size=2)
+
+        self.assertIn("5/5", output)
+        self.assertEqual(User.objects.count(), 5)
+        # A batch of users and one of their email addresses per batch.
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 6)
+
+        users = User.objects.annotate(
+            email_count=Count("email_addresses"),
+            primary_count=Count(
+                "email_addresses", filter=Q(email_addresses__is_primary=True)
+            ),
+        )
+        for user in users:
+            self.assertIn(user.email_count, [1, 2, 3])
+            self.assertEqual(user.primary_count, 1)
+            primary = EmailAddress.objects.get(user=user, is_primary=True)
+            self.assertEqual(user.username, primary.email)
+
+    def test_hashes_the_password_once(self):
+        self.seed(count=3, bulk=True, batch_size=2)
+        passwords = set(User.objects.values_list("password", flat=True))
+        self.assertEqual(len(passwords), 1)
+        self.assertTrue(User.objects.first().check_password("password"))
+
+    def test_rejects_invalid_batch_sizes(self):
+        with self.assertRaises(CommandError):
+            self.seed(count=3, bulk=True, batch_size=0)
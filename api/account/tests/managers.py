@@ -0,0 +1,266 @@
+"""
+Tests for the managers of the account app.
+"""
+
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from account.models import EmailAddress, RedeemableKey, User
+
+
+class OtherDatabaseRouter:
+    """
+    Sends writes to a database that doesn't exist, unless they're made to a
+    given database.
+    """
+
+    def db_for_write(self, model, **hints):
+        return "other"
+
+
+def create_email_address(user, email, **kwargs):
+    """
+    Create an email address, and return it as EmailAddressManager.create
+    doesn't.
+    """
+    EmailAddress.objects.create(user, email, **kwargs)
+    return EmailAddress.objects.get(email=email)
+
+
+class SetPrimariesTests(TestCase):
+    """
+    Tests switching the primary email addresses of users.
+    """
+
+    def setUp(self):
+        self.users = []
+        self.old = []
+        self.new = []
+        for i in range(2):
+            user = User.objects.create(username=f"old{i}@example.com")
+            self.users.append(user)
+            self.old.append(
+                create_email_address(user, f"old{i}@example.com", is_primary=True)
+            )
+            self.new.append(create_email_address(user, f"new{i}@example.com"))
+
+    def primaries(self):
+        return set(
+            EmailAddress.objects.filter(is_primary=True).values_list("email", flat=True)
+        )
+
+    @override_settings(ENABLE_USERNAMES=False)
+    def test_switches_primaries_and_syncs_usernames(self):
+        with CaptureQueriesContext(connection) as queries:
+            EmailAddress.objects.set_primaries(self.new)
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+
+        self.assertEqual(self.primaries(), {"new0@example.com", "new1@example.com"})
+        self.assertEqual(
+            set(User.objects.values_list("username", flat=True)),
+            {"new0@example.com", "new1@example.com"},
+        )
+        self.assertTrue(all(e.is_primary for e in self.new))
+
+    @override_settings(ENABLE_USERNAMES=True)
+    def test_keeps_usernames_if_enabled(self):
+        EmailAddress.objects.set_primaries(self.new)
+        self.assertEqual(
+            set(User.objects.values_list("username", flat=True)),
+            {"old0@example.com", "old1@example.com"},
+        )
+
+    def test_clears_the_caches_of_users_on_commit(self):
+        user = self.users[0]
+        User.objects.serialize_current_user(id=user.id)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            EmailAddress.objects.set_primary(self.new[0])
+        serialized = User.objects.serialize_current_user(id=user.id)
+        self.assertEqual(serialized["username"], "old0@example.com")
+
+        for callback in callbacks:
+            callback()
+        serialized = User.objects.serialize_current_user(id=user.id)
+        self.assertEqual(serialized["username"], "new0@example.com")
+
+    def test_switches_primaries_on_the_given_database(self):
+        with override_settings(DATABASE_ROUTERS=[OtherDatabaseRouter()]):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.new[0].is_primary = True
+                self.new[0].save(using="default")
+                EmailAddress.objects.db_manager("default").set_primaries([self.new[1]])
+        self.assertEqual(self.primaries(), {"new0@example.com", "new1@example.com"})
+
+    def test_saving_a_primary_email_address_switches_primaries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.new[0].is_primary = True
+            self.new[0].save()
+        self.assertEqual(self.primaries(), {"new0@example.com", "old1@example.com"})
+
+
+class RedeemableKeyTestCase(TestCase):
+    """
+    Creates a user with an email address to redeem.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="redeemer")
+        self.email_address = create_email_address(self.user, "redeemer@example.com")
+
+    def create_key(self, **kwargs):
+        return RedeemableKey.objects.create(self.user, self.email_address, **kwargs)
+
+
+class RedeemableKeyClaimTests(RedeemableKeyTestCase):
+    """
+    Tests claiming keys.
+    """
+
+    def test_claims_a_key_once(self):
+        key = self.create_key()
+
+        claimed = RedeemableKey.objects.claim(key.id)
+        self.assertEqual(claimed.id, key.id)
+        self.assertIsNotNone(claimed.date_redeemed)
+
+        self.assertIsNone(RedeemableKey.objects.claim(key.id))
+
+    def test_doesnt_claim_expired_keys(self):
+        key = self.create_key(date_expires=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(RedeemableKey.objects.claim(key.id))
+        key.refresh_from_db()
+        self.assertIsNone(key.date_redeemed)
+
+    def test_redeem_verifies_the_email_address(self):
+        key = self.create_key()
+        self.assertTrue(key.redeem(self.user))
+
+        self.email_address.refresh_from_db()
+        self.assertTrue(self.email_address.is_verified)
+        self.assertTrue(self.email_address.is_primary)
+        with self.assertRaises(ValueError):
+            RedeemableKey.objects.get(id=key.id).redeem(self.user)
+
+
+class RedeemableKeyPurgeTests(RedeemableKeyTestCase):
+    """
+    Tests purging old keys.
+    """
+
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.before = now - timedelta(days=1)
+        old = now - timedelta(days=2)
+
+        self.old_redeemed = [self.create_key() for _ in range(3)]
+        RedeemableKey.objects.filter(
+            id__in=[key.id for key in self.old_redeemed]
+        ).update_uncached(date_redeemed=old)
+        self.old_expired = self.create_key(date_expires=old)
+        self.recently_expired = self.create_key(date_expires=now)
+        self.live = self.create_key(date_expires=now + timedelta(days=1))
+        self.recently_redeemed = self.create_key()
+        RedeemableKey.objects.filter(id=self.recently_redeemed.id).update_uncached(
+            date_redeemed=now
+        )
+
+    def remaining(self):
+        return set(RedeemableKey.objects.values_list("id", flat=True))
+
+    def test_purges_only_old_keys(self):
+        self.assertEqual(RedeemableKey.objects.purge(self.before, chunk_size=2), 4)
+        self.assertEqual(
+            self.remaining(),
+            {self.recently_expired.id, self.live.id, self.recently_redeemed.id},
+        )
+
+    def test_stops_after_max_chunks(self):
+        purged = RedeemableKey.objects.purge(self.before, chunk_size=2, max_chunks=1)
+        self.assertEqual(purged, 2)
+        self.assertEqual(len(self.remaining()), 5)
+
+
+class RedeemableKeyIssueTests(RedeemableKeyTestCase):
+    """
+    Tests issuing keys in batches.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            create_email_address(self.user, f"redeemer{i}@example.com")
+
+    def test_issues_a_key_per_redeemable_in_batches(self):
+        expires_in = timedelta(days=1)
+        with CaptureQueriesContext(connection) as queries:
+            ids = list(
+                RedeemableKey.objects.issue(
+                    EmailAddress.objects.all(), expires_in=expires_in, batch_size=2
+                )
+            )
+
+        self.assertEqual(len(ids), 5)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 3)
+
+        keys = RedeemableKey.objects.filter(id__in=ids)
+        self.assertEqual(
+            {key.redeemable_uuid for key in keys},
+            set(EmailAddress.objects.values_list("id", flat=True)),
+        )
+        for key in keys:
+            self.assertEqual(key.user_id, self.user.id)
+            self.assertGreater(key.date_expires, timezone.now())
+
+    def test_issues_keys_without_users(self):
+        ids = list(RedeemableKey.objects.issue(EmailAddress.objects.all(), None))
+        self.assertFalse(
+            RedeemableKey.objects.filter(id__in=ids, user__isnull=False).exists()
+        )
+
+
+class RedeemableKeyPrefetchTests(RedeemableKeyTestCase):
+    """
+    Tests loading the redeemables of keys in bulk.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            self.create_key()
+            create_email_address(self.user, f"redeemer{i}@example.com")
+        RedeemableKey.objects.create(self.user, self.user)
+        # Warm the ContentType cache, as any request would have.
+        for key in RedeemableKey.objects.all():
+            key.redeemable_content_type
+
+    def test_loads_redeemables_with_a_query_per_content_type(self):
+        # The keys, their email addresses and their users.
+        with self.assertNumQueries(3):
+            keys = list(RedeemableKey.objects.with_redeemables())
+            redeemables = [key.redeemable for key in keys]
+            content_types = [key.redeemable_content_type for key in keys]
+
+        self.assertEqual(len(keys), 4)
+        self.assertEqual(
+            sorted(type(redeemable).__name__ for redeemable in redeemables),
+            ["EmailAddress", "EmailAddress", "EmailAddress", "User"],
+        )
+        self.assertEqual(
+            {content_type.model for content_type in content_types},
+            {"emailaddress", "user"},
+        )
+
+    def test_keeps_loading_redeemables_when_chained(self):
+        queryset = RedeemableKey.objects.with_redeemables().filter(user=self.user)
+        with self.assertNumQueries(3):
+            for key in queryset:
+                key.redeemable
+                key.redeemable_content_type
@@ -0,0 +1,62 @@
+"""
+Tests for the models of the account app.
+"""
+
+from unittest import mock
+
+from django.test import TestCase
+
+from account.models import User
+
+
+@mock.patch("account.models.forget_user_tokens")
+class UserTokenTests(TestCase):
+    """
+    Tests that users' verified tokens are forgotten when their credentials
+    change.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="tokens")
+        self.user.set_password("password")
+        self.user.save()
+
+    def test_forgets_tokens_when_the_password_changes(self, forget_user_tokens):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password("changed")
+            self.user.save()
+        forget_user_tokens.assert_called_once_with(self.user.pk)
+
+    def test_forgets_tokens_when_the_user_is_deactivated(self, forget_user_tokens):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        forget_user_tokens.assert_called_once_with(self.user.pk)
+
+    def test_forgets_tokens_on_commit(self, forget_user_tokens):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.set_password("changed")
+            self.user.save()
+        forget_user_tokens.assert_not_called()
+        for callback in callbacks:
+            callback()
+        forget_user_tokens.assert_called_once_with(self.user.pk)
+
+    def test_keeps_tokens_when_other_fields_change(self, forget_user_tokens):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Changed"
+            self.user.save()
+        forget_user_tokens.assert_not_called()
+
+    def test_keeps_tokens_of_users_loaded_without_credentials(self, forget_user_tokens):
+        user = User.objects.only("id", "first_name").get(id=self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.first_name = "Changed"
+            user.save()
+        forget_user_tokens.assert_not_called()
+
+    def test_forgets_tokens_when_the_user_is_deleted(self, forget_user_tokens):
+        pk = self.user.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        forget_user_tokens.assert_called_once_with(pk)
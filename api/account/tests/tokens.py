@@ -0,0 +1,66 @@
+"""
+Tests for the verified token cache.
+"""
+
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from account.tokens import VerifiedTokenCache, forget_user_tokens
+from core.lib.caches import local_caches
+
+
+class VerifiedTokenCacheTests(SimpleTestCase):
+    """
+    Tests verifying tokens once per process.
+    """
+
+    def setUp(self):
+        self.cache = VerifiedTokenCache(max_entries=10)
+        self.addCleanup(local_caches.remove, self.cache.cache)
+        token = AccessToken()
+        token["user_id"] = "user"
+        self.raw_token = str(token)
+        self.verify = mock.Mock(side_effect=AccessToken)
+
+    def test_verifies_tokens_once(self):
+        token = self.cache.get_or_verify(self.raw_token, self.verify)
+        cached = self.cache.get_or_verify(self.raw_token.encode(), self.verify)
+        self.verify.assert_called_once()
+        self.assertIsInstance(cached, AccessToken)
+        self.assertEqual(cached.payload, token.payload)
+        self.assertEqual(cached.token, self.raw_token.encode())
+
+    def test_caches_namespaces_separately(self):
+        self.cache.get_or_verify(self.raw_token, self.verify)
+        self.cache.get_or_verify(self.raw_token, self.verify, namespace="verify")
+        self.assertEqual(self.verify.call_count, 2)
+
+    def test_doesnt_cache_invalid_tokens(self):
+        verify = mock.Mock(side_effect=ValueError)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                self.cache.get_or_verify(self.raw_token, verify)
+        self.assertEqual(verify.call_count, 2)
+
+    def test_keeps_tokens_until_they_expire(self):
+        token = AccessToken()
+        token.set_exp(lifetime=timedelta(seconds=30))
+        start = time.monotonic()
+        self.cache.get_or_verify(str(token), AccessToken)
+        (entry,) = self.cache.cache._entries.values()
+        self.assertAlmostEqual(entry[2] - start, 30, delta=2)
+
+    def test_forgets_the_tokens_of_a_user(self):
+        self.cache.get_or_verify(self.raw_token, self.verify)
+        other = RefreshToken()
+        other["user_id"] = "other"
+        self.cache.get_or_verify(str(other), RefreshToken)
+
+        forget_user_tokens("user")
+        self.cache.get_or_verify(self.raw_token, self.verify)
+        self.assertEqual(self.verify.call_count, 2)
+        self.assertEqual(len(self.cache.cache), 2)
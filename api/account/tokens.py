@@ -0,0 +1,112 @@
+"""
+Verified token cache for the account app.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from core.lib.caches import (
+    CACHE_MISS,
+    LocalCache,
+    publish_invalidation,
+    start_invalidation_listener,
+)
+
+
+class VerifiedTokenCache:
+    """
+    A bounded, in-process LRU of verified JSON web tokens keyed by a digest of
+    the encoded token. A token's signature and claims are verified once per
+    process, and its claims are reused until the token expires.
+
+    A cached token is only forgotten before it expires along with every token
+    of its user, when the user's password or active status changes. Nothing
+    revokes a single token: simplejwt's token blacklist only covers
+    refresh tokens, which the verify endpoint checks on every request, and an
+    access token authenticates until it expires with or without this cache.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.cache = LocalCache(max_entries=max_entries)
+
+    def get_or_verify(self, raw_token, verify, namespace="auth"):
+        """
+        Return the verified token for raw_token, calling verify(raw_token) to
+        verify it if it isn't cached. Tokens verified in different ways, such
+        as by authentication and by the verify endpoint, are cached under
+        different namespaces.
+        """
+        raw_token = self.to_bytes(raw_token)
+        key = self.get_key(raw_token, namespace)
+
+        start_invalidation_listener()
+        epoch = self.cache.epoch
+        entry = self.cache.get(key)
+        if entry is not CACHE_MISS:
+            token_class, payload = entry
+            return self.restore(token_class, raw_token, payload)
+
+        token = verify(raw_token)
+
+        # Verified tokens always have an expiry claim.
+        timeout = token["exp"] - time.time()
+        if timeout > 0:
+            dependencies = []
+            user_id = token.get(api_settings.USER_ID_CLAIM)
+            if user_id is not None:
+                dependencies.append(self.get_user_key(user_id))
+            entry = (type(token), dict(token.payload))
+            self.cache.set(key, entry, dependencies, epoch, timeout=timeout)
+        return token
+
+    @staticmethod
+    def restore(token_class, raw_token, payload):
+        """
+        Return a token of token_class for an already verified raw token.
+        """
+        # Sets up the token as Token.__init__ does, without decoding and
+        # verifying it again.
+        token = token_class.__new__(token_class)
+        token.token = raw_token
+        token.current_time = aware_utcnow()
+        token.payload = dict(payload)
+        return token
+
+    @staticmethod
+    def to_bytes(raw_token):
+        """
+        Return the raw token as bytes.
+        """
+        return raw_token.encode() if isinstance(raw_token, str) else raw_token
+
+    @classmethod
+    def get_key(cls, raw_token, namespace="token"):
+        """
+        Return the cache key for a raw token.
+        """
+        digest = hashlib.sha256(cls.to_bytes(raw_token)).hexdigest()
+        return f"jwt:{namespace}:{digest}"
+
+    @staticmethod
+    def get_user_key(user_id):
+        """
+        Return the key every cached token of a user depends on.
+        """
+        return f"jwt:user:{user_id}"
+
+
+verified_token_cache = VerifiedTokenCache(
+    max_entries=settings.JWT_VERIFIED_TOKEN_CACHE_SIZE
+)
+
+
+def forget_user_tokens(user_id):
+    """
+    Evict every token of a user from the verified token cache of every
+    process, e.g. when their password or active status changes.
+    """
+    publish_invalidation([VerifiedTokenCache.get_user_key(user_id)])
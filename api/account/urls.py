@@ -11,4 +11,21 @@ urlpatterns = [
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path('token/verify/', TokenVerifyView.as_view(), name='token_verify'),
+    path("user/", api_views.CurrentUserApiView.as_view(), name="current_user"),
+    path(
+        "user/email-addresses/",
+        api_views.CurrentUserEmailAddressesApiView.as_view(),
+        name="current_user_email_addresses",
+    ),
+    path(
+        "user/email-addresses/<uuid:id>/",
+        api_views.CurrentUserEmailAddressesApiView.as_view(),
+        name="current_user_email_address",
+    ),
+    path("async/user/", api_views.current_user_async, name="current_user_async"),
+    path(
+        "async/user/email-addresses/",
+        api_views.current_user_email_addresses_async,
+        name="current_user_email_addresses_async",
+    ),
 ]
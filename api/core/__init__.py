@@ -32,7 +32,97 @@ CACHE_HOST = os.environ.get("DJANGO_CACHE_HOST", default="redis")
 
 CACHE_KEY_PREFIX = os.environ.get("DJANGO_CACHE_KEY_PREFIX", default="")
 
-CACHE_DEFAULT_TIMEOUT = os.environ.get("DJANGO_CACHE_DEFAULT_TIMEOUT", default=300)
+CACHE_DEFAULT_TIMEOUT = int(os.environ.get("DJANGO_CACHE_DEFAULT_TIMEOUT", default=300))
+
+# How long an entry past its timeout may still be served while a single worker
+# recomputes it.
+CACHE_STALE_TIMEOUT = int(os.environ.get("DJANGO_CACHE_STALE_TIMEOUT", default=60))
+
+# How long a worker may hold the lock to recompute an entry.
+CACHE_LOCK_TIMEOUT = int(os.environ.get("DJANGO_CACHE_LOCK_TIMEOUT", default=10))
+
+# How long a worker waits for another worker to compute a missing entry before
+# computing it itself.
+CACHE_LOCK_WAIT = float(os.environ.get("DJANGO_CACHE_LOCK_WAIT", default=2))
+
+# Optional in-process cache in front of the shared cache for serialized data.
+CACHE_LOCAL_ENABLED = bool(int(os.environ.get("DJANGO_CACHE_LOCAL_ENABLED", default=0)))
+
+CACHE_LOCAL_MAX_ENTRIES = int(
+    os.environ.get("DJANGO_CACHE_LOCAL_MAX_ENTRIES", default=1024)
+)
+
+CACHE_LOCAL_TIMEOUT = int(os.environ.get("DJANGO_CACHE_LOCAL_TIMEOUT", default=5))
+
+# Redis pub/sub channel used to evict entries from every process's local cache.
+CACHE_INVALIDATION_CHANNEL = os.environ.get(
+    "DJANGO_CACHE_INVALIDATION_CHANNEL", default="cache-invalidation"
+)
+
+# How often each process adds its cache name family stats to the shared
+# totals, in seconds. 0 disables flushing.
+CACHE_STATS_FLUSH_INTERVAL = int(
+    os.environ.get("DJANGO_CACHE_STATS_FLUSH_INTERVAL", default=10)
+)
+
+# Whether BaseModelManager stores entries in the compact format of
+# core.lib.codecs. Entries in either format are always read.
+CACHE_VALUE_CODEC_ENABLED = bool(
+    int(os.environ.get("DJANGO_CACHE_VALUE_CODEC_ENABLED", default=1))
+)
+
+# Entries encoded to at least this many bytes are compressed.
+CACHE_VALUE_COMPRESS_MIN_SIZE = int(
+    os.environ.get("DJANGO_CACHE_VALUE_COMPRESS_MIN_SIZE", default=1024)
+)
+
+# How long an authenticated user is cached for.
+AUTH_USER_CACHE_TIMEOUT = int(
+    os.environ.get("DJANGO_AUTH_USER_CACHE_TIMEOUT", default=60)
+)
+
+# How many verified JSON web tokens each process keeps.
+JWT_VERIFIED_TOKEN_CACHE_SIZE = int(
+    os.environ.get("DJANGO_JWT_VERIFIED_TOKEN_CACHE_SIZE", default=10000)
+)
+
+# How long redeemed and expired keys are kept before they are purged.
+REDEEMABLE_KEY_RETENTION_DAYS = int(
+    os.environ.get("DJANGO_REDEEMABLE_KEY_RETENTION_DAYS", default=30)
+)
+
+# The directory of the built client served by catchall_prod.
+SPA_BUILD_DIR = Path(
+    os.environ.get("DJANGO_SPA_BUILD_DIR", default=BASE_DIR.parent / "client" / "dist")
+)
+
+# Whether to record per-request metrics, exposed on /metrics.
+METRICS_ENABLED = bool(int(os.environ.get("DJANGO_METRICS_ENABLED", default=1)))
+
+# The client addresses allowed to read /metrics. Behind a proxy the scraper
+# must reach the app directly, as the address checked is the peer's.
+METRICS_ALLOWED_IPS = os.environ.get(
+    "DJANGO_METRICS_ALLOWED_IPS", default="127.0.0.1 ::1"
+).split(" ")
+
+# How often each process adds its request metrics to the shared totals, in
+# seconds. 0 disables flushing.
+METRICS_FLUSH_INTERVAL = int(
+    os.environ.get("DJANGO_METRICS_FLUSH_INTERVAL", default=10)
+)
+
+# How long database connections are kept between requests, in seconds.
+SQL_CONN_MAX_AGE = int(os.environ.get("SQL_CONN_MAX_AGE", default=60))
+
+# Whether to check a kept connection still works before reusing it.
+SQL_CONN_HEALTH_CHECKS = bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", default=1)))
+
+# How many PostgreSQL connections each process pools. 0 disables pooling.
+SQL_POOL_SIZE = int(os.environ.get("SQL_POOL_SIZE", default=0))
+
+# How long a request waits for a pooled connection when all are in use, in
+# seconds.
+SQL_POOL_TIMEOUT = float(os.environ.get("SQL_POOL_TIMEOUT", default=10))
 
 SQL_HOST = os.environ.get("SQL_HOST", default="postgres")
 
@@ -47,3 +137,23 @@ SQL_PASSWORD = os.environ.get("SQL_PASSWORD", default="postgres")
 SQL_ENGINE = os.environ.get(
     "DJANGO_SQL_ENGINE", default="django.db.backends.postgresql"
 )
+
+# The read replica, used by read-only code paths if SQL_REPLICA_HOST or
+# SQL_REPLICA_DATABASE is set. Unset values are those of the primary.
+SQL_REPLICA_HOST = os.environ.get("SQL_REPLICA_HOST", default=SQL_HOST)
+
+SQL_REPLICA_PORT = os.environ.get("SQL_REPLICA_PORT", default=SQL_PORT)
+
+SQL_REPLICA_DATABASE = os.environ.get("SQL_REPLICA_DATABASE", default=SQL_DATABASE)
+
+SQL_REPLICA_USER = os.environ.get("SQL_REPLICA_USER", default=SQL_USER)
+
+SQL_REPLICA_PASSWORD = os.environ.get("SQL_REPLICA_PASSWORD", default=SQL_PASSWORD)
+
+SQL_REPLICA_ENABLED = bool(
+    os.environ.get("SQL_REPLICA_HOST") or os.environ.get("SQL_REPLICA_DATABASE")
+)
+
+# How long a client reads from the primary after writing, in seconds. Should
+# exceed the replication lag.
+SQL_REPLICA_PIN_SECONDS = int(os.environ.get("SQL_REPLICA_PIN_SECONDS", default=5))
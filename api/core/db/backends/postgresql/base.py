@@ -0,0 +1,172 @@
+"""
+PostgreSQL backend with connection health checks and an optional per-process
+connection pool.
+
+Settings, next to the usual ones in DATABASES:
+
+- CONN_HEALTH_CHECKS: check a persistent connection still works before the
+  first query of each request, instead of failing that request.
+- POOL_SIZE: keep up to this many connections per process in a pool, which
+  Django's connections are taken from and returned to. Meant to be used with
+  CONN_MAX_AGE = 0, so connections go back to the pool after each request,
+  and at least as large as the number of threads of each process.
+- POOL_TIMEOUT: how long to wait for a connection to be returned when every
+  pooled connection is in use, in seconds. Defaults to 10.
+"""
+
+import os
+import threading
+
+import psycopg2.extras
+import psycopg2.pool
+from django.db.backends.postgresql import base
+
+# The connection pools of this process, by alias. Pools are never shared with
+# forked processes.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    A thread-safe pool of up to size connections, opened as they are needed
+    and kept once returned. Taking a connection while all are in use waits up
+    to timeout seconds for one to be returned.
+    """
+
+    def __init__(self, size, timeout, **conn_params):
+        super().__init__(0, size, **conn_params)
+        # The pool opens minconn connections upfront, and keeps no more than
+        # minconn of those returned to it, so it is only raised now.
+        self.minconn = size
+        self.timeout = timeout
+        self._available = threading.BoundedSemaphore(size)
+
+    def getconn(self, key=None):
+        if not self._available.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError(
+                f"No pooled connection was returned within {self.timeout} seconds."
+            )
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self._available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._available.release()
+
+
+def get_pool(alias, size, timeout, conn_params):
+    """
+    Return the connection pool of this process for a database alias.
+    """
+    key = (alias, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(size, timeout, **conn_params)
+                _pools[key] = pool
+    return pool
+
+
+def close_pools():
+    """
+    Close every connection pooled by this process, e.g. before forking.
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        for key in [key for key in _pools if key[1] == pid]:
+            _pools.pop(key).closeall()
+
+
+def is_usable(connection):
+    """
+    Return whether a psycopg2 connection works, leaving it outside of any
+    transaction.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        # Unless the connection is in autocommit mode, the query opened a
+        # transaction, in which its session can't be set up.
+        connection.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.pool = None
+
+    def connect(self):
+        super().connect()
+        # A new connection doesn't need checking.
+        self.health_check_done = True
+
+    def ensure_connection(self):
+        """
+        Guarantee that a connection to the database is established, replacing
+        a persistent connection that stopped working if health checks are on.
+        """
+        if (
+            self.connection is not None
+            and self.settings_dict.get("CONN_HEALTH_CHECKS")
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        # Called as requests start and finish, so each request checks its
+        # connection once.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def get_new_connection(self, conn_params):
+        size = self.settings_dict.get("POOL_SIZE")
+        if not size:
+            return super().get_new_connection(conn_params)
+
+        timeout = self.settings_dict.get("POOL_TIMEOUT", 10)
+        self.pool = get_pool(self.alias, size, timeout, conn_params)
+        connection = self.pool.getconn()
+        if self.settings_dict.get("CONN_HEALTH_CHECKS") and not is_usable(connection):
+            self.pool.putconn(connection, close=True)
+            connection = self.pool.getconn()
+
+        # As in get_new_connection of the PostgreSQL backend.
+        options = self.settings_dict["OPTIONS"]
+        try:
+            self.isolation_level = options["isolation_level"]
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        self.pool = None
+        with self.wrap_database_errors:
+            if pool is _pools.get((self.alias, os.getpid())):
+                # Rolls back an open transaction before pooling the connection.
+                pool.putconn(self.connection, close=bool(self.connection.closed))
+            else:
+                # Inherited from the process this one was forked from.
+                self.connection.close()
@@ -0,0 +1,32 @@
+"""
+Migration operations for the apps of this project.
+"""
+
+from django.contrib.postgres import operations
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    """
+    Adds an index without locking out writes to the table, with CREATE INDEX
+    CONCURRENTLY, on PostgreSQL. Other databases, such as the SQLite databases
+    of development and tests, add it as AddIndex does.
+
+    Migrations using it must set atomic = False.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
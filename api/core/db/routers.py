@@ -0,0 +1,179 @@
+"""
+Routes the reads of read-only code paths to a replica database.
+
+Code paths opt in with use_replica, as a decorator or context manager. Their
+reads go to the "replica" alias, unless the current client recently wrote to
+the primary: BaseModel.save and delete pin the rest of the request to the
+primary, and ReplicaPinningMiddleware keeps the client pinned for
+SQL_REPLICA_PIN_SECONDS with a cookie, so a client reads its own writes while
+the replica catches up. Writes always go to the primary.
+
+The pin is per client, not per user: a user's other browsers and devices
+don't carry the cookie, so they may read from the replica up to the
+replication lag behind a write made elsewhere.
+"""
+
+import asyncio
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+REPLICA_DB_ALIAS = "replica"
+
+# Set on clients that wrote to the primary, while their reads are pinned.
+PIN_COOKIE_NAME = "primary_pin"
+
+# Whether the current code path only reads.
+_read_only = ContextVar("replica_read_only", default=False)
+
+# The pinning state of the request being handled, if any. Context variables
+# follow the request into the threads of sync_to_async.
+_current_pin = ContextVar("replica_pin", default=None)
+
+
+class PrimaryPin:
+    """
+    Whether a request reads from the primary, and whether it wrote to it.
+    """
+
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class use_replica:
+    """
+    Send the reads of a block or function to the replica, unless the current
+    client is pinned to the primary. Works on sync and async functions.
+    """
+
+    def __enter__(self):
+        self._token = _read_only.set(True)
+
+    def __exit__(self, *exc_info):
+        _read_only.reset(self._token)
+
+    def __call__(self, func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with use_replica():
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with use_replica():
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+
+class use_primary:
+    """
+    Send the reads of a block to the primary, even inside a use_replica code
+    path, e.g. to compute data shared through the cache.
+    """
+
+    def __enter__(self):
+        self._token = _read_only.set(False)
+
+    def __exit__(self, *exc_info):
+        _read_only.reset(self._token)
+
+
+def pin_to_primary():
+    """
+    Send the remaining reads of the current request to the primary, and pin
+    the client to it for SQL_REPLICA_PIN_SECONDS. Called after every write.
+    """
+    pin = _current_pin.get()
+    if pin is not None:
+        pin.pinned = True
+        pin.wrote = True
+
+
+def is_pinned():
+    """
+    Return whether the current request reads from the primary.
+    """
+    pin = _current_pin.get()
+    return pin is not None and pin.pinned
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of use_replica code paths to the replica.
+
+    Entries cached by BaseModelManager are always computed on the primary, as
+    they are served to every client until the next write invalidates them.
+    Otherwise an entry read from a lagging replica could be cached right after
+    the invalidation, and kept stale until it times out.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_only.get() and not is_pinned():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data.
+        return True
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pins requests carrying the pin cookie to the primary, and sets the cookie
+    on responses to requests that wrote.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, so Django calls it
+            # without a thread under ASGI.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        pin = PrimaryPin(pinned=PIN_COOKIE_NAME in request.COOKIES)
+        token = _current_pin.set(pin)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_pin.reset(token)
+        return self.set_cookie(response, pin)
+
+    async def __acall__(self, request):
+        pin = PrimaryPin(pinned=PIN_COOKIE_NAME in request.COOKIES)
+        token = _current_pin.set(pin)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_pin.reset(token)
+        return self.set_cookie(response, pin)
+
+    def set_cookie(self, response, pin):
+        if pin.wrote:
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                "1",
+                max_age=settings.SQL_REPLICA_PIN_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,487 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Returned when there is no valid entry for a key.
+CACHE_MISS = object()
+
+# Seconds to wait before resubscribing after losing the invalidation channel.
+LISTENER_RETRY_INTERVAL = 1
+
+# Prefix of the shared cache keys holding the totals of every process.
+CACHE_FAMILY_STATS_PREFIX = "cache-stats"
+
+# Seconds between attempts to take the lock of shared totals.
+SHARED_TOTALS_LOCK_POLL_INTERVAL = 0.01
+
+
+class CacheTierStats:
+    """
+    Hit and miss counters for a cache tier.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        """
+        Record a lookup.
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def as_dict(self):
+        """
+        Return the counters as a dictionary.
+        """
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# Every LocalCache, so invalidations reach all of them.
+local_caches = []
+
+
+class LocalCache:
+    """
+    A bounded, thread-safe, in-process LRU cache with a per-entry timeout.
+
+    Each entry lists the generation keys it depends on, so invalidating a
+    generation key evicts every entry computed against it.
+    """
+
+    def __init__(self, max_entries=1024, timeout=5):
+        local_caches.append(self)
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.stats = CacheTierStats()
+        self._entries = OrderedDict()
+        self._dependents = {}
+        self._lock = threading.Lock()
+        # Incremented on every invalidation, so an entry read from the shared
+        # cache before an invalidation is never stored after it.
+        self.epoch = 0
+
+    def get(self, key):
+        """
+        Return the data for a key, or CACHE_MISS.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._evict(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self.stats.record(entry is not None)
+        return CACHE_MISS if entry is None else entry[1]
+
+    def set(self, key, data, dependencies, epoch, timeout=None):
+        """
+        Store the data for a key, unless an invalidation happened since epoch.
+        The timeout defaults to the cache's timeout.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            if key in self._entries:
+                self._evict(key)
+            expires_at = time.monotonic() + timeout
+            self._entries[key] = (dependencies, data, expires_at)
+            for dependency in dependencies:
+                self._dependents.setdefault(dependency, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate(self, dependencies):
+        """
+        Evict every entry depending on any of the given generation keys.
+        """
+        with self._lock:
+            self.epoch += 1
+            for dependency in dependencies:
+                for key in self._dependents.pop(dependency, ()):
+                    self._evict(key)
+
+    def clear(self):
+        """
+        Evict every entry.
+        """
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+            self._dependents.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for dependency in entry[0]:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[dependency]
+
+
+# Every SharedCounters, so their flushing can be paused together.
+shared_counters = []
+
+
+class SharedCounters:
+    """
+    Thread-safe integer counters for each tuple of label values, e.g.
+    (route, method, status).
+
+    Counters are kept for this process, and a background thread adds their
+    increments to totals in the shared cache every flush_interval seconds, so
+    the totals of every process can be read from any of them. The fields in
+    maxima keep the largest value recorded rather than a sum.
+
+    Sums are added with the cache's atomic increments. The index of label
+    values and the maxima are read and written back, so processes take turns
+    updating them under a lock in the shared cache.
+    """
+
+    def __init__(self, prefix, fields, maxima=(), flush_interval=10):
+        shared_counters.append(self)
+        self.prefix = prefix
+        self.fields = tuple(fields)
+        self.maxima = frozenset(maxima)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the counters of this process, flushed or not.
+        """
+        with self._lock:
+            self.totals = defaultdict(self._new_counters)
+            self._pending = defaultdict(self._new_counters)
+
+    def add(self, labels, **values):
+        """
+        Add values to the counters of a tuple of label values.
+        """
+        self.start_flusher()
+        with self._lock:
+            self._merge(self.totals[labels], values)
+            self._merge(self._pending[labels], values)
+
+    def snapshot(self):
+        """
+        Return a copy of the counters of this process.
+        """
+        with self._lock:
+            return {labels: dict(c) for labels, c in self.totals.items()}
+
+    def flush(self):
+        """
+        Add the increments since the last flush to the shared totals.
+
+        If another process holds the lock for longer than CACHE_LOCK_WAIT, the
+        increments are kept for the next flush.
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = defaultdict(self._new_counters)
+        if not pending:
+            return
+
+        try:
+            if not self._update_index_and_maxima(pending):
+                logger.warning(
+                    "Timed out waiting to flush the %s counters.", self.prefix
+                )
+                with self._lock:
+                    for labels, counters in pending.items():
+                        self._merge(self._pending[labels], counters)
+                return
+            for labels, counters in pending.items():
+                key = self._get_key(labels)
+                for field, value in counters.items():
+                    if field not in self.maxima and value:
+                        cache.add(f"{key}:{field}", 0, None)
+                        cache.incr(f"{key}:{field}", value)
+        except Exception:
+            logger.exception("Failed to flush the %s counters.", self.prefix)
+
+    def get_shared_totals(self):
+        """
+        Return the totals of every process from the shared cache.
+        """
+        index = cache.get(f"{self.prefix}:labels") or set()
+        keys = {
+            (labels, field): f"{self._get_key(labels)}:{field}"
+            for labels in index
+            for field in self.fields
+        }
+        values = cache.get_many(keys.values())
+        totals = {labels: self._new_counters() for labels in index}
+        for (labels, field), key in keys.items():
+            totals[labels][field] = values.get(key, 0)
+        return totals
+
+    def clear_shared_totals(self):
+        """
+        Delete the totals from the shared cache.
+        """
+        index_key = f"{self.prefix}:labels"
+        index = cache.get(index_key) or set()
+        cache.delete_many(
+            [
+                index_key,
+                *(
+                    f"{self._get_key(labels)}:{field}"
+                    for labels in index
+                    for field in self.fields
+                ),
+            ]
+        )
+
+    def start_flusher(self):
+        """
+        Start the thread flushing the counters of this process.
+
+        Safe to call repeatedly, and starts a new thread after a fork.
+        """
+        if self._flusher_pid == os.getpid() or not self.flush_interval:
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._flush_periodically, daemon=True)
+            thread.start()
+            self._flusher_pid = os.getpid()
+
+    def _update_index_and_maxima(self, pending):
+        """
+        Add the label values of pending to the shared index, and raise the
+        shared maxima to theirs, holding the lock of the shared totals. Return
+        whether the lock could be taken.
+        """
+        lock_key = f"{self.prefix}:lock"
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while not cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(SHARED_TOTALS_LOCK_POLL_INTERVAL)
+
+        try:
+            index_key = f"{self.prefix}:labels"
+            index = cache.get(index_key) or set()
+            if not index.issuperset(pending):
+                cache.set(index_key, index | set(pending), None)
+            for labels, counters in pending.items():
+                key = self._get_key(labels)
+                for field in self.maxima:
+                    value = counters[field]
+                    if value > (cache.get(f"{key}:{field}") or 0):
+                        cache.set(f"{key}:{field}", value, None)
+        finally:
+            cache.delete(lock_key)
+        return True
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval or 1)
+            # A flush interval of 0 pauses flushing.
+            if self.flush_interval:
+                self.flush()
+
+    def _new_counters(self):
+        return dict.fromkeys(self.fields, 0)
+
+    def _merge(self, counters, values):
+        for field, value in values.items():
+            if field in self.maxima:
+                counters[field] = max(counters[field], value)
+            else:
+                counters[field] += value
+
+    def _get_key(self, labels):
+        # Label values may hold characters cache keys can't.
+        digest = hashlib.md5(json.dumps(labels).encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+
+class CacheFamilyStats(SharedCounters):
+    """
+    Hit, miss, recompute time and entry size counters for each cache name
+    family, e.g. "account.user:serialize_current_user__<id>", totalled across
+    processes through the shared cache.
+    """
+
+    # Times are counted in microseconds, as the shared cache increments ints.
+    FIELDS = (
+        "hits",
+        "misses",
+        "recomputes",
+        "recompute_us",
+        "entries",
+        "bytes",
+        "max_bytes",
+    )
+
+    def __init__(self, flush_interval=10):
+        super().__init__(
+            CACHE_FAMILY_STATS_PREFIX,
+            self.FIELDS,
+            maxima=["max_bytes"],
+            flush_interval=flush_interval,
+        )
+
+    def record(self, family, hits=0, misses=0, recompute_time=None, sizes=()):
+        """
+        Record lookups for a family, the time of a recompute if there was one,
+        and the sizes of the entries stored.
+        """
+        values = {"hits": hits, "misses": misses}
+        if recompute_time is not None:
+            values["recomputes"] = 1
+            values["recompute_us"] = int(recompute_time * 1000000)
+        if sizes:
+            values["entries"] = len(sizes)
+            values["bytes"] = sum(sizes)
+            values["max_bytes"] = max(sizes)
+        self.add((family,), **values)
+
+    def snapshot(self):
+        """
+        Return a copy of the counters of this process by family.
+        """
+        return {family: c for (family,), c in super().snapshot().items()}
+
+    def get_shared_totals(self):
+        """
+        Return the totals of every process from the shared cache by family.
+        """
+        return {family: c for (family,), c in super().get_shared_totals().items()}
+
+
+def get_entry_size(entry):
+    """
+    Return the size of a cache entry, or None unless it is already encoded.
+    Sizing any other entry would mean serializing it a second time.
+    """
+    if isinstance(entry, bytes):
+        return len(entry)
+    return None
+
+
+local_cache = LocalCache(
+    max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+    timeout=settings.CACHE_LOCAL_TIMEOUT,
+)
+
+# Lookups against the shared cache made by BaseModelManager.
+shared_cache_stats = CacheTierStats()
+
+cache_family_stats = CacheFamilyStats(
+    flush_interval=settings.CACHE_STATS_FLUSH_INTERVAL
+)
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def get_cache_stats():
+    """
+    Return the hit and miss counters for each cache tier.
+    """
+    return {
+        "local": local_cache.stats.as_dict(),
+        "shared": shared_cache_stats.as_dict(),
+    }
+
+
+def get_redis_connection():
+    """
+    Return a connection to the shared Redis cache, or None for other backends.
+    """
+    try:
+        from django_redis import get_redis_connection
+    except ImportError:
+        return None
+    try:
+        return get_redis_connection("default")
+    except NotImplementedError:
+        return None
+
+
+def publish_invalidation(generation_keys):
+    """
+    Evict the entries depending on the given keys from the local caches of
+    this process and, through Redis pub/sub, of every other process.
+
+    With other cache backends only this process is notified, and the other
+    processes rely on their local caches' timeouts.
+    """
+    generation_keys = list(generation_keys)
+    for cache in local_caches:
+        cache.invalidate(generation_keys)
+    connection = get_redis_connection()
+    if connection is not None:
+        connection.publish(
+            settings.CACHE_INVALIDATION_CHANNEL, json.dumps(generation_keys)
+        )
+
+
+def start_invalidation_listener():
+    """
+    Subscribe this process to invalidations from the other processes.
+
+    Safe to call repeatedly, and starts a new listener after a fork.
+    """
+    global _listener_pid
+
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        connection = get_redis_connection()
+        if connection is not None:
+            thread = threading.Thread(target=_listen, args=(connection,), daemon=True)
+            thread.start()
+        _listener_pid = os.getpid()
+
+
+def _listen(connection):
+    while True:
+        try:
+            pubsub = connection.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+            # Invalidations may have been missed while unsubscribed.
+            _clear_local_caches()
+            for message in pubsub.listen():
+                generation_keys = json.loads(message["data"])
+                for cache in local_caches:
+                    cache.invalidate(generation_keys)
+        except Exception:
+            logger.exception("Lost the cache invalidation channel.")
+            _clear_local_caches()
+            time.sleep(LISTENER_RETRY_INTERVAL)
+
+
+def _clear_local_caches():
+    for cache in local_caches:
+        cache.clear()
@@ -0,0 +1,92 @@
+import re
+from functools import lru_cache
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from django.utils.itercompat import is_iterable
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+CAMELIZE_RE = re.compile(r"[a-z0-9]?_[a-z0-9]")
+
+UNDERSCOREIZE_RE = re.compile(
+    r"([a-z0-9]|[A-Z]?(?=[A-Z0-9](?=[a-z0-9]|$)))"
+    r"([A-Z]|(?<=[a-z])[0-9](?=[0-9A-Z]|$)|(?<=[A-Z])[0-9](?=[0-9]|$))"
+)
+
+# The number of distinct keys remembered in each direction. API payloads only
+# ever contain a few hundred distinct keys, so in practice every key is
+# translated once per process.
+KEY_CACHE_SIZE = 4096
+
+
+def _underscore_to_camel(match):
+    group = match.group()
+    if len(group) == 3:
+        return group[0] + group[2].upper()
+    return group[1].upper()
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def camelize_key(key):
+    """
+    Return a snake_case key in camelCase.
+    """
+    if "_" not in key:
+        return key
+    return CAMELIZE_RE.sub(_underscore_to_camel, key)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def underscoreize_key(key):
+    """
+    Return a camelCase key in snake_case.
+    """
+    return UNDERSCOREIZE_RE.sub(r"\1_\2", key).lower()
+
+
+def camelize(data):
+    """
+    Return data with the keys of every nested dictionary in camelCase.
+
+    Translates keys as djangorestframework_camel_case does, but memoizes each
+    key's translation. The REST framework's ReturnDict and ReturnList keep
+    their serializer, which the browsable API renders forms from, and other
+    iterables, such as generators, become lists.
+    """
+    if isinstance(data, dict):
+        items = {_camelize_key(key): camelize(value) for key, value in data.items()}
+        if isinstance(data, ReturnDict):
+            return ReturnDict(items, serializer=data.serializer)
+        return items
+    if isinstance(data, (list, tuple)):
+        items = [camelize(item) for item in data]
+        if isinstance(data, ReturnList):
+            return ReturnList(items, serializer=data.serializer)
+        return items
+    if isinstance(data, Promise):
+        return force_str(data)
+    if is_iterable(data) and not isinstance(data, (str, bytes)):
+        return [camelize(item) for item in data]
+    return data
+
+
+def underscoreize(data):
+    """
+    Return data with the keys of every nested dictionary in snake_case.
+    """
+    if isinstance(data, dict):
+        return {
+            underscoreize_key(key) if isinstance(key, str) else key: value
+            for key, value in zip(data, map(underscoreize, data.values()))
+        }
+    if isinstance(data, list):
+        return [underscoreize(item) for item in data]
+    return data
+
+
+def _camelize_key(key):
+    if isinstance(key, str):
+        return camelize_key(key)
+    if isinstance(key, Promise):
+        return camelize_key(force_str(key))
+    return key
@@ -0,0 +1,165 @@
+"""
+A compact binary format for the entries BaseModelManager caches.
+
+An encoded value starts with two header bytes: the format version, then flags
+saying how the rest was encoded. Values of an unknown version are rejected
+rather than misread, so versions of the code writing different formats can
+run side by side during a rollout.
+"""
+
+import datetime
+import decimal
+import pickle
+import uuid
+import zlib
+
+from django.conf import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+FORMAT_VERSION = 1
+
+# Flags of the second header byte.
+FLAG_MSGPACK = 0x01  # Encoded with msgpack rather than pickle.
+FLAG_ZLIB = 0x02  # Compressed with zlib.
+KNOWN_FLAGS = FLAG_MSGPACK | FLAG_ZLIB
+
+# msgpack extension types, for the types cached data holds that msgpack has
+# none for.
+EXT_TUPLE = 1
+EXT_UUID = 2
+EXT_DATETIME = 3
+EXT_DATE = 4
+EXT_DECIMAL = 5
+EXT_RENDERED_JSON = 6
+
+
+class CacheValueError(ValueError):
+    """
+    Raised for a value that can't be decoded.
+    """
+
+
+class CacheValueCodec:
+    """
+    Encodes values with msgpack, or with pickle when msgpack isn't installed
+    or a value holds a type the extension types don't cover, and compresses
+    encoded values of at least compress_min_size bytes with zlib.
+
+    Only exact types are encoded with msgpack, so decoding returns values of
+    the same types as were encoded, e.g. tuples stay tuples.
+    """
+
+    def __init__(self, compress_min_size=1024, compress_level=1, use_msgpack=True):
+        self.compress_min_size = compress_min_size
+        self.compress_level = compress_level
+        self.use_msgpack = use_msgpack and msgpack is not None
+
+    def encode(self, value):
+        """
+        Return value encoded as bytes.
+        """
+        flags = 0
+        payload = None
+        if self.use_msgpack:
+            try:
+                payload = self._packb(value)
+                flags |= FLAG_MSGPACK
+            except (TypeError, ValueError, OverflowError):
+                payload = None
+        if payload is None:
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        if self.compress_min_size is not None and (
+            len(payload) >= self.compress_min_size
+        ):
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                payload = compressed
+                flags |= FLAG_ZLIB
+
+        return bytes((FORMAT_VERSION, flags)) + payload
+
+    def decode(self, data):
+        """
+        Return the value encoded in data. Raises CacheValueError if data isn't
+        in a format this codec reads.
+        """
+        if len(data) < 2 or data[0] != FORMAT_VERSION:
+            raise CacheValueError("Unknown cache value format version.")
+        flags = data[1]
+        if flags & ~KNOWN_FLAGS:
+            raise CacheValueError(f"Unknown cache value flags {flags:#x}.")
+        if flags & FLAG_MSGPACK and msgpack is None:
+            raise CacheValueError("The cache value needs msgpack to be decoded.")
+
+        payload = memoryview(data)[2:]
+        try:
+            if flags & FLAG_ZLIB:
+                payload = zlib.decompress(payload)
+            if flags & FLAG_MSGPACK:
+                return self._unpackb(payload)
+            return pickle.loads(payload)
+        except CacheValueError:
+            raise
+        except Exception as e:
+            raise CacheValueError("Invalid cache value.") from e
+
+    def _packb(self, value):
+        return msgpack.packb(
+            value, default=self._default, strict_types=True, use_bin_type=True
+        )
+
+    def _unpackb(self, payload):
+        return msgpack.unpackb(
+            payload, ext_hook=self._ext_hook, raw=False, strict_map_key=False
+        )
+
+    def _default(self, obj):
+        cls = type(obj)
+        if cls is tuple:
+            return msgpack.ExtType(EXT_TUPLE, self._packb(list(obj)))
+        if cls is uuid.UUID:
+            return msgpack.ExtType(EXT_UUID, obj.bytes)
+        if cls is datetime.datetime and (
+            obj.tzinfo is None or type(obj.tzinfo) is datetime.timezone
+        ):
+            return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+        if cls is datetime.date:
+            return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+        if cls is decimal.Decimal:
+            return msgpack.ExtType(EXT_DECIMAL, str(obj).encode())
+        if isinstance(obj, bytes):
+            # Imported here, as the REST framework can't be imported while
+            # models are loading.
+            from core.lib.renderers import RenderedJSON
+
+            if cls is RenderedJSON:
+                return msgpack.ExtType(EXT_RENDERED_JSON, bytes(obj))
+        # Falls back to pickle.
+        raise TypeError(f"Can't encode {cls.__name__} with msgpack.")
+
+    def _ext_hook(self, code, data):
+        if code == EXT_TUPLE:
+            return tuple(self._unpackb(data))
+        if code == EXT_UUID:
+            return uuid.UUID(bytes=data)
+        if code == EXT_DATETIME:
+            return datetime.datetime.fromisoformat(data.decode())
+        if code == EXT_DATE:
+            return datetime.date.fromisoformat(data.decode())
+        if code == EXT_DECIMAL:
+            return decimal.Decimal(data.decode())
+        if code == EXT_RENDERED_JSON:
+            from core.lib.renderers import RenderedJSON
+
+            return RenderedJSON(data)
+        raise CacheValueError(f"Unknown msgpack extension type {code}.")
+
+
+cache_value_codec = CacheValueCodec(
+    compress_min_size=settings.CACHE_VALUE_COMPRESS_MIN_SIZE
+)
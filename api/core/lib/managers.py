@@ -1,14 +1,213 @@
-from django.db import models
+import time
+from contextlib import nullcontext
+from itertools import islice
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, router, transaction
+from django.db.models.functions import JSONObject
+
+from core.db.routers import pin_to_primary, use_primary, use_replica
+from core.lib.caches import (
+    CACHE_MISS,
+    cache_family_stats,
+    get_entry_size,
+    local_cache,
+    publish_invalidation,
+    shared_cache_stats,
+    start_invalidation_listener,
+)
+from core.lib.codecs import CacheValueError, cache_value_codec
+
+# Generation keys never expire. If a generation key were evicted before the
+# entries versioned by it, those (possibly stale) entries could match again.
+GENERATION_TIMEOUT = None
+
+# Cached in place of an empty result, so empty results are cached like any
+# other and a missing object doesn't hit the database on every lookup.
+CACHED_EMPTY = "__cached_empty__"
+
+# Seconds between checks for an entry being computed by another worker.
+CACHE_LOCK_POLL_INTERVAL = 0.05
+
+# Rows fetched at a time by serialize_iter.
+STREAM_CHUNK_SIZE = 2000
+
+# Prefix of the annotations holding nested collections, which can't share the
+# name of the relation they are built from.
+NESTED_ANNOTATION_PREFIX = "_nested__"
+
+
+class JSONArrayAgg(models.Aggregate):
+    """
+    Aggregates its expression into a JSON array in the given ordering, e.g.
+    ["-created_at"]: JSONB_AGG on PostgreSQL and JSON_GROUP_ARRAY on SQLite.
+
+    SQLite only orders aggregates from 3.44, and older versions leave the
+    order of the items to the query plan.
+    """
+
+    function = "JSONB_AGG"
+    template = "%(function)s(%(distinct)s%(expressions)s%(ordering)s)"
+    output_field = models.JSONField()
+
+    def __init__(self, expression, ordering=(), **extra):
+        super().__init__(expression, **extra)
+        self.ordering = self._parse_expressions(
+            *(
+                models.F(o[1:]).desc() if isinstance(o, str) and o[0] == "-" else o
+                for o in ordering
+            )
+        )
+
+    def resolve_expression(self, *args, **kwargs):
+        self.ordering = [
+            expression.resolve_expression(*args, **kwargs)
+            for expression in self.ordering
+        ]
+        return super().resolve_expression(*args, **kwargs)
 
+    def get_source_expressions(self):
+        return super().get_source_expressions() + self.ordering
 
-class BaseModelManager(models.Manager):
+    def set_source_expressions(self, expressions):
+        # The ordering is compiled into the ORDER BY clause of as_sql.
+        index = len(expressions) - len(self.ordering)
+        self.ordering = expressions[index:]
+        return super().set_source_expressions(expressions[:index])
+
+    def as_sql(self, compiler, connection, **extra_context):
+        ordering_sql = []
+        ordering_params = []
+        if self.can_order(connection):
+            for expression in self.ordering:
+                sql, params = compiler.compile(expression)
+                ordering_sql.append(sql)
+                ordering_params.extend(params)
+        sql, params = super().as_sql(
+            compiler,
+            connection,
+            ordering=" ORDER BY " + ", ".join(ordering_sql) if ordering_sql else "",
+            **extra_context,
+        )
+        return sql, [*params, *ordering_params]
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function="JSON_GROUP_ARRAY", **extra_context
+        )
+
+    @staticmethod
+    def can_order(connection):
+        """
+        Return whether a database orders the input of aggregates.
+        """
+        if connection.vendor != "sqlite":
+            return True
+        return connection.Database.sqlite_version_info >= (3, 44, 0)
+
+
+class BaseQuerySet(models.QuerySet):
+    """
+    A base queryset that keeps the model's caches in sync with bulk writes.
+    """
+
+    def update(self, **kwargs):
+        """
+        Update the queryset and invalidate all caches for the model, and those
+        of the objects depending on the updated rows, once the transaction
+        commits.
+        """
+        manager = self.model._default_manager
+        using = self.db_for_write
+        with manager.dependency_lookup(using):
+            dependent_ids = manager.get_dependent_ids(
+                queryset=self.using(using), values=kwargs
+            )
+            rows = super().update(**kwargs)
+        pin_to_primary()
+        transaction.on_commit(
+            lambda: manager.clear_caches_of(dependent_ids), using=using
+        )
+        return rows
+
+    update.alters_data = True
+
+    @property
+    def db_for_write(self):
+        """
+        Return the database alias writes to this queryset go to.
+        """
+        return self._db or router.db_for_write(self.model, **self._hints)
+
+    def update_uncached(self, **kwargs):
+        """
+        Update the queryset without invalidating any caches, for callers that
+        invalidate the affected objects themselves.
+        """
+        rows = super().update(**kwargs)
+        pin_to_primary()
+        return rows
+
+    update_uncached.alters_data = True
+
+    def delete(self):
+        """
+        Delete the queryset and invalidate all caches for the model, and those
+        of the objects depending on the deleted rows, once the transaction
+        commits.
+        """
+        manager = self.model._default_manager
+        using = self.db_for_write
+        with manager.dependency_lookup(using):
+            dependent_ids = manager.get_dependent_ids(queryset=self.using(using))
+            result = super().delete()
+        pin_to_primary()
+        transaction.on_commit(
+            lambda: manager.clear_caches_of(dependent_ids), using=using
+        )
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class BaseModelManager(models.Manager.from_queryset(BaseQuerySet)):
     """
     A base model manager that provides a method to serialize the queryset.
+
+    Cached data is invalidated through generation counters rather than by
+    deleting keys. Every entry is stored together with the generations it was
+    computed against:
+
+    - "<namespace>:gen" is bumped by bulk writes and invalidates everything.
+    - "<namespace>:gen:<id>" is bumped when an object is saved or deleted and
+      invalidates the cache names containing "<id>" for that object.
+    - "<namespace>:gen:*" is bumped along with any object generation and
+      invalidates the cache names without "<id>".
+
+    Reading an entry and its generations is a single get_many, and clearing
+    the caches of any number of objects is a single set_many.
     """
-    # Caches to manage when the model is saved or deleted.
+
+    # Caches to manage when the model is saved or deleted, e.g.
+    # "serialize_current_user__<id>".
     cache_names = []
 
+    # Foreign keys to the objects whose caches include this model's rows, e.g.
+    # ["user"] when a user's serialization includes their email addresses.
+    # Their caches are cleared along with this model's, by instance and bulk
+    # writes alike.
+    cache_dependencies = []
+
+    # Fields get_cached leaves out of its entries, e.g. secrets. They are
+    # deferred on the instances it returns, and loaded when first accessed.
+    uncached_fields = []
+
     def to_dict_by_id(self, values_list, single=False, key="id"):
         """
         Return a dictionary of a single object or queryset keyed by id.
@@ -20,43 +219,788 @@ class BaseModelManager(models.Manager):
         else:
             return {item.get(key): item for item in values_list}
 
+    @use_replica()
     def serialize(
         self, queryset=None, format="json", fields=[], single=False, **kwargs
     ):
         """
         Serialize the queryset.
+
+        If cache_name is provided, the result is cached under it. Cache names
+        containing "<id>" also require cache_id.
+
+        If render is True, the result is returned camel-cased and encoded as
+        RenderedJSON, which the JSON renderer sends as is. The rendered result
+        is cached under its own cache name, invalidated along with cache_name.
+
+        Uncached results are read from the replica, if one is configured, and
+        cached ones are computed on the primary.
         """
 
-        # If cache_name is provided, check if the cache exists.
+        if queryset is None:
+            queryset = self.get_queryset()
+
+        def compute():
+            values_list = self.project(queryset, fields)
+            if not values_list:
+                return CACHED_EMPTY
+            return self.to_dict_by_id(values_list=values_list, single=single)
+
         cache_name = kwargs.pop("cache_name", None)
+        cache_id = kwargs.pop("cache_id", None)
+
+        render = kwargs.pop("render", False)
+        if render:
+            # Imported here, as the REST framework can't be imported while
+            # models are loading.
+            from core.lib.renderers import render_json
+
+            compute_data = compute
+
+            def compute():
+                data = compute_data()
+                return data if data == CACHED_EMPTY else render_json(data)
+
+            if cache_name:
+                cache_name = f"{cache_name}.json"
+
+        # If cache_name is provided, get the data from the cache.
         if cache_name:
-            cache_data = cache.get(cache_name)
-            if cache_data:
-                return cache_data
+            data = self.cache_get_or_compute(cache_name, compute, id=cache_id)
+        else:
+            data = compute()
+
+        return self._serialized(data, single=single, render=render)
+
+    async def aserialize(
+        self, queryset=None, format="json", fields=[], single=False, **kwargs
+    ):
+        """
+        Serialize the queryset as serialize does, from an async context.
+
+        Fresh cache hits are served with the async cache API without leaving
+        the event loop. Anything else needs the ORM, which has no async API in
+        this version of Django, so it falls back to serialize in a thread.
+        """
+        cache_name = kwargs.get("cache_name")
+        if cache_name:
+            render = kwargs.get("render", False)
+            data = await self.acache_get_fresh(
+                f"{cache_name}.json" if render else cache_name,
+                id=kwargs.get("cache_id"),
+            )
+            if data is not CACHE_MISS:
+                return self._serialized(data, single=single, render=render)
+
+        return await sync_to_async(self.serialize)(
+            queryset=queryset, format=format, fields=fields, single=single, **kwargs
+        )
+
+    def _serialized(self, data, single=False, render=False):
+        """
+        Return serialized data, raising DoesNotExist or returning an empty
+        result for CACHED_EMPTY.
+        """
+        if data == CACHED_EMPTY:
+            if single:
+                raise self.model.DoesNotExist
+            if render:
+                from core.lib.renderers import render_json
+
+                return render_json({})
+            return {}
+        return data
 
+    @use_replica()
+    def serialize_many(self, ids, queryset=None, fields=[], key="id", **kwargs):
+        """
+        Serialize the objects with the given ids, keyed by the given ids.
+        Objects that don't exist are left out.
+
+        If cache_name is provided it must contain "<id>", and its entries are
+        shared with serialize(single=True) for the same cache name. The cached
+        entries are fetched with one get_many, the misses are loaded with one
+        query on the primary, and the cache is backfilled with one set_many.
+        """
         if queryset is None:
             queryset = self.get_queryset()
-        if fields:
-            queryset = queryset.values(*fields)
-        values_list = queryset.values_list()
-        data = self.to_dict_by_id(values_list=values_list, single=single)
+        if fields and key not in fields:
+            fields = [*fields, key]
+        ids = list(dict.fromkeys(ids))
 
-        # If cache_name is provided, set the cache.
-        if cache_name:
-            cache.set(cache_name, data)
+        def compute(ids):
+            values_list = self.project(queryset.filter(**{f"{key}__in": ids}), fields)
+            by_id = self.to_dict_by_id(values_list=values_list, key=key)
+            by_id = {str(k): v for k, v in by_id.items()}
+            return {id: by_id.get(str(id), CACHED_EMPTY) for id in ids}
+
+        cache_name = kwargs.pop("cache_name", None)
+        timeout = kwargs.pop("timeout", DEFAULT_TIMEOUT)
+        if not cache_name:
+            data = compute(ids) if ids else {}
+        else:
+            data = self._cache_get_or_compute_many(cache_name, compute, ids, timeout)
+        return {id: data[id] for id in ids if data[id] != CACHED_EMPTY}
+
+    def serialize_iter(
+        self, queryset=None, fields=[], chunk_size=STREAM_CHUNK_SIZE, **kwargs
+    ):
+        """
+        Iterate over the serialized rows of the queryset, fetching chunk_size
+        rows at a time, so memory use doesn't grow with the number of rows.
+        Streamed rows are never cached.
+        """
+        if queryset is None:
+            queryset = self.get_queryset()
+        # Rows are read after the caller returns, so pick the database now.
+        queryset = queryset.using(queryset.db)
+        return self.iter_project(queryset, fields, chunk_size=chunk_size)
+
+    def aserialize_iter(
+        self, queryset=None, fields=[], chunk_size=STREAM_CHUNK_SIZE, **kwargs
+    ):
+        """
+        Return an async iterator over the rows serialize_iter would yield.
+
+        The ORM has no async API in this version of Django, so each chunk of
+        rows is fetched in a thread. Every chunk is fetched in the same thread,
+        which holds the cursor, and closes it when the iterator is closed.
+        """
+        # Picks the database now, as serialize_iter does.
+        rows = self.serialize_iter(queryset, fields, chunk_size=chunk_size, **kwargs)
+        fetch_chunk = sync_to_async(
+            lambda: list(islice(rows, chunk_size)), thread_sensitive=True
+        )
+
+        async def iterate():
+            try:
+                while chunk := await fetch_chunk():
+                    for row in chunk:
+                        yield row
+            finally:
+                await sync_to_async(rows.close, thread_sensitive=True)()
+
+        return iterate()
+
+    def get_cached(self, id, timeout=DEFAULT_TIMEOUT):
+        """
+        Return the object with the given id, from the cache if possible.
+
+        The field values are cached rather than the object, so every call
+        returns a new instance. Fields in uncached_fields are deferred. Add
+        "get_cached__<id>" to cache_names for the cache to be cleared when the
+        object is saved or deleted.
+        """
+        field_names = self.get_cached_field_names()
+
+        def compute():
+            values = self.filter(pk=id).values_list(*field_names).first()
+            return CACHED_EMPTY if values is None else values
+
+        values = self.cache_get_or_compute(
+            "get_cached__<id>", compute, id=id, timeout=timeout
+        )
+        if values != CACHED_EMPTY and len(values) != len(field_names):
+            # Cached with other fields, e.g. by an earlier release.
+            _, generations, _ = self.cache_get("get_cached__<id>", id=id)
+            values = compute()
+            self.cache_set(
+                "get_cached__<id>", values, generations, id=id, timeout=timeout
+            )
+        if values == CACHED_EMPTY:
+            raise self.model.DoesNotExist
+        return self.model.from_db(self.db, field_names, values)
+
+    async def aget_cached(self, id, timeout=DEFAULT_TIMEOUT):
+        """
+        Return the object with the given id as get_cached does, from an async
+        context. Only cache misses fall back to a thread.
+        """
+        field_names = self.get_cached_field_names()
+        values = await self.acache_get_fresh("get_cached__<id>", id=id)
+        if values is CACHE_MISS or (
+            values != CACHED_EMPTY and len(values) != len(field_names)
+        ):
+            return await sync_to_async(self.get_cached)(id, timeout=timeout)
+        if values == CACHED_EMPTY:
+            raise self.model.DoesNotExist
+        return self.model.from_db(self.db, field_names, values)
+
+    def get_cached_field_names(self):
+        """
+        Return the names of the fields get_cached caches, in model order.
+        """
+        return [
+            field.attname
+            for field in self.model._meta.concrete_fields
+            if field.name not in self.uncached_fields
+        ]
+
+    ###
+    # Projection methods
+    ###
+
+    def project(self, queryset, fields=[]):
+        """
+        Return the queryset's rows as dictionaries of the given fields.
+
+        Fields behave as in QuerySet.values, except that fields spanning a
+        reverse foreign key or a many-to-many relation, such as
+        "email_addresses__email", are nested under the relation's name as a
+        list of dictionaries, e.g. {"email_addresses": [{"email": ...}]}. A
+        bare relation name nests the related primary keys. Each collection is
+        aggregated to JSON in a correlated subquery, so the rows are fetched
+        in one query without repeating a row per related object.
+        """
+        return list(self.iter_project(queryset, fields))
+
+    def iter_project(self, queryset, fields=[], chunk_size=None):
+        """
+        Iterate over the queryset's rows as project would return them.
+
+        If chunk_size is provided, rows are fetched that many at a time with
+        QuerySet.iterator instead of all at once.
+        """
+        flat_fields, nested_fields = self.get_nested_fields(fields)
+        if nested_fields and not flat_fields:
+            flat_fields = [f.attname for f in self.model._meta.concrete_fields]
 
+        annotations = {}
+        converters = {}
+        for name, subfields in nested_fields.items():
+            subquery, converters[name] = self.get_nested_subquery(name, subfields)
+            annotations[f"{NESTED_ANNOTATION_PREFIX}{name}"] = subquery
+
+        values_list = queryset.values(*flat_fields, **annotations)
+        if chunk_size:
+            values_list = values_list.iterator(chunk_size=chunk_size)
+        for values in values_list:
+            for name, converter in converters.items():
+                items = values.pop(f"{NESTED_ANNOTATION_PREFIX}{name}") or []
+                values[name] = [converter(item) for item in items]
+            yield values
+
+    def get_nested_fields(self, fields):
+        """
+        Split fields into fields for QuerySet.values, and the subfields of
+        each nested relation keyed by relation name.
+        """
+        flat_fields = []
+        nested_fields = {}
+        for field in fields:
+            name, _, subfield = field.partition("__")
+            if self._get_nested_relation(name) is None:
+                flat_fields.append(field)
+                continue
+            subfields = nested_fields.setdefault(name, [])
+            if subfield:
+                subfields.append(subfield)
+        return flat_fields, nested_fields
+
+    def get_nested_subquery(self, name, subfields=[]):
+        """
+        Return a subquery aggregating the subfields of a relation to a JSON
+        array, in the related model's default ordering, and a function
+        converting its items to Python values.
+        """
+        relation = self._get_nested_relation(name)
+        related_model = relation.related_model
+        subfields = subfields or [related_model._meta.pk.name]
+        # The primary key orders models without a default ordering, so the
+        # items always come in the same order.
+        ordering = related_model._meta.ordering or [related_model._meta.pk.name]
+
+        # The lookup from the related model back to this model.
+        if relation.auto_created:
+            lookup = relation.field.name
+        else:
+            lookup = relation.related_query_name()
+
+        rows = (
+            related_model._base_manager.filter(**{lookup: models.OuterRef("pk")})
+            .order_by()
+            .values(lookup)
+            .annotate(
+                items=JSONArrayAgg(
+                    JSONObject(**{subfield: subfield for subfield in subfields}),
+                    ordering=ordering,
+                )
+            )
+            .values("items")
+        )
+
+        # JSON loses types such as UUIDs and datetimes, so convert the
+        # subfields that are fields of the related model back.
+        to_python = {}
+        for subfield in subfields:
+            try:
+                field = related_model._meta.get_field(subfield)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.is_relation:
+                to_python[subfield] = field.to_python
+
+        def convert(item):
+            for subfield, convert_value in to_python.items():
+                if item.get(subfield) is not None:
+                    item[subfield] = convert_value(item[subfield])
+            return item
+
+        return models.Subquery(rows, output_field=models.JSONField()), convert
+
+    def _get_nested_relation(self, name):
+        """
+        Return the reverse foreign key or many-to-many relation with the given
+        name, or None.
+        """
+        try:
+            field = self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.is_relation and (field.one_to_many or field.many_to_many):
+            return field
+        return None
+
+    ###
+    # Cache methods
+    ###
+
+    def get_cache_namespace(self):
+        """
+        Return the namespace for this model's cache keys.
+        """
+        return self.model._meta.label_lower
+
+    def get_cache_key(self, cache_name, id=None):
+        """
+        Return the namespaced cache key for a cache name.
+        """
+        if "<id>" in cache_name:
+            if id is None:
+                raise ValueError(f"Cache name {cache_name} requires an id.")
+            cache_name = cache_name.replace("<id>", str(id))
+        return f"{self.get_cache_namespace()}:{cache_name}"
+
+    def get_generation_keys(self, cache_name, id=None):
+        """
+        Return the generation keys an entry for a cache name is versioned by.
+        """
+        namespace = self.get_cache_namespace()
+        if "<id>" in cache_name:
+            return [f"{namespace}:gen", f"{namespace}:gen:{id}"]
+        return [f"{namespace}:gen", f"{namespace}:gen:*"]
+
+    def get_cache_timeouts(self, timeout=DEFAULT_TIMEOUT):
+        """
+        Return the soft and hard timeouts for an entry.
+
+        An entry is recomputed once its soft timeout passes, but may be served
+        until its hard timeout while that happens.
+        """
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = cache.default_timeout
+        if timeout is None:
+            return None, None
+        return timeout, timeout + settings.CACHE_STALE_TIMEOUT
+
+    def cache_get(self, cache_name, id=None):
+        """
+        Return the cached data for a cache name, the current generations, and
+        whether the data is due to be recomputed.
+
+        The data is CACHE_MISS if there is no entry or if it was computed
+        against older generations. The generations must be passed back to
+        cache_set so data computed before an invalidation is never stored as
+        valid.
+        """
+        key = self.get_cache_key(cache_name, id=id)
+        generation_keys = self.get_generation_keys(cache_name, id=id)
+        values = cache.get_many([key, *generation_keys])
+        generations = tuple(values.get(k) for k in generation_keys)
+        data, is_stale = self._read_entry(values.get(key), generations)
+        return data, generations, is_stale
+
+    async def acache_get(self, cache_name, id=None):
+        """
+        Return what cache_get returns, using the async cache API.
+        """
+        key = self.get_cache_key(cache_name, id=id)
+        generation_keys = self.get_generation_keys(cache_name, id=id)
+        values = await cache.aget_many([key, *generation_keys])
+        generations = tuple(values.get(k) for k in generation_keys)
+        data, is_stale = self._read_entry(values.get(key), generations)
+        return data, generations, is_stale
+
+    async def acache_get_fresh(self, cache_name, id=None):
+        """
+        Return the cached data for a cache name if it isn't due to be
+        recomputed, from the local cache or the shared cache, or CACHE_MISS.
+        """
+        key = self.get_cache_key(cache_name, id=id)
+
+        if settings.CACHE_LOCAL_ENABLED:
+            start_invalidation_listener()
+            epoch = local_cache.epoch
+            data = local_cache.get(key)
+            if data is not CACHE_MISS:
+                cache_family_stats.record(self.get_cache_family(cache_name), hits=1)
+                return data
+
+        data, _, is_stale = await self.acache_get(cache_name, id=id)
+        shared_cache_stats.record(data is not CACHE_MISS)
+        if data is CACHE_MISS or is_stale:
+            # Recorded by the synchronous path computing the entry.
+            return CACHE_MISS
+        cache_family_stats.record(self.get_cache_family(cache_name), hits=1)
+
+        if settings.CACHE_LOCAL_ENABLED:
+            generation_keys = self.get_generation_keys(cache_name, id=id)
+            local_cache.set(key, data, generation_keys, epoch)
         return data
 
-    def clear_object_caches(self, instance=None, instances=None):
+    def cache_set(
+        self, cache_name, data, generations, id=None, timeout=DEFAULT_TIMEOUT
+    ):
         """
-        Clear all caches for this model.
+        Cache data for a cache name, versioned by the generations returned by
+        cache_get. Returns False if the data was not cached.
+        """
+        generation_keys = self.get_generation_keys(cache_name, id=id)
+        generations = self._init_generations(generation_keys, generations)
+        if generations is None:
+            return False
+
+        key = self.get_cache_key(cache_name, id=id)
+        entry, hard_timeout = self._make_entry(data, generations, timeout)
+        cache.set(key, entry, hard_timeout)
+        self._record_sizes(self.get_cache_family(cache_name), [entry])
+        return True
+
+    def _record_sizes(self, family, entries):
+        """
+        Record the sizes of entries stored for a family, as encoded.
+        """
+        sizes = [size for size in map(get_entry_size, entries) if size is not None]
+        if sizes:
+            cache_family_stats.record(family, sizes=sizes)
+
+    def _read_entry(self, entry, generations):
+        """
+        Return the data of an entry and whether it is due to be recomputed, or
+        CACHE_MISS if it wasn't computed against the given generations.
+        """
+        if entry is None or None in generations:
+            return CACHE_MISS, False
+        if isinstance(entry, bytes):
+            try:
+                entry = cache_value_codec.decode(entry)
+            except CacheValueError:
+                # Written in a format this version doesn't read.
+                return CACHE_MISS, False
+        entry_generations, data, refresh_at = entry
+        if entry_generations != generations:
+            return CACHE_MISS, False
+        return data, refresh_at is not None and refresh_at <= time.time()
+
+    def _make_entry(self, data, generations, timeout=DEFAULT_TIMEOUT):
+        """
+        Return an entry for data computed against the given generations, and
+        the timeout to store it with.
+        """
+        soft_timeout, hard_timeout = self.get_cache_timeouts(timeout)
+        refresh_at = None if soft_timeout is None else time.time() + soft_timeout
+        entry = (tuple(generations), data, refresh_at)
+        if settings.CACHE_VALUE_CODEC_ENABLED:
+            entry = cache_value_codec.encode(entry)
+        return entry, hard_timeout
+
+    def _init_generations(self, generation_keys, generations, initialized=None):
+        """
+        Return the generations with the missing ones initialized, or None if
+        another worker initialized one first.
+
+        Missing generations are initialized with add, so a concurrent
+        invalidation is never overwritten. The initialized dictionary can be
+        shared between calls to initialize each generation key only once.
         """
+        if initialized is None:
+            initialized = {}
+        generations = list(generations)
+        for i, generation_key in enumerate(generation_keys):
+            if generations[i] is not None:
+                continue
+            if generation_key not in initialized:
+                generation = uuid4().hex
+                if not cache.add(generation_key, generation, GENERATION_TIMEOUT):
+                    generation = None
+                initialized[generation_key] = generation
+            if initialized[generation_key] is None:
+                return None
+            generations[i] = initialized[generation_key]
+        return tuple(generations)
+
+    def cache_get_or_compute(
+        self, cache_name, compute, id=None, timeout=DEFAULT_TIMEOUT
+    ):
+        """
+        Return the cached data for a cache name, computing it if needed.
+
+        Only one worker at a time computes an entry. When an entry is due to
+        be recomputed, the other workers keep serving it until it has been.
+        When an entry is missing, the other workers wait for it for up to
+        CACHE_LOCK_WAIT seconds before computing it themselves.
+
+        If CACHE_LOCAL_ENABLED is set, fresh entries are also kept in an
+        in-process cache for up to CACHE_LOCAL_TIMEOUT seconds.
+        """
+        key = self.get_cache_key(cache_name, id=id)
+        generation_keys = self.get_generation_keys(cache_name, id=id)
+        family = self.get_cache_family(cache_name)
+
+        if settings.CACHE_LOCAL_ENABLED:
+            start_invalidation_listener()
+            epoch = local_cache.epoch
+            data = local_cache.get(key)
+            if data is not CACHE_MISS:
+                cache_family_stats.record(family, hits=1)
+                return data
+
+        def store_local(data):
+            if settings.CACHE_LOCAL_ENABLED:
+                local_cache.set(key, data, generation_keys, epoch)
+            return data
+
+        def hit(data):
+            cache_family_stats.record(family, hits=1)
+            return data
+
+        data, generations, is_stale = self.cache_get(cache_name, id=id)
+        shared_cache_stats.record(data is not CACHE_MISS)
+        if data is not CACHE_MISS and not is_stale:
+            return hit(store_local(data))
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+            try:
+                data = self._compute_recorded(family, compute)
+                if self.cache_set(
+                    cache_name, data, generations, id=id, timeout=timeout
+                ):
+                    store_local(data)
+            finally:
+                cache.delete(lock_key)
+            return data
+
+        # Another worker is computing the entry.
+        if data is not CACHE_MISS:
+            return hit(data)
+
+        deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(CACHE_LOCK_POLL_INTERVAL)
+            data, generations, _ = self.cache_get(cache_name, id=id)
+            if data is not CACHE_MISS:
+                return hit(store_local(data))
+
+        data = self._compute_recorded(family, compute)
+        if self.cache_set(cache_name, data, generations, id=id, timeout=timeout):
+            store_local(data)
+        return data
+
+    def get_cache_family(self, cache_name):
+        """
+        Return the family of a cache name, which groups its stats across ids,
+        e.g. "account.user:serialize_current_user__<id>".
+        """
+        return f"{self.get_cache_namespace()}:{cache_name}"
+
+    def _compute_recorded(self, family, compute):
+        """
+        Compute an entry on the primary, recording a miss with the time it
+        took.
+        """
+        start = time.perf_counter()
+        with use_primary():
+            data = compute()
+        cache_family_stats.record(
+            family, misses=1, recompute_time=time.perf_counter() - start
+        )
+        return data
+
+    def _cache_get_or_compute_many(self, cache_name, compute, ids, timeout):
+        """
+        Return the cached data for a cache name and each of the given ids,
+        computing the misses with a single call to compute.
+        """
+        if "<id>" not in cache_name:
+            raise ValueError(f"Cache name {cache_name} must contain <id>.")
+
+        family = self.get_cache_family(cache_name)
+        data = {}
+        misses = ids
+        if settings.CACHE_LOCAL_ENABLED:
+            start_invalidation_listener()
+            epoch = local_cache.epoch
+            misses = []
+            for id in ids:
+                item = local_cache.get(self.get_cache_key(cache_name, id=id))
+                if item is CACHE_MISS:
+                    misses.append(id)
+                else:
+                    data[id] = item
+        if not misses:
+            cache_family_stats.record(family, hits=len(data))
+            return data
+
+        keys = {id: self.get_cache_key(cache_name, id=id) for id in misses}
+        generation_keys = {
+            id: self.get_generation_keys(cache_name, id=id) for id in misses
+        }
+        values = cache.get_many(
+            [
+                *keys.values(),
+                *dict.fromkeys(k for gk in generation_keys.values() for k in gk),
+            ]
+        )
+
+        hits = {}
+        stale = {}
+        for id in misses:
+            generations = tuple(values.get(k) for k in generation_keys[id])
+            item, is_stale = self._read_entry(values.get(keys[id]), generations)
+            shared_cache_stats.record(item is not CACHE_MISS)
+            if item is CACHE_MISS or is_stale:
+                stale[id] = generations
+            else:
+                hits[id] = item
+
+        cache_family_stats.record(family, hits=len(ids) - len(stale))
+        computed = {}
+        if stale:
+            start = time.perf_counter()
+            with use_primary():
+                computed = compute(list(stale))
+            cache_family_stats.record(
+                family, misses=len(stale), recompute_time=time.perf_counter() - start
+            )
+            entries = {}
+            hard_timeout = None
+            initialized = {}
+            for id, generations in stale.items():
+                generations = self._init_generations(
+                    generation_keys[id], generations, initialized
+                )
+                if generations is not None:
+                    entry, hard_timeout = self._make_entry(
+                        computed[id], generations, timeout
+                    )
+                    entries[keys[id]] = entry
+                    hits[id] = computed[id]
+            if entries:
+                cache.set_many(entries, hard_timeout)
+                self._record_sizes(family, entries.values())
+
+        if settings.CACHE_LOCAL_ENABLED:
+            for id, item in hits.items():
+                local_cache.set(keys[id], item, generation_keys[id], epoch)
+
+        data.update(computed)
+        data.update(hits)
+        return data
+
+    def clear_object_caches(self, instance=None, instances=None, ids=None):
+        """
+        Clear all caches for the model instance(s), or for the given ids.
+        """
+        if not self.cache_names:
+            return
+
+        ids = list(ids or [])
         if instance:
             instances = [instance]
+        ids += [instance.pk for instance in instances or []]
+        if not ids:
+            return
+
+        # Bump the generation of every object, and of the caches not keyed by
+        # id, in one round trip.
+        namespace = self.get_cache_namespace()
+        generation = uuid4().hex
+        generations = {f"{namespace}:gen:{id}": generation for id in ids}
+        if any("<id>" not in cache_name for cache_name in self.cache_names):
+            generations[f"{namespace}:gen:*"] = generation
+        cache.set_many(generations, GENERATION_TIMEOUT)
+        if settings.CACHE_LOCAL_ENABLED:
+            publish_invalidation(generations)
+
+    def get_dependent_ids(self, queryset=None, instances=None, values=None):
+        """
+        Return the ids of the objects in cache_dependencies that the given
+        rows belong to, by foreign key name.
+
+        The rows are those of a queryset, read with one query, or instances.
+        Values being written by a bulk update add the objects the rows are
+        moved to.
+        """
+        if not self.cache_dependencies:
+            return {}
+
+        values = values or {}
+        fields = [self.model._meta.get_field(name) for name in self.cache_dependencies]
+        if queryset is not None:
+            rows = queryset.order_by().values_list(*(f.attname for f in fields))
+        else:
+            rows = [[getattr(i, f.attname) for f in fields] for i in instances]
+        dependent_ids = {f.name: set() for f in fields}
+        for row in rows:
+            for field, id in zip(fields, row):
+                dependent_ids[field.name].add(id)
+
+        for field in fields:
+            value = values.get(field.name, values.get(field.attname))
+            if isinstance(value, models.Model):
+                value = value.pk
+            if not hasattr(value, "resolve_expression"):
+                dependent_ids[field.name].add(value)
+
+        for ids in dependent_ids.values():
+            ids.discard(None)
+        return dependent_ids
+
+    def dependency_lookup(self, using):
+        """
+        Return a context manager for a bulk write and the lookup of the rows'
+        dependents, which share a transaction if there are dependents.
+        """
+        if not self.cache_dependencies:
+            return nullcontext()
+        return transaction.atomic(using=using, savepoint=False)
+
+    def clear_dependent_caches(self, dependent_ids):
+        """
+        Clear the caches of the objects returned by get_dependent_ids.
+        """
+        for name, ids in dependent_ids.items():
+            if ids:
+                related_model = self.model._meta.get_field(name).related_model
+                related_model._default_manager.clear_object_caches(ids=ids)
+
+    def clear_caches_of(self, dependent_ids):
+        """
+        Clear all caches for this model, and those of the objects returned by
+        get_dependent_ids.
+        """
+        self.clear_model_caches()
+        self.clear_dependent_caches(dependent_ids)
+
+    def clear_model_caches(self):
+        """
+        Clear all caches for this model.
+        """
+        if not self.cache_names:
+            return
 
-        # Clear all caches for this model instance(s).
-        for instance in instances:
-            for cache_name in self.cache_names:
-                if "<id>" in cache_name:
-                    cache_name = cache_name.replace("<id>", str(instance.id)) # type: ignore
-                cache.delete(cache_name)
+        generation_key = f"{self.get_cache_namespace()}:gen"
+        cache.set(generation_key, uuid4().hex, GENERATION_TIMEOUT)
+        if settings.CACHE_LOCAL_ENABLED:
+            publish_invalidation([generation_key])
@@ -0,0 +1,420 @@
+import asyncio
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.module_loading import import_string
+
+from core.lib.caches import SharedCounters, cache_family_stats
+
+# Upper bounds of the request latency histogram buckets, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# The cache name family stats exposed, as (field, name, type, help, scale).
+CACHE_FAMILY_METRICS = [
+    ("hits", "cache_family_hits_total", "counter", "Lookups from the cache.", 1),
+    ("misses", "cache_family_misses_total", "counter", "Lookups computed.", 1),
+    (
+        "recompute_us",
+        "cache_family_recompute_seconds_total",
+        "counter",
+        "Time spent computing entries.",
+        1000000,
+    ),
+    ("entries", "cache_family_entries_total", "counter", "Entries stored.", 1),
+    ("bytes", "cache_family_bytes_total", "counter", "Size of entries stored.", 1),
+    ("max_bytes", "cache_family_max_bytes", "gauge", "Size of the largest entry.", 1),
+]
+
+# The route label of requests that didn't resolve to a view.
+UNRESOLVED_ROUTE = "unresolved"
+
+# The metrics of the request being handled, if any. Context variables follow
+# the request into the threads of sync_to_async.
+current_metrics = ContextVar("current_metrics", default=None)
+
+# Returned by the wrapped cache in place of a missing value.
+_missing = object()
+
+
+class RequestMetrics:
+    """
+    Counters for a single request.
+    """
+
+    __slots__ = ("queries", "sql_time", "cache_calls", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_calls = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+class MetricsRegistry:
+    """
+    Totals of the request metrics labelled by route, rendered in the
+    Prometheus text format.
+
+    Each process counts its own requests and adds them to totals in the shared
+    cache, so a scrape answered by any worker sees the requests of every
+    worker, up to the last flush of each.
+    """
+
+    # Times are counted in microseconds, as the shared cache increments ints.
+    ROUTE_FIELDS = (
+        *(f"bucket_{i}" for i in range(len(LATENCY_BUCKETS))),
+        "latency_count",
+        "latency_sum_us",
+        "db_queries_total",
+        "db_query_duration_us",
+        "cache_calls_total",
+        "cache_hits_total",
+        "cache_misses_total",
+    )
+
+    def __init__(self, flush_interval=10):
+        self.requests = SharedCounters(
+            "metrics:requests", ["count"], flush_interval=flush_interval
+        )
+        self.routes = SharedCounters(
+            "metrics:routes", self.ROUTE_FIELDS, flush_interval=flush_interval
+        )
+
+    def reset(self):
+        """
+        Drop the totals of this process.
+        """
+        self.requests.reset()
+        self.routes.reset()
+
+    def record(self, route, method, status, latency, metrics):
+        """
+        Add the metrics of a request to the totals.
+        """
+        self.requests.add((route, method, str(status)), count=1)
+        buckets = {
+            f"bucket_{i}": 1
+            for i, bound in enumerate(LATENCY_BUCKETS)
+            if latency <= bound
+        }
+        self.routes.add(
+            (route,),
+            latency_count=1,
+            latency_sum_us=int(latency * 1000000),
+            db_queries_total=metrics.queries,
+            db_query_duration_us=int(metrics.sql_time * 1000000),
+            cache_calls_total=metrics.cache_calls,
+            cache_hits_total=metrics.cache_hits,
+            cache_misses_total=metrics.cache_misses,
+            **buckets,
+        )
+
+    def flush(self):
+        """
+        Add the totals of this process to the shared totals.
+        """
+        self.requests.flush()
+        self.routes.flush()
+
+    def render(self):
+        """
+        Return the shared totals in the Prometheus text exposition format.
+        """
+        requests = self.requests.get_shared_totals()
+        routes = self.routes.get_shared_totals()
+
+        lines = [
+            "# HELP http_requests_total Requests handled.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (route, method, status), counters in sorted(requests.items()):
+            labels = format_labels(route=route, method=method, status=status)
+            lines.append(f"http_requests_total{{{labels}}} {counters['count']}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Request latency.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (route,), counters in sorted(routes.items()):
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                labels = format_labels(route=route, le=str(bound))
+                lines.append(
+                    f"http_request_duration_seconds_bucket{{{labels}}} "
+                    f"{counters[f'bucket_{i}']}"
+                )
+            labels = format_labels(route=route, le="+Inf")
+            lines.append(
+                f"http_request_duration_seconds_bucket{{{labels}}} "
+                f"{counters['latency_count']}"
+            )
+            labels = format_labels(route=route)
+            lines.append(
+                f"http_request_duration_seconds_count{{{labels}}} "
+                f"{counters['latency_count']}"
+            )
+            lines.append(
+                f"http_request_duration_seconds_sum{{{labels}}} "
+                f"{counters['latency_sum_us'] / 1000000:g}"
+            )
+
+        for name, field, help, scale in [
+            ("db_queries_total", "db_queries_total", "Database queries made.", 1),
+            (
+                "db_query_duration_seconds_total",
+                "db_query_duration_us",
+                "Time spent on database queries.",
+                1000000,
+            ),
+            (
+                "cache_calls_total",
+                "cache_calls_total",
+                "Calls to the default cache.",
+                1,
+            ),
+            (
+                "cache_hits_total",
+                "cache_hits_total",
+                "Keys found in the default cache.",
+                1,
+            ),
+            (
+                "cache_misses_total",
+                "cache_misses_total",
+                "Keys missing from the default cache.",
+                1,
+            ),
+        ]:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+            for (route,), counters in sorted(routes.items()):
+                labels = format_labels(route=route)
+                lines.append(f"{name}{{{labels}}} {counters[field] / scale:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(flush_interval=settings.METRICS_FLUSH_INTERVAL)
+
+
+def format_labels(**labels):
+    """
+    Return Prometheus labels with their values escaped.
+    """
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'),
+        )
+        for name, value in labels.items()
+    )
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting the queries and SQL time of the current
+    request.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.sql_time += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Add record_query to a new database connection. Connected to the
+    connection_created signal.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_route(request):
+    """
+    Return the route label of a request: the name of the view it resolved to.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNRESOLVED_ROUTE
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, database queries and cache calls of each request.
+    Must be the first middleware to time the whole request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all():
+            install_query_recorder(None, connection)
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, so Django calls it
+            # without a thread under ASGI.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        self.record(request, response, time.perf_counter() - start, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        self.record(request, response, time.perf_counter() - start, metrics)
+        return response
+
+    def record(self, request, response, latency, metrics):
+        registry.record(
+            get_route(request), request.method, response.status_code, latency, metrics
+        )
+
+
+def render_cache_family_stats():
+    """
+    Return the cache name family stats of every process in the Prometheus text
+    format.
+    """
+    totals = cache_family_stats.get_shared_totals()
+    lines = []
+    for field, name, type, help, scale in CACHE_FAMILY_METRICS:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {type}"]
+        for family, counters in sorted(totals.items()):
+            labels = format_labels(family=family)
+            lines.append(f"{name}{{{labels}}} {counters[field] / scale:g}")
+    return "\n".join(lines) + "\n"
+
+
+def can_read_metrics(request):
+    """
+    Return whether a request may read the metrics, i.e. its client connects
+    from one of METRICS_ALLOWED_IPS.
+    """
+    return request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """
+    Expose the metrics of every process in the Prometheus text format.
+    """
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+    # Totals of this process are current, those of the others are as of their
+    # last flush.
+    registry.flush()
+    cache_family_stats.flush()
+    return HttpResponse(
+        registry.render() + render_cache_family_stats(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+class InstrumentedCache(BaseCache):
+    """
+    A cache backend wrapping the backend in WRAPPED_BACKEND, counting the
+    calls, hits and misses of the current request.
+
+    Attributes not defined here, such as django_redis's client, are those of
+    the wrapped backend.
+    """
+
+    def __init__(self, location, params):
+        params = params.copy()
+        self._cache = import_string(params.pop("WRAPPED_BACKEND"))(location, params)
+        super().__init__(params)
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def _record(self, hits=0, misses=0):
+        metrics = current_metrics.get()
+        if metrics is not None:
+            metrics.cache_calls += 1
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _missing, version=version)
+        if value is _missing:
+            self._record(misses=1)
+            return default
+        self._record(hits=1)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version=version)
+        self._record(hits=len(values), misses=len(keys) - len(values))
+        return values
+
+    def has_key(self, key, version=None):
+        found = self._cache.has_key(key, version=version)
+        self._record(hits=int(found), misses=int(not found))
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._record()
+        return self._cache.add(key, value, timeout=timeout, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._record()
+        return self._cache.set(key, value, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._record()
+        return self._cache.set_many(data, timeout=timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._record()
+        return self._cache.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._record()
+        return self._cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self._record()
+        return self._cache.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._record()
+        return self._cache.incr(key, delta=delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._record()
+        return self._cache.decr(key, delta=delta, version=version)
+
+    def clear(self):
+        self._record()
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
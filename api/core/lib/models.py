@@ -1,7 +1,8 @@
 from uuid import uuid4
 
-from django.db import models
-from django.core.cache import cache
+from django.db import models, router, transaction
+
+from core.db.routers import pin_to_primary
 
 
 class BaseModel(models.Model):
@@ -15,29 +16,83 @@ class BaseModel(models.Model):
         super().__init__(*args, **kwargs)
         # Grab the manager for easier access.
         self._manager = self.__class__.objects
+        # The objects this one belonged to when it was loaded or last saved,
+        # whose caches still hold it after it moves to other objects.
+        self._dependent_ids = self.get_loaded_dependent_ids()
 
     class Meta:
         abstract = True
 
     def save(self, *args, **kwargs):
         """
-        Saves the model and clears all caches.
+        Saves the model and clears all caches once the transaction commits.
         """
-        self.clear_caches()
         super().save(*args, **kwargs)
+        # The replica may not have the write yet.
+        pin_to_primary()
+        # Clear the caches of the objects this one belonged to before the save
+        # as well as after it, in case the save moved it.
+        dependent_ids = self._manager.get_dependent_ids(instances=[self])
+        for name, ids in self._dependent_ids.items():
+            dependent_ids[name] |= ids
+        self._dependent_ids = self.get_loaded_dependent_ids()
+        # Caches are cleared once the write is committed. Until then other
+        # connections still read the old row, and could cache it against the
+        # new generation.
+        pk = self.pk
+        transaction.on_commit(
+            lambda: self.clear_caches(pk=pk, dependent_ids=dependent_ids),
+            using=self._state.db,
+        )
 
     def delete(self, *args, **kwargs):
         """
-        Deletes the model and clears all caches.
+        Deletes the model and clears all caches once the transaction commits.
+        """
+        # Django unsets the primary key on delete, so keep it for the caches.
+        pk = self.pk
+        using = kwargs.get("using", args[0] if args else None) or router.db_for_write(
+            self.__class__, instance=self
+        )
+        result = super().delete(*args, **kwargs)
+        pin_to_primary()
+        transaction.on_commit(lambda: self.clear_caches(pk=pk), using=using)
+        return result
+
+    def refresh_from_db(self, using=None, fields=None):
+        """
+        Reloads fields from the database, including deferred fields on first
+        access, and remembers the objects this one belongs to as saved.
+        """
+        super().refresh_from_db(using=using, fields=fields)
+        for name, ids in self.get_loaded_dependent_ids().items():
+            field = self._meta.get_field(name)
+            if fields is None or name in fields or field.attname in fields:
+                self._dependent_ids[name] = ids
+
+    def get_loaded_dependent_ids(self):
+        """
+        Return the ids of the objects in the manager's cache_dependencies that
+        this object belongs to, by foreign key name. Deferred foreign keys
+        aren't loaded.
         """
-        self.clear_caches()
-        super().delete(*args, **kwargs)
+        dependent_ids = {}
+        for name in self._manager.cache_dependencies:  # type: ignore
+            id = self.__dict__.get(self._meta.get_field(name).attname)
+            dependent_ids[name] = set() if id is None else {id}
+        return dependent_ids
 
-    def clear_caches(self):
+    def clear_caches(self, pk=None, dependent_ids=None):
         """
-        Clears all caches for this model.
+        Clears all caches for this model, and those of the objects depending
+        on it, or of the given dependent ids.
         """
-        self._manager.clear_caches(object=self)  # type: ignore
+        if dependent_ids is None:
+            dependent_ids = self._manager.get_dependent_ids(  # type: ignore
+                instances=[self]
+            )
+        self._manager.clear_object_caches(ids=[pk or self.pk])  # type: ignore
+        self._manager.clear_dependent_caches(dependent_ids)  # type: ignore
 
 
 class DatesMixin(models.Model):
@@ -0,0 +1,25 @@
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from core.lib.camel_case import underscoreize
+
+
+class CamelCaseJSONParser(JSONParser):
+    """
+    Parses camel-cased JSON into snake_case data with memoized key translation
+    and orjson.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                data = data.decode(encoding)
+            return underscoreize(orjson.loads(data))
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,144 @@
+import http.client
+import queue
+import threading
+from urllib.parse import urlsplit
+
+# Errors raised when the upstream closed an idle keep-alive connection.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class UpstreamPool:
+    """
+    A thread-safe pool of keep-alive HTTP connections to one upstream server.
+
+    A connection is returned to the pool once its response has been read to
+    the end, so a page loading many assets reuses a few connections instead of
+    opening one per asset.
+    """
+
+    def __init__(self, upstream, size=8, timeout=10):
+        url = urlsplit(upstream)
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.host = url.hostname
+        self.port = url.port
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def request(self, method, path, headers={}):
+        """
+        Send a request and return the connection and its response. The
+        response must be passed to release once it has been read.
+        """
+        connection = self._acquire()
+        try:
+            connection.request(method, path, headers=headers)
+            return connection, connection.getresponse()
+        except STALE_CONNECTION_ERRORS:
+            # The idle connection was closed by the upstream, so retry once on
+            # a new one.
+            connection.close()
+            connection = self._connect()
+            connection.request(method, path, headers=headers)
+            return connection, connection.getresponse()
+
+    def read(self, method, path, headers={}):
+        """
+        Send a request and return its response with the body read.
+        """
+        connection, response = self.request(method, path, headers=headers)
+        try:
+            body = response.read()
+        except Exception:
+            connection.close()
+            raise
+        self.release(connection, response)
+        return response, body
+
+    def iter_body(self, connection, response, chunk_size=65536):
+        """
+        Yield the body of a response in chunks, then release its connection.
+        """
+        released = False
+        try:
+            while True:
+                data = response.read(chunk_size)
+                if not data:
+                    break
+                yield data
+            self.release(connection, response)
+            released = True
+        finally:
+            if not released:
+                connection.close()
+
+    def release(self, connection, response):
+        """
+        Return a connection whose response has been read to the pool, or close
+        it if the upstream won't keep it alive or the pool is full.
+        """
+        if response.will_close or not response.isclosed():
+            connection.close()
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+        """
+        Close every idle connection.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _connect(self):
+        return self.connection_class(self.host, self.port, timeout=self.timeout)
+
+
+class TemplateCache:
+    """
+    Compiled templates keyed by path, each stored with the upstream validator
+    (ETag or Last-Modified) of the source it was compiled from.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Return the (validator, template) stored for a path, or None.
+        """
+        with self._lock:
+            return self._templates.get(path)
+
+    def set(self, path, validator, template):
+        """
+        Store the template compiled for a path.
+        """
+        with self._lock:
+            self._templates[path] = (validator, template)
+
+    def clear(self):
+        """
+        Drop every template.
+        """
+        with self._lock:
+            self._templates.clear()
@@ -0,0 +1,72 @@
+import orjson
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.lib.camel_case import camelize
+
+# Serializes the types orjson doesn't, such as Decimal, and datetimes, so they
+# are formatted as the REST framework formats them.
+_encoder = JSONEncoder()
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class RenderedJSON(bytes):
+    """
+    JSON that has already been camel-cased and encoded, and is sent as is.
+    """
+
+
+def encode_json(data):
+    """
+    Encode data as compact UTF-8 JSON.
+    """
+    ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+    # Escape the characters that are valid JSON but not valid JavaScript, as
+    # the REST framework does.
+    if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+        ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+        ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+    return ret
+
+
+def render_json(data):
+    """
+    Return data camel-cased and encoded as RenderedJSON.
+    """
+    return RenderedJSON(encode_json(camelize(data)))
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    """
+    Renders camel-cased JSON with memoized key translation and orjson.
+
+    RenderedJSON, such as the cached payloads from
+    BaseModelManager.serialize(render=True), is sent without being rendered
+    again.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, RenderedJSON):
+            return data
+
+        # Fall back to the REST framework's encoder for indented output.
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(camelize(data), accepted_media_type, renderer_context)
+        return encode_json(camelize(data))
+
+
+class CamelCaseBrowsableAPIRenderer(BrowsableAPIRenderer):
+    """
+    Renders the browsable API with camel-cased content.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, RenderedJSON):
+            data = orjson.loads(bytes(data))
+        else:
+            data = camelize(data)
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import queue
+import threading
+
+import django
+from django.http import StreamingHttpResponse
+
+from core.lib.camel_case import camelize
+from core.lib.renderers import encode_json
+
+# Bytes of encoded rows buffered before they are sent.
+STREAM_BUFFER_SIZE = 65536
+
+# Chunks a thread iterating async content may have ready ahead of the client.
+STREAM_QUEUE_SIZE = 4
+
+# Whether Django iterates async streaming content itself, which it does from
+# 4.2. Earlier versions iterate streamed responses synchronously under ASGI.
+ASYNC_STREAMING = django.VERSION >= (4, 2)
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    Streams an iterable or async iterable of rows as a JSON array, encoding
+    one row at a time, so memory use doesn't grow with the number of rows.
+
+    Streamed responses bypass the REST framework renderers, so keys are
+    camel-cased here as the configured renderer would.
+    """
+
+    def __init__(self, rows, camelize_keys=True, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        if hasattr(rows, "__aiter__"):
+            content = self.aencode_rows(rows, camelize_keys)
+            if not ASYNC_STREAMING:
+                content = AsyncIteratorThread(content)
+        else:
+            content = self.encode_rows(rows, camelize_keys)
+        super().__init__(content, **kwargs)
+
+    @staticmethod
+    def encode_rows(rows, camelize_keys=True):
+        """
+        Yield the rows encoded as a JSON array, in chunks of about
+        STREAM_BUFFER_SIZE bytes.
+        """
+        encoder = JSONArrayEncoder(camelize_keys)
+        for row in rows:
+            chunk = encoder.encode(row)
+            if chunk:
+                yield chunk
+        yield encoder.close()
+
+    @staticmethod
+    async def aencode_rows(rows, camelize_keys=True):
+        """
+        Yield what encode_rows does, for an async iterable of rows. The rows
+        are closed with the chunks, so a client going away releases them.
+        """
+        encoder = JSONArrayEncoder(camelize_keys)
+        try:
+            async for row in rows:
+                chunk = encoder.encode(row)
+                if chunk:
+                    yield chunk
+            yield encoder.close()
+        finally:
+            if hasattr(rows, "aclose"):
+                await rows.aclose()
+
+
+class JSONArrayEncoder:
+    """
+    Encodes rows one at a time as the items of a JSON array, buffering them
+    into chunks of about STREAM_BUFFER_SIZE bytes.
+    """
+
+    def __init__(self, camelize_keys=True):
+        self.camelize_keys = camelize_keys
+        self._buffer = [b"["]
+        self._size = 1
+        self._separator = b""
+
+    def encode(self, row):
+        """
+        Add a row, and return the buffered chunk once it is full, or None.
+        """
+        if self.camelize_keys:
+            row = camelize(row)
+        chunk = self._separator + encode_json(row)
+        self._separator = b","
+        self._buffer.append(chunk)
+        self._size += len(chunk)
+        if self._size < STREAM_BUFFER_SIZE:
+            return None
+        return self._flush()
+
+    def close(self):
+        """
+        Return the last chunk, closing the array.
+        """
+        self._buffer.append(b"]")
+        return self._flush()
+
+    def _flush(self):
+        chunk = b"".join(self._buffer)
+        self._buffer = []
+        self._size = 0
+        return chunk
+
+
+class AsyncIteratorThread:
+    """
+    Iterates an async iterator in a thread with its own event loop, handing
+    its items to a synchronous consumer through a bounded queue.
+
+    This is how async content is streamed by versions of Django that iterate
+    streamed responses synchronously. It doesn't make those responses async:
+    each one still ties up a thread until it is sent, and the event loop
+    blocks on the queue whenever the next chunk isn't ready yet. Memory use
+    stays bounded though, and the thread works ahead while chunks are sent.
+    """
+
+    _done = object()
+
+    def __init__(self, aiterator, maxsize=STREAM_QUEUE_SIZE):
+        self._aiterator = aiterator
+        self._queue = queue.Queue(maxsize)
+        self._closed = threading.Event()
+        self._thread = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._thread is None:
+            # The context carries the request's thread for sync_to_async, and
+            # its database routing.
+            context = contextvars.copy_context()
+            self._thread = threading.Thread(
+                target=context.run, args=(asyncio.run, self._produce()), daemon=True
+            )
+            self._thread.start()
+        item, error = self._queue.get()
+        if error is not None:
+            raise error
+        if item is self._done:
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+        Stop iterating, e.g. when the client goes away. The thread closes the
+        async iterator as it stops.
+
+        The thread isn't joined, as closing the iterator may need the thread
+        the response is closed in.
+        """
+        self._closed.set()
+
+    async def _produce(self):
+        try:
+            async for item in self._aiterator:
+                if not self._put(item):
+                    return
+        except Exception as e:
+            self._put(None, e)
+        else:
+            self._put(self._done)
+        finally:
+            if hasattr(self._aiterator, "aclose"):
+                await self._aiterator.aclose()
+
+    def _put(self, item, error=None):
+        # The thread's event loop runs nothing else, so it may block.
+        while not self._closed.is_set():
+            try:
+                self._queue.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
@@ -0,0 +1,187 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from pathlib import Path
+
+import brotli
+from django.core.exceptions import ImproperlyConfigured
+
+# Vite writes content-hashed files to this directory of the build, so they can
+# be cached forever.
+HASHED_ASSETS_DIR = "assets"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Files without a hash in their name are revalidated against their ETag.
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Compressed variants are only kept for these types, and only when smaller.
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/wasm",
+    "application/xml",
+    "image/svg+xml",
+)
+
+# Suffixes of the precompressed files a build may include, by encoding.
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class SPAAsset:
+    """
+    A file of the client build held in memory, with its compressed variants.
+    """
+
+    def __init__(self, content, content_type, cache_control):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(content).hexdigest()[:32]
+        self.variants = {"identity": content}
+
+    def add_variant(self, encoding, content):
+        """
+        Keep a compressed variant if it is smaller than the content.
+        """
+        if len(content) < len(self.variants["identity"]):
+            self.variants[encoding] = content
+
+    def get_etag(self, encoding):
+        """
+        Return the strong ETag of a variant. Each variant has its own, as
+        they are different representations.
+        """
+        if encoding == "identity":
+            return f'"{self.digest}"'
+        return f'"{self.digest}-{encoding}"'
+
+    def get_etags(self):
+        """
+        Return the ETags of every variant.
+        """
+        return {self.get_etag(encoding) for encoding in self.variants}
+
+
+class SPABundle:
+    """
+    The client build loaded into memory, with gzip and brotli variants
+    compressed once at load time.
+    """
+
+    def __init__(self, build_dir, render_index=None):
+        self.build_dir = Path(build_dir)
+        self.render_index = render_index
+        self.assets = {}
+
+    def load(self):
+        """
+        Load every file of the build. Precompressed files in the build are
+        used as variants instead of being compressed again.
+
+        Raise ImproperlyConfigured if the build has no index.html, as every
+        client route would be answered with 404.
+        """
+        assets = {}
+        for root, _, filenames in os.walk(self.build_dir):
+            for filename in filenames:
+                path = Path(root) / filename
+                if path.suffix in PRECOMPRESSED_SUFFIXES.values():
+                    continue
+                name = path.relative_to(self.build_dir).as_posix()
+                assets[name] = self.load_asset(name, path)
+        if "index.html" not in assets:
+            raise ImproperlyConfigured(
+                f"No index.html in the client build at {self.build_dir}. Build "
+                "the client, or set DJANGO_SPA_BUILD_DIR to its dist directory."
+            )
+        self.assets = assets
+        return self
+
+    def load_asset(self, name, path):
+        """
+        Load a file of the build and its compressed variants.
+        """
+        content = path.read_bytes()
+        if name == "index.html" and self.render_index is not None:
+            content = self.render_index(content.decode()).encode()
+
+        content_type, _ = mimetypes.guess_type(name)
+        content_type = content_type or "application/octet-stream"
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        cache_control = (
+            IMMUTABLE_CACHE_CONTROL
+            if name.startswith(f"{HASHED_ASSETS_DIR}/")
+            else REVALIDATE_CACHE_CONTROL
+        )
+        asset = SPAAsset(content, content_type, cache_control)
+
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return asset
+        # A rendered index.html no longer matches its precompressed files.
+        precompressed = name != "index.html" or self.render_index is None
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            compressed_path = path.with_name(path.name + suffix)
+            if precompressed and compressed_path.exists():
+                asset.add_variant(encoding, compressed_path.read_bytes())
+        if "gzip" not in asset.variants:
+            asset.add_variant("gzip", gzip.compress(content, mtime=0))
+        if "br" not in asset.variants:
+            asset.add_variant("br", brotli.compress(content))
+        return asset
+
+    def get(self, path):
+        """
+        Return the asset for a request path. Paths without a file extension
+        are client routes, answered with index.html.
+        """
+        name = path.lstrip("/") or "index.html"
+        asset = self.assets.get(name)
+        if asset is None and "." not in name.rsplit("/", 1)[-1]:
+            asset = self.assets.get("index.html")
+        return asset
+
+
+def parse_accept_encoding(header):
+    """
+    Return the encodings accepted by an Accept-Encoding header.
+    """
+    accepted = set()
+    for item in header.split(","):
+        encoding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if encoding and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(encoding.lower())
+    return accepted
+
+
+def choose_encoding(asset, accept_encoding):
+    """
+    Return the smallest variant of an asset the client accepts. A
+    precompressed variant of the build isn't always smaller than the one
+    compressed with the other encoding.
+    """
+    accepted = parse_accept_encoding(accept_encoding) | {"identity"}
+    return min(
+        (encoding for encoding in asset.variants if encoding in accepted),
+        key=lambda encoding: len(asset.variants[encoding]),
+    )
+
+
+def etag_matches(if_none_match, etags):
+    """
+    Return whether an If-None-Match header matches any of the given ETags.
+    """
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        # ETags are compared weakly, as If-None-Match requires.
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
@@ -0,0 +1,165 @@
+"""
+Warms the code paths the first request of a worker would otherwise pay for.
+
+With gunicorn's preload_app, warm_up runs once in the master before it forks
+workers (see gunicorn.conf.py), so every worker starts from the warmed memory,
+shared copy-on-write.
+"""
+
+import logging
+import sys
+import time
+from importlib import import_module
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import connections
+from django.template import engines
+from django.urls import URLResolver, get_resolver
+from django.utils.module_loading import module_has_submodule
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def iter_views(patterns):
+    """
+    Iterate over the views of URL patterns, including those of included
+    URL confs.
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_views(pattern.url_patterns)
+        else:
+            yield pattern.callback
+
+
+def warm_url_resolvers():
+    """
+    Import the URL conf and compile every pattern.
+    """
+    # Building the reverse lookups compiles the patterns of every included
+    # URL conf as well.
+    get_resolver().reverse_dict
+
+
+def get_serializer_classes():
+    """
+    Return the serializers of the API views and of the serializers modules of
+    the project's apps.
+    """
+    serializer_classes = set()
+    for view in iter_views(get_resolver().url_patterns):
+        # Set by the REST framework's as_view.
+        view_class = getattr(view, "cls", None)
+        if hasattr(view_class, "get_serializer_class"):
+            serializer_classes.add(view_class().get_serializer_class())
+        elif getattr(view_class, "serializer_class", None) is not None:
+            serializer_classes.add(view_class.serializer_class)
+
+    for app_config in apps.get_app_configs():
+        # Only this project's apps, as libraries define abstract serializers.
+        if not Path(app_config.path).is_relative_to(
+            settings.BASE_DIR
+        ) or not module_has_submodule(app_config.module, "serializers"):
+            continue
+        module = import_module(f"{app_config.name}.serializers")
+        for value in vars(module).values():
+            if (
+                isinstance(value, type)
+                and issubclass(value, BaseSerializer)
+                and value.__module__ == module.__name__
+            ):
+                serializer_classes.add(value)
+    return serializer_classes
+
+
+def warm_serializers():
+    """
+    Build the fields of every serializer, which introspects their models.
+    """
+    for serializer_class in get_serializer_classes():
+        try:
+            serializer_class().fields
+        except Exception:
+            # Some serializers need a context to build their fields.
+            logger.debug("Couldn't warm %s.", serializer_class, exc_info=True)
+
+
+def warm_content_types():
+    """
+    Fill the ContentType cache for every model, in one query.
+    """
+    ContentType.objects.get_for_models(*apps.get_models())
+
+
+def warm_templates():
+    """
+    Load the template engine, and index.html in development.
+    """
+    # Loads the template tag libraries.
+    engines["django"].from_string("")
+    # catchall_prod renders index.html as core.views is imported.
+    from core import views
+
+    if settings.SERVER_TYPE == "DEV":
+        views.proxy_template("/index.html")
+
+
+def warm_jwt():
+    """
+    Set up the JSON web token backend, by signing and verifying a token.
+    """
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    AccessToken(str(AccessToken()))
+
+
+WARM_UP_STEPS = [
+    ("url resolvers", warm_url_resolvers),
+    ("serializers", warm_serializers),
+    ("content types", warm_content_types),
+    ("templates", warm_templates),
+    ("jwt", warm_jwt),
+]
+
+
+def warm_up():
+    """
+    Run every warm-up step and return how long each took, in seconds. A step
+    that fails is logged and skipped, so it never prevents startup.
+
+    Connections opened while warming are closed, so forked workers never
+    share them.
+    """
+    timings = {}
+    for name, step in WARM_UP_STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("Warm-up step %r failed: %r", name, e)
+        timings[name] = time.perf_counter() - start
+
+    connections.close_all()
+    if any(hasattr(connection, "pool") for connection in connections.all()):
+        # Closing returns pooled connections to their pool.
+        from core.db.backends.postgresql.base import close_pools
+
+        close_pools()
+    for cache in caches.all():
+        cache.close()
+    views = sys.modules.get("core.views")
+    if views is not None:
+        # Keep-alive connections to the dev server, opened by warm_templates.
+        views.upstream_pool.close()
+
+    logger.info(
+        "Warmed up in %.1f ms: %s.",
+        sum(timings.values()) * 1000,
+        ", ".join(f"{name} {t * 1000:.1f} ms" for name, t in timings.items()),
+    )
+    return timings
@@ -0,0 +1,120 @@
+import pickle
+import time
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic, set_rollback
+
+from account.factories import UserFactory
+from core.lib.codecs import CacheValueCodec, cache_value_codec, msgpack
+from core.lib.renderers import render_json
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Compares the size and speed of cached entries in the cache value format
+    with pickle, which django-redis stores values with.
+    """
+
+    help = (
+        "Compares the bytes stored and encode and decode times of cached user "
+        "payloads, pickled and in the cache value format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--iterations",
+            type=int,
+            default=1000,
+            help="The number of times each payload is encoded and decoded.",
+        )
+        parser.add_argument(
+            "-u",
+            "--users",
+            type=int,
+            default=100,
+            help="The number of users in the largest payload.",
+        )
+
+    def handle(self, *args, **options):
+
+        # Arguments
+        iterations = options["iterations"]
+
+        if msgpack is None:
+            self.stdout.write(
+                self.style.WARNING("msgpack isn't installed, so the codec pickles.")
+            )
+
+        # The users are created in a transaction that is rolled back.
+        with atomic():
+            users = UserFactory.create_batch(options["users"])
+            payloads = self.get_payloads([user.id for user in users])
+            set_rollback(True)
+
+        formats = {
+            "pickle": (
+                lambda value: pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                pickle.loads,
+            ),
+            "codec": (
+                CacheValueCodec(compress_min_size=None).encode,
+                cache_value_codec.decode,
+            ),
+            "codec, compressed": (
+                CacheValueCodec(compress_min_size=0).encode,
+                cache_value_codec.decode,
+            ),
+            "codec, as configured": (
+                cache_value_codec.encode,
+                cache_value_codec.decode,
+            ),
+        }
+
+        self.stdout.write(
+            f"{'payload':<24}{'format':<24}"
+            + "".join(f"{c:>12}" for c in ["bytes", "encode µs", "decode µs"])
+        )
+        for payload_name, data in payloads.items():
+            # Entries are stored as (generations, data, refresh_at).
+            entry = ((uuid4().hex, uuid4().hex), data, time.time())
+            for format_name, (encode, decode) in formats.items():
+                encoded = encode(entry)
+                row = [
+                    len(encoded),
+                    f"{self.measure(lambda: encode(entry), iterations):.2f}",
+                    f"{self.measure(lambda: decode(encoded), iterations):.2f}",
+                ]
+                self.stdout.write(
+                    f"{payload_name:<24}{format_name:<24}"
+                    + "".join(f"{value:>12}" for value in row)
+                )
+
+    @staticmethod
+    def get_payloads(ids):
+        """
+        Return the data of serialize_current_user for one user, rendered and
+        not, and for every user.
+        """
+        current_user = User.objects.serialize_current_user(ids[0], cache_name=None)
+        return {
+            "current user": current_user,
+            "current user, rendered": render_json(current_user),
+            f"{len(ids)} users": User.objects.serialize_current_users(
+                ids, cache_name=None
+            ),
+        }
+
+    @staticmethod
+    def measure(function, iterations):
+        """
+        Return the CPU time per call of function, in microseconds.
+        """
+        start = time.process_time()
+        for _ in range(iterations):
+            function()
+        return (time.process_time() - start) / iterations * 1e6
@@ -0,0 +1,92 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+# The connection settings of each mode, as (name, CONN_MAX_AGE,
+# CONN_HEALTH_CHECKS, POOL_SIZE).
+MODES = [
+    ("new connection", 0, False, 0),
+    ("persistent", 60, False, 0),
+    ("persistent, health checks", 60, True, 0),
+    ("pooled, health checks", 0, True, 4),
+]
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the per-request database latency of each connection mode.
+    """
+
+    help = (
+        "Times simulated requests each making one query, with new, persistent "
+        "and pooled connections. Pooling is only benchmarked on PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--requests",
+            type=int,
+            default=500,
+            help="Requests per mode. Defaults to 500.",
+        )
+        parser.add_argument(
+            "--database",
+            default="default",
+            help="The database alias to benchmark. Defaults to default.",
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        saved = {
+            name: connection.settings_dict.get(name)
+            for name in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS", "POOL_SIZE")
+        }
+
+        self.stdout.write(
+            f"{'mode':<28}"
+            + "".join(f"{c:>12}" for c in ["p50 ms", "p95 ms", "mean ms"])
+        )
+        try:
+            for name, max_age, health_checks, pool_size in MODES:
+                if pool_size and not hasattr(connection, "pool"):
+                    self.stdout.write(f"{name:<28}{'skipped, needs PostgreSQL':>36}")
+                    continue
+                connection.close()
+                connection.settings_dict.update(
+                    CONN_MAX_AGE=max_age,
+                    CONN_HEALTH_CHECKS=health_checks,
+                    POOL_SIZE=pool_size,
+                )
+                timings = self.run_requests(connection, options["requests"])
+                row = [
+                    statistics.median(timings),
+                    statistics.quantiles(timings, n=20)[-1],
+                    statistics.mean(timings),
+                ]
+                self.stdout.write(
+                    f"{name:<28}" + "".join(f"{value * 1000:>12.3f}" for value in row)
+                )
+        finally:
+            connection.close()
+            connection.settings_dict.update(saved)
+
+    def run_requests(self, connection, count):
+        """
+        Returns the durations of count requests, each making one query.
+        """
+        timings = []
+        # The first request of each mode connects, so it isn't timed.
+        for i in range(count + 1):
+            start = time.perf_counter()
+            request_started.send(sender=self.__class__)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            request_finished.send(sender=self.__class__)
+            if i:
+                timings.append(time.perf_counter() - start)
+        return timings
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+
+from core.lib.caches import cache_family_stats
+
+
+class Command(BaseCommand):
+    """
+    Shows the cache name family stats of every process.
+    """
+
+    help = (
+        "Shows the hits, misses, recompute time and entry sizes of each cache "
+        "name family, totalled across processes through the shared cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Delete the totals after showing them.",
+        )
+
+    def handle(self, *args, **options):
+
+        totals = cache_family_stats.get_shared_totals()
+
+        if not totals:
+            self.stdout.write("No cache stats recorded yet.")
+        else:
+            self.write_table(totals)
+
+        if options["reset"]:
+            cache_family_stats.clear_shared_totals()
+            self.stdout.write(self.style.SUCCESS("Reset the cache stats."))
+
+    def write_table(self, totals):
+        """
+        Writes a row of stats for each family, busiest first.
+        """
+        columns = [
+            "hits",
+            "misses",
+            "hit ratio",
+            "recompute ms",
+            "avg bytes",
+            "max bytes",
+        ]
+        width = max(len(family) for family in totals)
+        self.stdout.write(f"{'family':<{width}}" + "".join(f"{c:>14}" for c in columns))
+        for family, c in sorted(
+            totals.items(), key=lambda item: -(item[1]["hits"] + item[1]["misses"])
+        ):
+            lookups = c["hits"] + c["misses"]
+            hit_ratio = c["hits"] / lookups if lookups else 0
+            recompute_ms = (
+                c["recompute_us"] / c["recomputes"] / 1000 if c["recomputes"] else 0
+            )
+            avg_bytes = c["bytes"] // c["entries"] if c["entries"] else 0
+            row = [
+                c["hits"],
+                c["misses"],
+                f"{hit_ratio:.1%}",
+                f"{recompute_ms:.2f}",
+                avg_bytes,
+                c["max_bytes"],
+            ]
+            self.stdout.write(
+                f"{family:<{width}}" + "".join(f"{value:>14}" for value in row)
+            )
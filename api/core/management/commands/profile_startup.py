@@ -0,0 +1,78 @@
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.lib.warmup import warm_up
+
+# Loads the app as a preloading gunicorn master does.
+STARTUP_CODE = (
+    "import core.wsgi; from django.urls import get_resolver; "
+    "get_resolver().url_patterns"
+)
+
+
+class Command(BaseCommand):
+    """
+    Profiles the imports made as the app starts, and the warm-up steps.
+    """
+
+    help = (
+        "Shows the slowest imports of a starting worker, from python -X "
+        "importtime, and how long each warm-up step takes."
+    )
+
+    # System checks would load the URL conf before it is profiled.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--limit",
+            type=int,
+            default=25,
+            help="Imports to show. Defaults to 25.",
+        )
+
+    def handle(self, *args, **options):
+        imports = self.profile_imports()
+        total = sum(self_us for _, self_us, _ in imports)
+        self.stdout.write(
+            f"Imported {len(imports)} modules in {total / 1000:.1f} ms, slowest:"
+        )
+        self.stdout.write(f"{'module':<60}{'self ms':>12}{'cumulative ms':>16}")
+        for module, self_us, cumulative_us in sorted(
+            imports, key=lambda item: -item[2]
+        )[: options["limit"]]:
+            self.stdout.write(
+                f"{module:<60}{self_us / 1000:>12.1f}{cumulative_us / 1000:>16.1f}"
+            )
+
+        self.stdout.write("")
+        timings = warm_up()
+        self.stdout.write(f"Warmed up in {sum(timings.values()) * 1000:.1f} ms:")
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:<60}{seconds * 1000:>12.1f}")
+
+    def profile_imports(self):
+        """
+        Returns the (module, self us, cumulative us) of each import made by
+        STARTUP_CODE in a new interpreter.
+        """
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            sys.stderr.write(result.stderr)
+            raise SystemExit(result.returncode)
+
+        imports = []
+        for line in result.stderr.splitlines():
+            # e.g. "import time:       136 |        642 |   django.urls"
+            fields = line.removeprefix("import time:").split("|")
+            if not line.startswith("import time:") or not fields[0].strip().isdigit():
+                continue
+            imports.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+        return imports
@@ -9,6 +9,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     # Local Apps
+    "core",
     "account",
     # Dependencies
     "rest_framework",
@@ -26,6 +27,17 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
 ]
 
+if METRICS_ENABLED:
+    # First, to time the whole request.
+    MIDDLEWARE.insert(0, "core.lib.metrics.MetricsMiddleware")
+
+if SQL_REPLICA_ENABLED:
+    # Before the middleware that may read or write.
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.contrib.sessions.middleware.SessionMiddleware"),
+        "core.db.routers.ReplicaPinningMiddleware",
+    )
+
 
 ROOT_URLCONF = "core.urls"
 
@@ -51,20 +63,24 @@ WSGI_APPLICATION = "core.wsgi.application"
 # API / REST / JWT
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "account.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_RENDERER_CLASSES": (
-        "djangorestframework_camel_case.render.CamelCaseJSONRenderer",
-        "djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer",
+        "core.lib.renderers.CamelCaseJSONRenderer",
+        "core.lib.renderers.CamelCaseBrowsableAPIRenderer",
     ),
     "DEFAULT_PARSER_CLASSES": (
         "djangorestframework_camel_case.parser.CamelCaseFormParser",
         "djangorestframework_camel_case.parser.CamelCaseMultiPartParser",
-        "djangorestframework_camel_case.parser.CamelCaseJSONParser",
+        "core.lib.parsers.CamelCaseJSONParser",
     ),
 }
 
+SIMPLE_JWT = {
+    "TOKEN_VERIFY_SERIALIZER": "account.serializers.CachedTokenVerifySerializer",
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -77,23 +93,51 @@ AUTH_PASSWORD_VALIDATORS = [
 
 DATABASES = {
     "default": {
-        "ENGINE": SQL_ENGINE,
+        # Adds health checks and pooling to the PostgreSQL backend.
+        "ENGINE": (
+            "core.db.backends.postgresql"
+            if SQL_ENGINE == "django.db.backends.postgresql"
+            else SQL_ENGINE
+        ),
         "NAME": SQL_DATABASE,
         "USER": SQL_USER,
         "PASSWORD": SQL_PASSWORD,
         "HOST": SQL_HOST,
         "PORT": SQL_PORT,
+        # Pooled connections go back to the pool after each request.
+        "CONN_MAX_AGE": 0 if SQL_POOL_SIZE else SQL_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": SQL_CONN_HEALTH_CHECKS,
+        "POOL_SIZE": SQL_POOL_SIZE,
+        "POOL_TIMEOUT": SQL_POOL_TIMEOUT,
     }
 }
 
+if SQL_REPLICA_ENABLED:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": SQL_REPLICA_DATABASE,
+        "USER": SQL_REPLICA_USER,
+        "PASSWORD": SQL_REPLICA_PASSWORD,
+        "HOST": SQL_REPLICA_HOST,
+        "PORT": SQL_REPLICA_PORT,
+        # Tests read the test database through the replica alias.
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["core.db.routers.ReplicaRouter"]
+
 CACHES = {
     "default": {
         "BACKEND": CACHE_BACKEND,
         "LOCATION": CACHE_HOST,
         "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
     }
 }
 
+if METRICS_ENABLED:
+    CACHES["default"]["WRAPPED_BACKEND"] = CACHES["default"]["BACKEND"]
+    CACHES["default"]["BACKEND"] = "core.lib.metrics.InstrumentedCache"
+
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
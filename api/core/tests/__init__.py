@@ -0,0 +1,15 @@
+# import settings
+from django.conf import settings
+
+from .caches import *
+from .camel_case import *
+from .codecs import *
+from .managers import *
+from .metrics import *
+from .operations import *
+from .postgresql import *
+from .proxy import *
+from .responses import *
+from .routers import *
+from .spa import *
+from .warmup import *
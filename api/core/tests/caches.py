@@ -0,0 +1,175 @@
+"""
+Tests for the in-process cache tier and the shared counters.
+"""
+
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache import caches as cache_connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from account.models import User
+from core.lib.caches import (
+    CACHE_MISS,
+    LocalCache,
+    SharedCounters,
+    local_cache,
+    local_caches,
+    shared_counters,
+)
+
+
+class LocalCacheTests(SimpleTestCase):
+    """
+    Tests LocalCache on its own.
+    """
+
+    def setUp(self):
+        self.cache = LocalCache(max_entries=2, timeout=60)
+        self.addCleanup(local_caches.remove, self.cache)
+
+    def test_gets_what_was_set(self):
+        self.cache.set("a", 1, ["gen:a"], self.cache.epoch)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIs(self.cache.get("b"), CACHE_MISS)
+        self.assertEqual(self.cache.stats.as_dict(), {"hits": 1, "misses": 1})
+
+    def test_expires_entries(self):
+        self.cache.set("a", 1, [], self.cache.epoch, timeout=0.01)
+        time.sleep(0.02)
+        self.assertIs(self.cache.get("a"), CACHE_MISS)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_evicts_the_least_recently_used_entry(self):
+        self.cache.set("a", 1, [], self.cache.epoch)
+        self.cache.set("b", 2, [], self.cache.epoch)
+        self.cache.get("a")
+        self.cache.set("c", 3, [], self.cache.epoch)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIs(self.cache.get("b"), CACHE_MISS)
+        self.assertEqual(self.cache.get("c"), 3)
+
+    def test_invalidates_the_dependents_of_a_generation(self):
+        self.cache.set("a", 1, ["gen:a", "gen:*"], self.cache.epoch)
+        self.cache.set("b", 2, ["gen:b", "gen:*"], self.cache.epoch)
+        self.cache.invalidate(["gen:a"])
+        self.assertIs(self.cache.get("a"), CACHE_MISS)
+        self.assertEqual(self.cache.get("b"), 2)
+        self.cache.invalidate(["gen:*"])
+        self.assertIs(self.cache.get("b"), CACHE_MISS)
+
+    def test_doesnt_store_entries_read_before_an_invalidation(self):
+        epoch = self.cache.epoch
+        self.cache.invalidate(["gen:a"])
+        self.cache.set("a", 1, ["gen:a"], epoch)
+        self.assertIs(self.cache.get("a"), CACHE_MISS)
+
+
+@override_settings(CACHE_LOCAL_ENABLED=True)
+class LocalCacheTierTests(TestCase):
+    """
+    Tests the local cache in front of the shared cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f"value {self.calls}"
+
+    def get(self):
+        return User.objects.cache_get_or_compute(
+            "get_cached__<id>", self.compute, id="1"
+        )
+
+    def test_serves_entries_without_the_shared_cache(self):
+        self.get()
+        cache.clear()
+        self.assertEqual(self.get(), "value 1")
+        self.assertEqual(self.calls, 1)
+
+    def test_invalidations_evict_local_entries(self):
+        self.get()
+        User.objects.clear_object_caches(ids=["1"])
+        self.assertEqual(self.get(), "value 2")
+
+    def test_serves_batched_entries_without_the_shared_cache(self):
+        user = User.objects.create(username="local")
+        User.objects.serialize_current_users([user.id])
+        cache.clear()
+        with self.assertNumQueries(0):
+            users = User.objects.serialize_current_users([user.id])
+        self.assertEqual(users[user.id]["username"], "local")
+
+
+class SharedCountersTests(SimpleTestCase):
+    """
+    Tests totalling the counters of several processes in the shared cache.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create_counters(self):
+        counters = SharedCounters(
+            "test-counters", ["count", "max"], maxima=["max"], flush_interval=0
+        )
+        self.addCleanup(shared_counters.remove, counters)
+        return counters
+
+    def test_totals_the_counters_of_every_process(self):
+        first, second = self.create_counters(), self.create_counters()
+        first.add(("a",), count=1, max=5)
+        second.add(("a",), count=2, max=3)
+        second.add(("b",), count=1, max=1)
+        first.flush()
+        second.flush()
+
+        self.assertEqual(
+            first.get_shared_totals(),
+            {("a",): {"count": 3, "max": 5}, ("b",): {"count": 1, "max": 1}},
+        )
+
+    def test_indexes_the_labels_of_concurrent_flushes(self):
+        processes = [self.create_counters() for _ in range(8)]
+        for i, counters in enumerate(processes):
+            counters.add((str(i),), count=1)
+
+        # Widen the window between reading and writing the index. Each thread
+        # has its own cache instance, so their class is patched.
+        backend = type(cache_connections["default"])
+        get = backend.get
+
+        def slow_get(self, *args, **kwargs):
+            value = get(self, *args, **kwargs)
+            time.sleep(0.01)
+            return value
+
+        with mock.patch.object(backend, "get", slow_get):
+            threads = [threading.Thread(target=c.flush) for c in processes]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(processes[0].get_shared_totals()), 8)
+
+    @override_settings(CACHE_LOCK_WAIT=0)
+    def test_keeps_counters_for_the_next_flush_while_locked(self):
+        counters = self.create_counters()
+        counters.add(("a",), count=1, max=2)
+        cache.set("test-counters:lock", 1)
+        with self.assertLogs("core.lib.caches", "WARNING"):
+            counters.flush()
+        self.assertEqual(counters.get_shared_totals(), {})
+
+        cache.delete("test-counters:lock")
+        counters.add(("a",), count=1, max=1)
+        counters.flush()
+        self.assertEqual(counters.get_shared_totals(), {("a",): {"count": 2, "max": 2}})
@@ -0,0 +1,101 @@
+"""
+Tests for the camelCase renderer and parser.
+"""
+
+import io
+import json
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+from djangorestframework_camel_case.util import camelize as reference_camelize
+from djangorestframework_camel_case.util import underscoreize as reference_underscoreize
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from core.lib.camel_case import camelize, underscoreize
+from core.lib.parsers import CamelCaseJSONParser
+from core.lib.renderers import CamelCaseJSONRenderer, RenderedJSON, render_json
+
+KEYS = [
+    "id",
+    "first_name",
+    "is_primary",
+    "email_addresses",
+    "address_line_1",
+    "_private",
+    "trailing_",
+    "a_b_c",
+    "already_camelCase",
+]
+
+
+class CamelCaseTests(SimpleTestCase):
+    """
+    Tests translating keys.
+    """
+
+    def test_translates_keys_as_djangorestframework_camel_case(self):
+        data = {key: {key: [{key: 1}]} for key in KEYS}
+        self.assertEqual(camelize(data), reference_camelize(data))
+        camelized = reference_camelize(data)
+        self.assertEqual(underscoreize(camelized), reference_underscoreize(camelized))
+
+    def test_camelizes_nested_data(self):
+        data = {"email_addresses": [{"is_primary": True}], "user_ids": (1, 2)}
+        self.assertEqual(
+            camelize(data),
+            {"emailAddresses": [{"isPrimary": True}], "userIds": [1, 2]},
+        )
+
+    def test_camelizes_lazy_strings(self):
+        data = {gettext_lazy("first_name"): gettext_lazy("value")}
+        self.assertEqual(camelize(data), {"firstName": "value"})
+
+    def test_keeps_the_serializer_of_returned_data(self):
+        serializer = object()
+        data = ReturnDict({"first_name": "A"}, serializer=serializer)
+        camelized = camelize(data)
+        self.assertIsInstance(camelized, ReturnDict)
+        self.assertIs(camelized.serializer, serializer)
+        self.assertEqual(camelized, {"firstName": "A"})
+
+        data = ReturnList([{"first_name": "A"}], serializer=serializer)
+        camelized = camelize(data)
+        self.assertIsInstance(camelized, ReturnList)
+        self.assertIs(camelized.serializer, serializer)
+        self.assertEqual(camelized, [{"firstName": "A"}])
+
+    def test_camelizes_generators(self):
+        rows = ({"first_name": name} for name in "AB")
+        self.assertEqual(camelize(rows), [{"firstName": "A"}, {"firstName": "B"}])
+
+    def test_keeps_strings_and_bytes(self):
+        self.assertEqual(camelize({"a_b": "c_d"}), {"aB": "c_d"})
+        self.assertEqual(camelize(b"a_b"), b"a_b")
+
+
+class CamelCaseRendererTests(SimpleTestCase):
+    """
+    Tests rendering and parsing camel-cased JSON.
+    """
+
+    def test_renders_camel_cased_json(self):
+        rendered = CamelCaseJSONRenderer().render({"first_name": "A"})
+        self.assertEqual(json.loads(rendered), {"firstName": "A"})
+
+    def test_sends_rendered_json_as_is(self):
+        rendered = render_json({"first_name": "A"})
+        self.assertIsInstance(rendered, RenderedJSON)
+        self.assertIs(CamelCaseJSONRenderer().render(rendered), rendered)
+
+    def test_indents_on_request(self):
+        rendered = CamelCaseJSONRenderer().render(
+            {"first_name": "A"}, "application/json; indent=2"
+        )
+        self.assertEqual(rendered, b'{\n  "firstName": "A"\n}')
+
+    def test_parses_into_snake_case(self):
+        stream = io.BytesIO(b'{"firstName": "A", "emailAddresses": [{"isPrimary": 1}]}')
+        self.assertEqual(
+            CamelCaseJSONParser().parse(stream),
+            {"first_name": "A", "email_addresses": [{"is_primary": 1}]},
+        )
@@ -0,0 +1,111 @@
+"""
+Tests for the cache value format.
+"""
+
+import datetime
+import decimal
+import uuid
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from account.models import User
+from core.lib.caches import CACHE_MISS
+from core.lib.codecs import (
+    FLAG_MSGPACK,
+    FLAG_ZLIB,
+    FORMAT_VERSION,
+    CacheValueCodec,
+    CacheValueError,
+    msgpack,
+)
+from core.lib.renderers import RenderedJSON
+
+
+class CacheValueCodecTests(SimpleTestCase):
+    """
+    Tests encoding and decoding cache values.
+    """
+
+    def setUp(self):
+        self.codec = CacheValueCodec(compress_min_size=1024)
+
+    def test_round_trip_keeps_types(self):
+        value = (
+            ("generation",),
+            {
+                "id": uuid.uuid4(),
+                "created_at": datetime.datetime(
+                    2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc
+                ),
+                "birthday": datetime.date(2000, 1, 1),
+                "balance": decimal.Decimal("1.10"),
+                "emails": [{"email": "a@example.com", "is_primary": True}],
+                "avatar": b"\x00\x01",
+            },
+            None,
+        )
+        decoded = self.codec.decode(self.codec.encode(value))
+        self.assertEqual(decoded, value)
+        self.assertIs(type(decoded[0]), tuple)
+        self.assertIs(type(decoded[1]["id"]), uuid.UUID)
+
+    def test_round_trip_rendered_json(self):
+        value = RenderedJSON(b'{"id":1}')
+        decoded = self.codec.decode(self.codec.encode(value))
+        self.assertIs(type(decoded), RenderedJSON)
+        self.assertEqual(decoded, value)
+
+    def test_falls_back_to_pickle(self):
+        value = {"tags": {"a", "b"}}
+        encoded = self.codec.encode(value)
+        self.assertFalse(encoded[1] & FLAG_MSGPACK)
+        self.assertEqual(self.codec.decode(encoded), value)
+
+    def test_compresses_large_values(self):
+        value = ["a" * 100] * 100
+        encoded = self.codec.encode(value)
+        self.assertTrue(encoded[1] & FLAG_ZLIB)
+        self.assertLess(len(encoded), 1024)
+        self.assertEqual(self.codec.decode(encoded), value)
+
+    def test_header(self):
+        encoded = self.codec.encode([1, 2, 3])
+        self.assertEqual(encoded[0], FORMAT_VERSION)
+        if msgpack is not None:
+            self.assertTrue(encoded[1] & FLAG_MSGPACK)
+
+    def test_rejects_unknown_version(self):
+        encoded = self.codec.encode([1, 2, 3])
+        with self.assertRaises(CacheValueError):
+            self.codec.decode(bytes((FORMAT_VERSION + 1,)) + encoded[1:])
+
+    def test_rejects_unknown_flags(self):
+        encoded = self.codec.encode([1, 2, 3])
+        with self.assertRaises(CacheValueError):
+            self.codec.decode(bytes((FORMAT_VERSION, 0x80)) + encoded[2:])
+
+    def test_rejects_invalid_payload(self):
+        with self.assertRaises(CacheValueError):
+            self.codec.decode(bytes((FORMAT_VERSION, FLAG_ZLIB)) + b"not zlib")
+        with self.assertRaises(CacheValueError):
+            self.codec.decode(b"")
+
+
+class CachedEntryFormatTests(TestCase):
+    """
+    Tests how BaseModelManager reads entries in other formats.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="codec")
+
+    def test_entry_of_unknown_version_is_a_miss(self):
+        User.objects.get_cached(self.user.pk)
+        key = User.objects.get_cache_key("get_cached__<id>", id=self.user.pk)
+        cache.set(key, bytes((FORMAT_VERSION + 1, 0)) + b"future")
+
+        data, _, _ = User.objects.cache_get("get_cached__<id>", id=self.user.pk)
+        self.assertIs(data, CACHE_MISS)
+        self.assertEqual(User.objects.get_cached(self.user.pk), self.user)
@@ -0,0 +1,353 @@
+"""
+Tests for the caching of BaseModelManager.
+"""
+
+import threading
+import time
+from unittest import mock, skipUnless
+from uuid import UUID
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from account.models import EmailAddress, User
+from core.lib.caches import local_caches
+from core.lib.managers import JSONArrayAgg
+
+CACHE_NAME = "get_cached__<id>"
+
+
+class CacheTestCase(TestCase):
+    """
+    Starts every test from empty caches.
+    """
+
+    def setUp(self):
+        cache.clear()
+        for local_cache in local_caches:
+            local_cache.clear()
+
+
+class CacheInvalidationTests(CacheTestCase):
+    """
+    Tests that writes clear the caches they affect once they commit.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username="cached", first_name="A")
+        EmailAddress.objects.create(user=self.user, email="cached@example.com")
+        self.email_address = EmailAddress.objects.get(email="cached@example.com")
+
+    def serialize(self):
+        return User.objects.serialize_current_user(id=self.user.id)
+
+    def test_save_clears_caches_on_commit(self):
+        self.serialize()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.first_name = "B"
+            self.user.save()
+        self.assertEqual(self.serialize()["first_name"], "A")
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.serialize()["first_name"], "B")
+
+    def test_delete_clears_caches_on_commit(self):
+        User.objects.get_cached(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(id=self.user.id).delete()
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_cached(self.user.id)
+
+    def test_bulk_update_clears_caches_on_commit(self):
+        self.serialize()
+        with self.captureOnCommitCallbacks() as callbacks:
+            User.objects.filter(id=self.user.id).update(first_name="B")
+        self.assertEqual(self.serialize()["first_name"], "A")
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.serialize()["first_name"], "B")
+
+    def test_dependent_save_clears_dependent_caches(self):
+        self.serialize()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.email_address.is_verified = True
+            self.email_address.save()
+        self.assertTrue(self.serialize()["email_addresses"][0]["is_verified"])
+
+    def test_dependent_save_clears_caches_of_old_and_new_objects(self):
+        other = User.objects.create(username="other")
+        User.objects.serialize_current_user(id=other.id)
+        self.serialize()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.email_address.user = other
+            self.email_address.save()
+
+        self.assertEqual(self.serialize()["email_addresses"], [])
+        emails = User.objects.serialize_current_user(id=other.id)["email_addresses"]
+        self.assertEqual([e["email"] for e in emails], ["cached@example.com"])
+        # Later saves only clear the caches of the other user.
+        self.assertEqual(self.email_address._dependent_ids, {"user": {other.id}})
+
+    def test_dependent_bulk_update_clears_dependent_caches(self):
+        self.serialize()
+        with self.captureOnCommitCallbacks(execute=True):
+            EmailAddress.objects.filter(user=self.user).update(is_verified=True)
+        self.assertTrue(self.serialize()["email_addresses"][0]["is_verified"])
+
+    def test_dependent_bulk_update_clears_caches_of_old_and_new_objects(self):
+        other = User.objects.create(username="other")
+        User.objects.serialize_current_user(id=other.id)
+        self.serialize()
+        with self.captureOnCommitCallbacks(execute=True):
+            EmailAddress.objects.filter(id=self.email_address.id).update(user=other)
+
+        self.assertEqual(self.serialize()["email_addresses"], [])
+        emails = User.objects.serialize_current_user(id=other.id)["email_addresses"]
+        self.assertEqual([e["email"] for e in emails], ["cached@example.com"])
+
+    def test_dependent_bulk_delete_clears_dependent_caches(self):
+        self.serialize()
+        with self.captureOnCommitCallbacks(execute=True):
+            EmailAddress.objects.filter(user=self.user).delete()
+        self.assertEqual(self.serialize()["email_addresses"], [])
+
+
+class CacheGetOrComputeTests(CacheTestCase):
+    """
+    Tests computing, invalidating and recomputing cache entries.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.id = "1"
+        self.calls = 0
+        self.lock_key = f"{User.objects.get_cache_key(CACHE_NAME, id=self.id)}:lock"
+
+    def compute(self):
+        self.calls += 1
+        return f"value {self.calls}"
+
+    def get(self, **kwargs):
+        return User.objects.cache_get_or_compute(
+            CACHE_NAME, self.compute, id=self.id, **kwargs
+        )
+
+    def test_computes_once(self):
+        self.assertEqual(self.get(), "value 1")
+        self.assertEqual(self.get(), "value 1")
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_clearing_object_caches_invalidates_entries(self):
+        self.get()
+        User.objects.clear_object_caches(ids=[self.id])
+        self.assertEqual(self.get(), "value 2")
+
+    def test_clearing_model_caches_invalidates_entries(self):
+        self.get()
+        User.objects.clear_model_caches()
+        self.assertEqual(self.get(), "value 2")
+
+    def test_clearing_other_objects_keeps_entries(self):
+        self.get()
+        User.objects.clear_object_caches(ids=["2"])
+        self.assertEqual(self.get(), "value 1")
+
+    def test_recomputes_stale_entries(self):
+        self.get(timeout=0)
+        self.assertEqual(self.get(timeout=0), "value 2")
+
+    def test_serves_stale_entries_while_another_worker_recomputes(self):
+        self.get(timeout=0)
+        cache.add(self.lock_key, 1)
+        self.assertEqual(self.get(timeout=0), "value 1")
+        self.assertEqual(self.calls, 1)
+
+    @override_settings(CACHE_LOCK_WAIT=0.1)
+    def test_computes_missing_entries_when_the_lock_isnt_released(self):
+        cache.add(self.lock_key, 1)
+        self.assertEqual(self.get(), "value 1")
+
+    def test_caches_missing_objects(self):
+        id = "00000000-0000-0000-0000-000000000000"
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.serialize_current_user(id=id)
+        with self.assertNumQueries(0), self.assertRaises(User.DoesNotExist):
+            User.objects.serialize_current_user(id=id)
+
+    def test_only_one_worker_computes_an_entry(self):
+        started = threading.Barrier(4)
+        results = []
+
+        def compute():
+            time.sleep(0.2)
+            return self.compute()
+
+        def get():
+            started.wait()
+            results.append(
+                User.objects.cache_get_or_compute(CACHE_NAME, compute, id=self.id)
+            )
+
+        threads = [threading.Thread(target=get) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ["value 1"] * 4)
+
+
+class GetCachedTests(CacheTestCase):
+    """
+    Tests get_cached.
+    """
+
+    def test_defers_uncached_fields(self):
+        user = User.objects.create(username="cached")
+        user.set_password("password")
+        user.save()
+
+        User.objects.get_cached(user.id)
+        with self.assertNumQueries(0):
+            cached = User.objects.get_cached(user.id)
+            self.assertEqual(cached.username, "cached")
+        self.assertEqual(cached.get_deferred_fields(), {"password", "last_login"})
+        self.assertTrue(cached.check_password("password"))
+
+    def test_raises_does_not_exist(self):
+        with self.assertRaises(User.DoesNotExist):
+            User.objects.get_cached("00000000-0000-0000-0000-000000000000")
+
+
+class SerializeManyTests(CacheTestCase):
+    """
+    Tests serializing many objects with batched cache reads and writes.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.users = [User.objects.create(username=f"user{i}") for i in range(3)]
+        self.ids = [user.id for user in self.users]
+
+    def test_loads_misses_with_one_query(self):
+        with self.assertNumQueries(1):
+            users = User.objects.serialize_current_users(self.ids)
+        self.assertEqual(list(users), self.ids)
+        self.assertEqual(
+            [u["username"] for u in users.values()], ["user0", "user1", "user2"]
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(User.objects.serialize_current_users(self.ids), users)
+
+    def test_only_loads_misses(self):
+        User.objects.serialize_current_user(id=self.ids[0])
+        with self.assertNumQueries(1):
+            User.objects.serialize_current_users(self.ids)
+        with self.assertNumQueries(0):
+            User.objects.serialize_current_users(self.ids)
+
+    def test_shares_entries_with_serialize(self):
+        users = User.objects.serialize_current_users(self.ids)
+        with self.assertNumQueries(0):
+            user = User.objects.serialize_current_user(id=self.ids[1])
+        self.assertEqual(user, users[self.ids[1]])
+
+    def test_leaves_out_missing_objects(self):
+        id = "00000000-0000-0000-0000-000000000000"
+        users = User.objects.serialize_current_users([id, self.ids[0]])
+        self.assertEqual(list(users), [self.ids[0]])
+        with self.assertNumQueries(0):
+            User.objects.serialize_current_users([id])
+
+    def test_invalidation_reloads_only_the_changed_objects(self):
+        User.objects.serialize_current_users(self.ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[2].first_name = "Changed"
+            self.users[2].save()
+        with self.assertNumQueries(1):
+            users = User.objects.serialize_current_users(self.ids)
+        self.assertEqual(users[self.ids[2]]["first_name"], "Changed")
+
+    def test_requires_cache_names_with_ids(self):
+        with self.assertRaises(ValueError):
+            User.objects.serialize_many(self.ids, cache_name="all_users")
+
+
+class ProjectTests(TestCase):
+    """
+    Tests projecting rows with nested collections.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username="nested")
+        for i in range(3):
+            EmailAddress.objects.create(user=self.user, email=f"nested{i}@example.com")
+        self.fields = ["id", "email_addresses__id", "email_addresses__email"]
+
+    def project(self, fields):
+        return User.objects.project(User.objects.filter(id=self.user.id), fields)
+
+    def test_nests_collections_in_one_query(self):
+        with self.assertNumQueries(1):
+            (row,) = self.project(self.fields)
+        emails = row["email_addresses"]
+        self.assertEqual(
+            {e["email"] for e in emails},
+            {f"nested{i}@example.com" for i in range(3)},
+        )
+        self.assertIsInstance(emails[0]["id"], UUID)
+
+    def test_nests_empty_collections(self):
+        EmailAddress.objects.filter(user=self.user).delete()
+        (row,) = self.project(self.fields)
+        self.assertEqual(row["email_addresses"], [])
+
+    def test_nests_primary_keys_of_bare_relations(self):
+        (row,) = self.project(["email_addresses"])
+        self.assertEqual(
+            {e["id"] for e in row["email_addresses"]},
+            set(EmailAddress.objects.values_list("id", flat=True)),
+        )
+        self.assertEqual(row["username"], "nested")
+
+    @skipUnless(JSONArrayAgg.can_order(connection), "Aggregates can't be ordered")
+    def test_orders_collections_by_the_default_ordering(self):
+        (row,) = self.project(self.fields)
+        self.assertEqual(
+            [e["email"] for e in row["email_addresses"]],
+            list(EmailAddress.objects.values_list("email", flat=True)),
+        )
+
+    def test_orders_the_aggregate(self):
+        subquery, _ = User.objects.get_nested_subquery("email_addresses", ["email"])
+        queryset = User.objects.annotate(emails=subquery)
+        with mock.patch.object(JSONArrayAgg, "can_order", return_value=True):
+            sql = str(queryset.query)
+        self.assertRegex(sql, r"ORDER BY .*created_at.* DESC\)")
+
+    def test_iterates_in_chunks(self):
+        rows = User.objects.iter_project(User.objects.all(), self.fields, chunk_size=1)
+        self.assertEqual(len(next(rows)["email_addresses"]), 3)
+
+    def test_closes_async_rows_when_closed(self):
+        @async_to_sync
+        async def read_one(rows):
+            row = await rows.__anext__()
+            await rows.aclose()
+            return row
+
+        User.objects.create(username="other")
+        rows = User.objects.iter_project(User.objects.all(), self.fields, chunk_size=1)
+        with mock.patch.object(User.objects, "serialize_iter", return_value=rows):
+            row = read_one(User.objects.aserialize_iter(chunk_size=1))
+        self.assertIn(row["id"], set(User.objects.values_list("id", flat=True)))
+        with self.assertRaises(StopIteration):
+            next(rows)
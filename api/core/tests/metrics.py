@@ -0,0 +1,132 @@
+"""
+Tests for the request metrics.
+"""
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.models import User
+from core.lib.caches import shared_counters
+from core.lib.metrics import (
+    UNRESOLVED_ROUTE,
+    MetricsRegistry,
+    RequestMetrics,
+    current_metrics,
+    format_labels,
+    registry,
+)
+
+
+class MetricsRegistryTests(TestCase):
+    """
+    Tests adding up and rendering request metrics.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.registry = MetricsRegistry(flush_interval=0)
+        self.addCleanup(shared_counters.remove, self.registry.requests)
+        self.addCleanup(shared_counters.remove, self.registry.routes)
+
+    def record(self, latency, queries=0):
+        metrics = RequestMetrics()
+        metrics.queries = queries
+        metrics.sql_time = latency / 2
+        self.registry.record("current_user", "GET", 200, latency, metrics)
+
+    def test_renders_the_shared_totals(self):
+        self.record(0.003, queries=1)
+        self.record(0.2, queries=2)
+        self.assertNotIn("current_user", self.registry.render())
+
+        self.registry.flush()
+        lines = self.registry.render().splitlines()
+        for line in [
+            'http_requests_total{route="current_user",method="GET",status="200"} 2',
+            'http_request_duration_seconds_bucket{route="current_user",le="0.005"} 1',
+            'http_request_duration_seconds_bucket{route="current_user",le="0.25"} 2',
+            'http_request_duration_seconds_bucket{route="current_user",le="+Inf"} 2',
+            'http_request_duration_seconds_count{route="current_user"} 2',
+            'http_request_duration_seconds_sum{route="current_user"} 0.203',
+            'db_queries_total{route="current_user"} 3',
+            'db_query_duration_seconds_total{route="current_user"} 0.1015',
+        ]:
+            self.assertIn(line, lines)
+
+    def test_adds_the_totals_of_every_process(self):
+        other = MetricsRegistry(flush_interval=0)
+        self.addCleanup(shared_counters.remove, other.requests)
+        self.addCleanup(shared_counters.remove, other.routes)
+        self.record(0.01)
+        self.registry.flush()
+        other.record("current_user", "GET", 200, 0.01, RequestMetrics())
+        other.flush()
+
+        self.assertIn(
+            'http_requests_total{route="current_user",method="GET",status="200"} 2',
+            self.registry.render().splitlines(),
+        )
+
+    def test_escapes_label_values(self):
+        self.assertEqual(
+            format_labels(route='a"b\\c\nd', le="1"), 'route="a\\"b\\\\c\\nd",le="1"'
+        )
+
+
+class MetricsMiddlewareTests(TestCase):
+    """
+    Tests recording the metrics of requests, and exposing them.
+    """
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_records_queries_and_cache_calls_by_route(self):
+        user = User.objects.create(username="metrics")
+        token = AccessToken.for_user(user)
+        self.client.get("/rest/v1/account/user/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.client.get("/rest/v1/account/user/")
+
+        self.assertEqual(
+            registry.requests.snapshot(),
+            {
+                ("current_user", "GET", "200"): {"count": 1},
+                ("current_user", "GET", "401"): {"count": 1},
+            },
+        )
+        counters = registry.routes.snapshot()[("current_user",)]
+        self.assertEqual(counters["latency_count"], 2)
+        self.assertGreater(counters["db_queries_total"], 0)
+        self.assertGreater(counters["cache_calls_total"], 0)
+        self.assertGreater(counters["cache_misses_total"], 0)
+
+    def test_labels_requests_rejected_before_resolving(self):
+        response = self.client.get("/rest/v1/account/user/", HTTP_HOST="example.com")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(registry.routes.snapshot()), [(UNRESOLVED_ROUTE,)])
+
+    def test_counts_cache_hits_and_misses(self):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            cache.set("metrics", 1)
+            cache.get("metrics")
+            cache.get_many(["metrics", "missing"])
+        finally:
+            current_metrics.reset(token)
+        self.assertEqual(
+            (metrics.cache_calls, metrics.cache_hits, metrics.cache_misses), (3, 2, 1)
+        )
+
+    def test_exposes_the_metrics(self):
+        self.client.get("/rest/v1/account/user/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("http_requests_total{", response.content.decode())
+
+    def test_only_exposes_the_metrics_to_allowed_addresses(self):
+        response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
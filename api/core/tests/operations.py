@@ -0,0 +1,59 @@
+"""
+Tests for the migration operations.
+"""
+
+from unittest import mock
+
+from django.apps import apps
+from django.db import connection, models
+from django.db.migrations.state import ProjectState
+from django.test import TransactionTestCase
+
+from core.db.operations import AddIndexConcurrently
+
+
+class AddIndexConcurrentlyTests(TransactionTestCase):
+    """
+    Tests adding indexes concurrently where the database supports it.
+    """
+
+    def setUp(self):
+        self.operation = AddIndexConcurrently(
+            "redeemablekey",
+            models.Index(fields=["date_expires"], name="test_expires_idx"),
+        )
+        self.from_state = ProjectState.from_apps(__import__("django.apps").apps.apps)
+        self.to_state = self.from_state.clone()
+        self.operation.state_forwards("account", self.to_state)
+
+    def get_indexes(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, "account_redeemablekey"
+            )
+        return {name for name, c in constraints.items() if c["index"]}
+
+    def test_adds_indexes_on_other_databases(self):
+        with connection.schema_editor(atomic=False) as editor:
+            self.operation.database_forwards(
+                "account", editor, self.from_state, self.to_state
+            )
+        self.assertIn("test_expires_idx", self.get_indexes())
+
+        with connection.schema_editor(atomic=False) as editor:
+            self.operation.database_backwards(
+                "account", editor, self.to_state, self.from_state
+            )
+        self.assertNotIn("test_expires_idx", self.get_indexes())
+
+    def test_adds_indexes_concurrently_on_postgresql(self):
+        editor = mock.Mock()
+        editor.connection.vendor = "postgresql"
+        editor.connection.in_atomic_block = False
+        editor.connection.alias = "default"
+        self.operation.database_forwards(
+            "account", editor, self.from_state, self.to_state
+        )
+        editor.add_index.assert_called_once_with(
+            mock.ANY, self.operation.index, concurrently=True
+        )
@@ -0,0 +1,170 @@
+"""
+Tests for the connection pool of the PostgreSQL backend.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from django.db import connections
+from django.test import SimpleTestCase
+
+from core.db.backends.postgresql.base import DatabaseWrapper, close_pools
+
+
+class FakeConnection:
+    """
+    Stands in for a psycopg2 connection, tracking its transaction status as
+    psycopg2 does.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.closed = 0
+        self.usable = True
+        self.isolation_level = psycopg2.extensions.ISOLATION_LEVEL_READ_COMMITTED
+        self.info = SimpleNamespace(
+            transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        )
+        self._autocommit = False
+
+    @property
+    def autocommit(self):
+        return self._autocommit
+
+    @autocommit.setter
+    def autocommit(self, value):
+        if self.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            raise psycopg2.ProgrammingError(
+                "set_session cannot be used inside a transaction"
+            )
+        self._autocommit = value
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    """
+    Opens a transaction as a psycopg2 cursor does outside autocommit mode.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if not self.connection.usable:
+            raise psycopg2.OperationalError("server closed the connection")
+        if not self.connection.autocommit:
+            self.connection.info.transaction_status = (
+                psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+            )
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """
+    Tests taking Django's connections from the pool and returning them.
+    """
+
+    def setUp(self):
+        patcher = mock.patch("psycopg2.connect", side_effect=FakeConnection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("psycopg2.extras.register_default_jsonb")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(close_pools)
+
+    def create_wrapper(self, size=2, timeout=1, health_checks=True):
+        settings_dict = {
+            **connections["default"].settings_dict,
+            "ENGINE": "core.db.backends.postgresql",
+            "OPTIONS": {},
+            "CONN_HEALTH_CHECKS": health_checks,
+            "POOL_SIZE": size,
+            "POOL_TIMEOUT": timeout,
+        }
+        return DatabaseWrapper(settings_dict, alias="pooled")
+
+    def checkout(self, wrapper):
+        wrapper.connection = wrapper.get_new_connection({"dbname": "pooled"})
+        return wrapper.connection
+
+    def test_reuses_returned_connections(self):
+        first, second = self.create_wrapper(), self.create_wrapper()
+        connection = self.checkout(first)
+        first._close()
+        self.assertIs(self.checkout(second), connection)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_keeps_up_to_size_connections(self):
+        wrappers = [self.create_wrapper() for _ in range(2)]
+        checked_out = {self.checkout(wrapper) for wrapper in wrappers}
+        for wrapper in wrappers:
+            wrapper._close()
+
+        self.assertEqual({self.checkout(wrapper) for wrapper in wrappers}, checked_out)
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertFalse(any(connection.closed for connection in checked_out))
+
+    def test_waits_for_a_connection_when_all_are_in_use(self):
+        first, second = self.create_wrapper(size=1), self.create_wrapper(size=1)
+        connection = self.checkout(first)
+        timer = threading.Timer(0.05, first._close)
+        timer.start()
+        self.addCleanup(timer.join)
+
+        start = time.monotonic()
+        self.assertIs(self.checkout(second), connection)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_times_out_when_no_connection_is_returned(self):
+        first = self.create_wrapper(size=1, timeout=0.01)
+        second = self.create_wrapper(size=1, timeout=0.01)
+        self.checkout(first)
+        with self.assertRaises(psycopg2.pool.PoolError):
+            self.checkout(second)
+
+        # The failed checkout didn't take the connection's place.
+        first._close()
+        self.checkout(second)
+
+    def test_replaces_connections_that_stopped_working(self):
+        wrapper = self.create_wrapper()
+        broken = self.checkout(wrapper)
+        wrapper._close()
+        broken.usable = False
+
+        connection = self.checkout(wrapper)
+        self.assertIsNot(connection, broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_health_checks_leave_connections_outside_transactions(self):
+        wrapper = self.create_wrapper()
+        self.checkout(wrapper)
+        wrapper._close()
+
+        connection = self.checkout(wrapper)
+        self.assertEqual(
+            connection.info.transaction_status,
+            psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+        )
+        # As Django does when it sets up a new connection.
+        wrapper._set_autocommit(True)
+        self.assertTrue(connection.autocommit)
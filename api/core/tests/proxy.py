@@ -0,0 +1,179 @@
+"""
+Tests for proxying the dev server.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from core import views
+from core.lib.proxy import TemplateCache, UpstreamPool
+
+
+class UpstreamHandler(BaseHTTPRequestHandler):
+    """
+    Answers with the routes of the server, keeping connections alive.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address))
+        status, headers, body = self.server.routes.get(
+            self.path, (404, {"Content-Type": "text/html"}, b"missing")
+        )
+        etag = headers.get("ETag")
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UpstreamTestCase(SimpleTestCase):
+    """
+    Runs an upstream server, and a pool of connections to it.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), UpstreamHandler)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.routes = {
+            "/app.js": (200, {"Content-Type": "text/javascript"}, b"run()"),
+            "/index.html": (
+                200,
+                {"Content-Type": "text/html", "ETag": '"index"'},
+                b"{{ 1|add:1 }}",
+            ),
+        }
+        thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        host, port = self.server.server_address
+        self.pool = UpstreamPool(f"http://{host}:{port}", size=2)
+        self.addCleanup(self.pool.close)
+
+    def connections(self):
+        return {client_address for _, client_address in self.server.requests}
+
+
+class UpstreamPoolTests(UpstreamTestCase):
+    """
+    Tests reusing keep-alive connections.
+    """
+
+    def test_reuses_connections_of_read_responses(self):
+        for _ in range(3):
+            response, body = self.pool.read("GET", "/app.js")
+            self.assertEqual((response.status, body), (200, b"run()"))
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(self.connections()), 1)
+
+    def test_releases_streamed_connections_once_read(self):
+        connection, response = self.pool.request("GET", "/app.js")
+        self.assertEqual(self.pool._idle.qsize(), 0)
+        self.assertEqual(
+            b"".join(self.pool.iter_body(connection, response, chunk_size=2)),
+            b"run()",
+        )
+        self.assertEqual(self.pool._idle.qsize(), 1)
+
+    def test_closes_connections_of_abandoned_streams(self):
+        connection, response = self.pool.request("GET", "/app.js")
+        body = self.pool.iter_body(connection, response, chunk_size=2)
+        next(body)
+        body.close()
+        self.assertIsNone(connection.sock)
+        self.assertEqual(self.pool._idle.qsize(), 0)
+
+    def test_retries_connections_closed_by_the_upstream(self):
+        stale = mock.Mock(request=mock.Mock(side_effect=ConnectionResetError))
+        self.pool._idle.put_nowait(stale)
+
+        response, body = self.pool.read("GET", "/app.js")
+        self.assertEqual(body, b"run()")
+        stale.close.assert_called_once()
+
+    def test_keeps_at_most_size_idle_connections(self):
+        requests = [self.pool.request("GET", "/app.js") for _ in range(3)]
+        for connection, response in requests:
+            response.read()
+            self.pool.release(connection, response)
+        self.assertEqual(self.pool._idle.qsize(), 2)
+        self.assertIsNone(requests[2][0].sock)
+
+    def test_close_closes_idle_connections(self):
+        self.pool.read("GET", "/app.js")
+        (connection,) = self.pool._idle.queue
+        self.pool.close()
+        self.assertIsNone(connection.sock)
+        self.assertEqual(self.pool._idle.qsize(), 0)
+
+
+class ProxyTests(UpstreamTestCase):
+    """
+    Tests proxying pages and assets.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.multiple(
+            views, upstream_pool=self.pool, template_cache=TemplateCache()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def test_renders_pages_as_templates(self):
+        response = views.catchall_dev(self.factory.get("/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"2")
+
+    def test_passes_the_status_of_pages_through(self):
+        response = views.proxy_template("/missing.html")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, b"missing")
+        self.assertIsNone(views.template_cache.get("/missing.html"))
+
+    def test_reuses_templates_the_upstream_didnt_change(self):
+        views.proxy_template("/index.html")
+        with mock.patch.object(views.engines["django"], "from_string") as compile:
+            response = views.proxy_template("/index.html")
+        compile.assert_not_called()
+        self.assertEqual((response.status_code, response.content), (200, b"2"))
+        self.assertEqual(len(self.connections()), 1)
+
+    def test_doesnt_cache_templates_of_errors(self):
+        self.server.routes["/error.html"] = (
+            500,
+            {"Content-Type": "text/html", "ETag": '"error"'},
+            b"error",
+        )
+        views.proxy_template("/error.html")
+        self.assertIsNone(views.template_cache.get("/error.html"))
+
+    def test_streams_assets(self):
+        response = views.catchall_dev(self.factory.get("/app.js"))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/javascript")
+        self.assertEqual(b"".join(response.streaming_content), b"run()")
+        self.assertEqual(self.pool._idle.qsize(), 1)
+
+    def test_reads_assets_of_async_requests(self):
+        response = views.proxy_request(self.factory.get("/app.js"), stream=False)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.content, b"run()")
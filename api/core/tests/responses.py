@@ -0,0 +1,133 @@
+"""
+Tests for the streamed JSON responses.
+"""
+
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.lib.responses import AsyncIteratorThread, StreamingJSONResponse
+
+
+class StreamingJSONResponseTests(SimpleTestCase):
+    """
+    Tests streaming rows as a JSON array.
+    """
+
+    def content(self, response):
+        return json.loads(b"".join(response))
+
+    def test_streams_rows_as_a_json_array(self):
+        rows = ({"id": i, "is_primary": i == 0} for i in range(3))
+        response = StreamingJSONResponse(rows)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            self.content(response),
+            [
+                {"id": 0, "isPrimary": True},
+                {"id": 1, "isPrimary": False},
+                {"id": 2, "isPrimary": False},
+            ],
+        )
+
+    def test_streams_no_rows_as_an_empty_array(self):
+        self.assertEqual(self.content(StreamingJSONResponse(iter([]))), [])
+
+    def test_keeps_keys_unless_camelized(self):
+        response = StreamingJSONResponse([{"is_primary": True}], camelize_keys=False)
+        self.assertEqual(self.content(response), [{"is_primary": True}])
+
+    @mock.patch("core.lib.responses.STREAM_BUFFER_SIZE", 32)
+    def test_buffers_rows_into_chunks(self):
+        rows = [{"email": f"user{i}@example.com"} for i in range(10)]
+        chunks = list(StreamingJSONResponse(rows))
+        self.assertGreater(len(chunks), 2)
+        self.assertLess(len(chunks), len(rows))
+        self.assertEqual(len(json.loads(b"".join(chunks))), 10)
+
+    def test_reads_rows_lazily(self):
+        read = []
+
+        def rows():
+            for i in range(3):
+                read.append(i)
+                yield {"id": i}
+
+        response = StreamingJSONResponse(rows())
+        self.assertEqual(read, [])
+        self.content(response)
+        self.assertEqual(read, [0, 1, 2])
+
+
+class AsyncRows:
+    """
+    An async iterator of rows that isn't a generator, so only closing it
+    explicitly closes it.
+    """
+
+    def __init__(self):
+        self.closed = threading.Event()
+        self.count = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        self.count += 1
+        return {"id": self.count}
+
+    async def aclose(self):
+        self.closed.set()
+
+
+class AsyncIteratorThreadTests(SimpleTestCase):
+    """
+    Tests streaming async content to a synchronous consumer.
+    """
+
+    def setUp(self):
+        self.closed = threading.Event()
+
+    async def rows(self, count=100, error=None):
+        try:
+            for i in range(count):
+                yield {"id": i}
+            if error is not None:
+                raise error
+        finally:
+            self.closed.set()
+
+    def test_streams_async_rows(self):
+        response = StreamingJSONResponse(self.rows(3))
+        self.assertEqual(json.loads(b"".join(response)), [{"id": i} for i in range(3)])
+        self.assertTrue(self.closed.wait(1))
+
+    def test_raises_errors_of_the_async_iterator(self):
+        content = AsyncIteratorThread(self.rows(2, error=ValueError("rows")))
+        self.assertEqual([next(content), next(content)], [{"id": 0}, {"id": 1}])
+        with self.assertRaisesMessage(ValueError, "rows"):
+            next(content)
+
+    @mock.patch("core.lib.responses.STREAM_BUFFER_SIZE", 32)
+    def test_closes_the_rows_when_the_client_goes_away(self):
+        response = StreamingJSONResponse(self.rows())
+        content = response._iterator
+        next(iter(response))
+        response.close()
+
+        content._thread.join(1)
+        self.assertFalse(content._thread.is_alive())
+        self.assertTrue(self.closed.is_set())
+
+    def test_closes_async_iterators_when_closed(self):
+        rows = AsyncRows()
+        content = AsyncIteratorThread(rows, maxsize=1)
+        self.assertEqual(next(content), {"id": 1})
+        content.close()
+
+        content._thread.join(1)
+        self.assertFalse(content._thread.is_alive())
+        self.assertTrue(rows.closed.is_set())
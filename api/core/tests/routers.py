@@ -0,0 +1,164 @@
+"""
+Tests for routing reads to the replica.
+"""
+
+from unittest import skipIf, skipUnless
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.utils import ConnectionDoesNotExist
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from account.models import User
+from core.db.routers import (
+    PIN_COOKIE_NAME,
+    REPLICA_DB_ALIAS,
+    ReplicaPinningMiddleware,
+    ReplicaRouter,
+    use_primary,
+    use_replica,
+)
+
+REPLICA_ENABLED = REPLICA_DB_ALIAS in settings.DATABASES
+
+REPLICA_ROUTERS = ["core.db.routers.ReplicaRouter"]
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """
+    Tests the databases the router picks outside of requests.
+    """
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_the_primary(self):
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_use_replica_sends_reads_to_the_replica(self):
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(User), "replica")
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_use_replica_decorates_functions(self):
+        @use_replica()
+        def read():
+            return self.router.db_for_read(User)
+
+        @use_replica()
+        async def aread():
+            return self.router.db_for_read(User)
+
+        self.assertEqual(read(), "replica")
+        self.assertEqual(async_to_sync(aread)(), "replica")
+
+    def test_writes_go_to_the_primary(self):
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(User), "default")
+
+    def test_use_primary_sends_reads_to_the_primary(self):
+        with use_replica():
+            with use_primary():
+                self.assertEqual(self.router.db_for_read(User), "default")
+            self.assertEqual(self.router.db_for_read(User), "replica")
+
+
+@skipIf(REPLICA_ENABLED, "Reads sent to the configured replica succeed")
+@override_settings(DATABASE_ROUTERS=REPLICA_ROUTERS)
+class CachedReplicaReadTests(TestCase):
+    """
+    Tests that entries shared through the cache are computed on the primary.
+
+    No replica is configured here, so reads sent to it raise
+    ConnectionDoesNotExist.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="cached")
+
+    def test_serialize_computes_cached_entries_on_the_primary(self):
+        data = User.objects.serialize_current_user(id=self.user.id)
+        self.assertEqual(data["username"], "cached")
+
+    def test_serialize_many_computes_cached_entries_on_the_primary(self):
+        data = User.objects.serialize_current_users([self.user.id])
+        self.assertEqual(data[self.user.id]["username"], "cached")
+
+    def test_serialize_reads_uncached_data_from_the_replica(self):
+        with self.assertRaises(ConnectionDoesNotExist):
+            User.objects.serialize(queryset=User.objects.all(), fields=["id"])
+
+
+@override_settings(DATABASE_ROUTERS=REPLICA_ROUTERS)
+class ReplicaPinningMiddlewareTests(TestCase):
+    """
+    Tests that clients read their own writes from the primary.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.reads = []
+
+    def read(self):
+        with use_replica():
+            self.reads.append(User.objects.all().db)
+
+    def view(self, request):
+        self.read()
+        if request.method == "POST":
+            User.objects.create(username="pinned")
+            self.read()
+        return HttpResponse()
+
+    def test_reads_go_to_the_replica(self):
+        response = ReplicaPinningMiddleware(self.view)(self.factory.get("/"))
+        self.assertEqual(self.reads, ["replica"])
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_writes_pin_the_request_and_the_client(self):
+        response = ReplicaPinningMiddleware(self.view)(self.factory.post("/"))
+        self.assertEqual(self.reads, ["replica", "default"])
+        cookie = response.cookies[PIN_COOKIE_NAME]
+        self.assertEqual(cookie["max-age"], settings.SQL_REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie["httponly"])
+
+    def test_cookie_pins_reads(self):
+        request = self.factory.get("/")
+        request.COOKIES[PIN_COOKIE_NAME] = "1"
+        response = ReplicaPinningMiddleware(self.view)(request)
+        self.assertEqual(self.reads, ["default"])
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_pins_async_requests(self):
+        async def view(request):
+            # The ORM has no async API here, so writes happen in a thread.
+            return await sync_to_async(self.view)(request)
+
+        middleware = ReplicaPinningMiddleware(view)
+        response = async_to_sync(middleware)(self.factory.post("/"))
+        self.assertEqual(self.reads, ["replica", "default"])
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+
+@skipUnless(REPLICA_ENABLED, "SQL_REPLICA_HOST or SQL_REPLICA_DATABASE is unset")
+@override_settings(DATABASE_ROUTERS=REPLICA_ROUTERS)
+class ReplicaReadTests(TestCase):
+    """
+    Tests reading from a configured replica.
+    """
+
+    # Only request the replica when it's configured, as the test runner
+    # checks every database its tests use.
+    databases = {DEFAULT_DB_ALIAS, REPLICA_DB_ALIAS} if REPLICA_ENABLED else set()
+
+    def test_use_replica_reads_from_the_replica(self):
+        # The replica can't see the test's uncommitted writes, so this only
+        # checks the query runs on it.
+        with use_replica(), self.assertNumQueries(1, using=REPLICA_DB_ALIAS):
+            users = User.objects.all()
+            self.assertEqual(users.db, REPLICA_DB_ALIAS)
+            list(users)
@@ -0,0 +1,146 @@
+"""
+Tests for serving the client build.
+"""
+
+import gzip
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import brotli
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase
+
+from core import views
+from core.lib.spa import (
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    SPAAsset,
+    SPABundle,
+    choose_encoding,
+)
+
+SCRIPT = b"console.log('" + b"a" * 1000 + b"');"
+
+
+class SPATestCase(SimpleTestCase):
+    """
+    Writes a client build to a temporary directory.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.build_dir = Path(directory.name)
+        (self.build_dir / "assets").mkdir()
+        self.write("index.html", b"<p>{{ 1|add:1 }}</p>")
+        self.write("assets/app.123.js", SCRIPT)
+        self.write("logo.png", b"\x89PNG" * 100)
+
+    def write(self, name, content):
+        (self.build_dir / name).write_bytes(content)
+
+    def load(self, **kwargs):
+        return SPABundle(self.build_dir, **kwargs).load()
+
+
+class SPABundleTests(SPATestCase):
+    """
+    Tests loading the build.
+    """
+
+    def test_compresses_text_assets(self):
+        asset = self.load().get("/assets/app.123.js")
+        self.assertEqual(asset.content_type, "text/javascript; charset=utf-8")
+        self.assertEqual(asset.cache_control, IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(gzip.decompress(asset.variants["gzip"]), SCRIPT)
+        self.assertEqual(brotli.decompress(asset.variants["br"]), SCRIPT)
+
+    def test_doesnt_compress_binary_assets(self):
+        asset = self.load().get("/logo.png")
+        self.assertEqual(list(asset.variants), ["identity"])
+        self.assertEqual(asset.cache_control, REVALIDATE_CACHE_CONTROL)
+
+    def test_uses_precompressed_files(self):
+        precompressed = gzip.compress(SCRIPT, compresslevel=9)
+        self.write("assets/app.123.js.gz", precompressed)
+        bundle = self.load()
+        self.assertEqual(
+            bundle.get("/assets/app.123.js").variants["gzip"], precompressed
+        )
+        self.assertIsNone(bundle.get("/assets/app.123.js.gz"))
+
+    def test_renders_index(self):
+        bundle = self.load(render_index=views.render_index)
+        self.assertEqual(bundle.get("/").variants["identity"], b"<p>2</p>")
+
+    def test_answers_client_routes_with_index(self):
+        bundle = self.load()
+        self.assertIs(bundle.get("/account/settings"), bundle.get("/index.html"))
+        self.assertIsNone(bundle.get("/missing.js"))
+
+    def test_requires_index(self):
+        (self.build_dir / "index.html").unlink()
+        with self.assertRaises(ImproperlyConfigured):
+            self.load()
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    """
+    Tests choosing the variant to send.
+    """
+
+    def setUp(self):
+        self.asset = SPAAsset(b"a" * 100, "text/plain", REVALIDATE_CACHE_CONTROL)
+        self.asset.add_variant("br", b"b" * 20)
+        self.asset.add_variant("gzip", b"g" * 10)
+
+    def test_chooses_the_smallest_accepted_variant(self):
+        self.assertEqual(choose_encoding(self.asset, "br, gzip"), "gzip")
+        self.assertEqual(choose_encoding(self.asset, "br"), "br")
+        self.assertEqual(choose_encoding(self.asset, "br;q=0, deflate"), "identity")
+        self.assertEqual(choose_encoding(self.asset, "gzip;q=0"), "identity")
+
+    def test_only_keeps_smaller_variants(self):
+        self.asset.add_variant("zstd", b"z" * 100)
+        self.assertNotIn("zstd", self.asset.variants)
+
+
+class CatchallProdTests(SPATestCase):
+    """
+    Tests serving the build.
+    """
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(views, "spa_bundle", self.load())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        return views.catchall_prod(self.factory.get(path, **headers))
+
+    def test_serves_the_accepted_encoding(self):
+        response = self.get("/assets/app.123.js", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), SCRIPT)
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+
+        response = self.get("/assets/app.123.js")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.content, SCRIPT)
+
+    def test_answers_matching_etags_with_not_modified(self):
+        etag = self.get("/assets/app.123.js", HTTP_ACCEPT_ENCODING="br")["ETag"]
+        response = self.get(
+            "/assets/app.123.js", HTTP_ACCEPT_ENCODING="br", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_raises_404_for_missing_files(self):
+        with self.assertRaises(Http404):
+            self.get("/missing.js")
@@ -0,0 +1,79 @@
+"""
+Tests for warming up workers.
+"""
+
+from unittest import mock
+
+from django.db import connections
+from django.test import SimpleTestCase, TestCase
+from django.urls import get_resolver
+
+from account import api_views
+from account.serializers import CurrentUserSerializer, EmailAddressSerializer
+from core import views
+from core.lib.warmup import (
+    WARM_UP_STEPS,
+    get_serializer_classes,
+    iter_views,
+    warm_up,
+)
+
+
+class WarmUpTestCase(SimpleTestCase):
+    """
+    Keeps warm_up from closing the test's connections and the dev server's
+    pool.
+    """
+
+    def setUp(self):
+        for patcher in [
+            mock.patch.object(connections, "close_all"),
+            mock.patch.object(views.upstream_pool, "close"),
+            mock.patch.object(views, "proxy_template"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class WarmUpTests(WarmUpTestCase):
+    """
+    Tests running the warm-up steps.
+    """
+
+    def test_times_every_step_and_skips_failures(self):
+        steps = [("broken", mock.Mock(side_effect=ValueError)), ("ok", mock.Mock())]
+        with mock.patch("core.lib.warmup.WARM_UP_STEPS", steps):
+            with self.assertLogs("core.lib.warmup", "WARNING") as logs:
+                timings = warm_up()
+
+        self.assertEqual(list(timings), ["broken", "ok"])
+        steps[1][1].assert_called_once()
+        self.assertIn("'broken' failed", logs.output[0])
+
+    def test_closes_connections_before_forking(self):
+        with mock.patch("core.lib.warmup.WARM_UP_STEPS", []):
+            warm_up()
+        connections.close_all.assert_called_once()
+        views.upstream_pool.close.assert_called_once()
+
+    def test_finds_the_views_of_included_url_confs(self):
+        found = set(iter_views(get_resolver().url_patterns))
+        self.assertIn(api_views.current_user_async, found)
+        self.assertIn(views.catchall, found)
+
+    def test_finds_the_serializers_of_views_and_apps(self):
+        self.assertTrue(
+            {CurrentUserSerializer, EmailAddressSerializer} <= get_serializer_classes()
+        )
+
+
+class WarmUpStepsTests(WarmUpTestCase, TestCase):
+    """
+    Tests that every warm-up step works in this project.
+    """
+
+    def test_every_step_succeeds(self):
+        with self.assertNoLogs("core.lib.warmup", "WARNING"):
+            timings = warm_up()
+        self.assertEqual(list(timings), [name for name, _ in WARM_UP_STEPS])
+        views.proxy_template.assert_called_once_with("/index.html")
@@ -1,7 +1,18 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.lib.metrics import metrics_view
+from core.views import catchall
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("rest/v1/account/", include("account.urls")),
 ]
+
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path("metrics", metrics_view, name="metrics"))
+
+# Every other path is the client's, served by the dev server in development and
+# from the build in production.
+urlpatterns.append(re_path(r"", catchall, name="catchall"))
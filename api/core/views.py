@@ -1,47 +1,177 @@
-import urllib.request
-
-import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import HttpResponse, StreamingHttpResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
 from django.template import engines
-from django.views.generic import TemplateView
 
+from core.lib.proxy import TemplateCache, UpstreamPool
+from core.lib.spa import SPABundle, choose_encoding, etag_matches
+
+UPSTREAM = "http://localhost:5000"
+
+# Request headers forwarded to the upstream for assets, so unchanged assets are
+# answered with 304 Not Modified.
+FORWARDED_REQUEST_HEADERS = ["Accept", "If-None-Match", "If-Modified-Since"]
+
+# Response headers passed back from the upstream.
+FORWARDED_RESPONSE_HEADERS = ["ETag", "Last-Modified", "Cache-Control"]
+
+upstream_pool = UpstreamPool(UPSTREAM)
+
+template_cache = TemplateCache()
+
+
+def get_validator(response):
+    """
+    Return the conditional request header and value revalidating a response,
+    or None if the upstream sent no validator.
+    """
+    if response.getheader("ETag"):
+        return ("If-None-Match", response.getheader("ETag"))
+    if response.getheader("Last-Modified"):
+        return ("If-Modified-Since", response.getheader("Last-Modified"))
+    return None
+
+
+def proxy_template(path):
+    """
+    Render the upstream page at path as a Django template, with the status
+    the upstream answered. The compiled template of a 200 response is reused
+    for as long as the upstream answers 304 to its validator.
+    """
+    cached = template_cache.get(path)
+    headers = {"Accept": "text/html"}
+    if cached is not None:
+        headers.update([cached[0]])
+
+    response, body = upstream_pool.read("GET", path, headers=headers)
+
+    if response.status == 304 and cached is not None:
+        # Only templates of 200 responses are cached.
+        template = cached[1]
+        status = 200
+    else:
+        template = engines["django"].from_string(body.decode())
+        status = response.status
+        validator = get_validator(response)
+        if status == 200 and validator is not None:
+            template_cache.set(path, validator, template)
+
+    return HttpResponse(
+        template.render(), content_type="text/html; charset=UTF-8", status=status
+    )
+
+
+def catchall_dev(request):
+    return proxy_request(request)
 
-def iter_response(response, chunk_size=65536):
-    try:
-        while True:
-            data = response.read(chunk_size)
-            if not data:
-                break
-            yield data
-    finally:
-        response.close()
 
+async def acatchall_dev(request):
+    """
+    Proxy a request to the dev server from an async context.
 
-def catchall_dev(request, upstream="http://localhost:5000"):
+    The pooled upstream connections block, so the request is proxied in a
+    worker thread while the event loop keeps serving other connections. The
+    body is read in the thread too, as this version of Django iterates
+    streamed responses synchronously under ASGI.
+    """
+    return await sync_to_async(proxy_request, thread_sensitive=False)(
+        request, stream=False
+    )
+
+
+def proxy_request(request, stream=True):
+    """
+    Proxy a request to the dev server, streaming the body of assets unless
+    stream is False.
+    """
     path = "/index.html" if request.path == "/" else request.path
-    upstream_url = upstream + path
-    response = urllib.request.urlopen(upstream_url)
+
+    # Pages are compiled as templates, so they are never passed through.
+    if path.endswith(".html") or "text/html" in request.headers.get("Accept", ""):
+        return proxy_template(path)
+
+    headers = {
+        name: request.headers[name]
+        for name in FORWARDED_REQUEST_HEADERS
+        if name in request.headers
+    }
+    connection, response = upstream_pool.request("GET", path, headers=headers)
     content_type = response.getheader("Content-Type")
 
-    if content_type == "text/html; charset=UTF-8":
-        response_text = response.read().decode()
-        response.close()
-        return HttpResponse(
-            engines["django"].from_string(response_text).render(),
+    if content_type and content_type.startswith("text/html"):
+        response.read()
+        upstream_pool.release(connection, response)
+        return proxy_template(path)
+
+    if response.status == 304:
+        response.read()
+        upstream_pool.release(connection, response)
+        proxy_response = HttpResponse(status=304)
+    elif stream:
+        proxy_response = StreamingHttpResponse(
+            upstream_pool.iter_body(connection, response),
             content_type=content_type,
             status=response.status,
             reason=response.reason,
         )
     else:
-        return StreamingHttpResponse(
-            iter_response(response),
+        proxy_response = HttpResponse(
+            b"".join(upstream_pool.iter_body(connection, response)),
             content_type=content_type,
             status=response.status,
             reason=response.reason,
         )
 
+    for name in FORWARDED_RESPONSE_HEADERS:
+        if response.getheader(name):
+            proxy_response[name] = response.getheader(name)
+    return proxy_response
+
+
+def render_index(source):
+    """
+    Render the built index.html as a Django template, as catchall_dev does.
+    """
+    return engines["django"].from_string(source).render()
+
+
+spa_bundle = SPABundle(settings.SPA_BUILD_DIR, render_index=render_index)
+
+
+def catchall_prod(request):
+    """
+    Serve the client build from memory, in the smallest encoding the client
+    accepts, answering matching If-None-Match headers with 304.
+    """
+    asset = spa_bundle.get(request.path)
+    if asset is None:
+        raise Http404()
+
+    encoding = choose_encoding(asset, request.headers.get("Accept-Encoding", ""))
+
+    if etag_matches(request.headers.get("If-None-Match", ""), asset.get_etags()):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            asset.variants[encoding], content_type=asset.content_type
+        )
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = asset.get_etag(encoding)
+    response["Cache-Control"] = asset.cache_control
+    response["Vary"] = "Accept-Encoding"
+    return response
 
-catchall_prod = TemplateView.as_view(template_name="index.html")
 
-catchall = catchall_dev if settings.SERVER_TYPE == "DEV" else catchall_prod
+if settings.SERVER_TYPE == "DEV":
+    catchall = catchall_dev
+else:
+    # Loaded at startup, so requests never touch the disk.
+    spa_bundle.load()
+    catchall = catchall_prod
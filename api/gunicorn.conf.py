@@ -0,0 +1,45 @@
+"""
+Gunicorn settings, read from the working directory, e.g.:
+
+    gunicorn
+
+With preload_app, the app is loaded and warmed up once in the master, and
+workers are forked from it warm. Without it, each worker warms itself up
+before serving.
+"""
+
+import gc
+import os
+
+wsgi_app = "core.wsgi:application"
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+
+preload_app = bool(int(os.environ.get("GUNICORN_PRELOAD", 1)))
+
+
+def when_ready(server):
+    """
+    Warm up the preloaded app in the master, before any worker is forked.
+    """
+    if not server.cfg.preload_app:
+        return
+    from core.lib.warmup import warm_up
+
+    warm_up()
+    # Move everything loaded so far out of the garbage collector's reach, so
+    # collections in the workers don't write to, and copy, the shared pages.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    """
+    Warm up a worker that loaded the app itself.
+    """
+    if worker.cfg.preload_app:
+        return
+    from core.lib.warmup import warm_up
+
+    warm_up()